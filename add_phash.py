@@ -1,51 +1,121 @@
 import sqlite3
-import imagehash
 from PIL import Image
 from tqdm import tqdm
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import traceback
+from phash_db import ensure_phash_int_column, phash_to_db
+from fingerprints import FINGERPRINT_COLUMNS, ensure_fingerprint_columns, fingerprint_rows, thumbnail
 
 DB_FILE = "database.db"
 TABLE_NAME = "photos_ok"
 
+# Время изменения файла, по которому посчитаны хеши (для поиска устаревших)
+PHASH_MTIME_COLUMN = "phash_mtime"
+# Сколько файлов получает процесс за раз и сколько строк пишется одной транзакцией
+BATCH_SIZE = 100
+COMMIT_EVERY = 1000
+
+HASH_COLUMNS = ['phash', 'phash_int', *FINGERPRINT_COLUMNS.values()]
+
 def compute_phash(image_path):
+    """
+    Декодирует изображение один раз и готовит по нему миниатюры всех хешей
+
+    phash сравнивается с хешами опубликованных фото и Telegram, поэтому
+    изображение декодируется как раньше: полностью, в RGB (без draft),
+    иначе значения разойдутся с уже сохраненными. phash берется из ahash
+    той же миниатюры и равен imagehash.average_hash.
+
+    Returns:
+        Thumbnail или None
+    """
     try:
         with Image.open(image_path) as img:
             # Преобразуем в RGB, если изображение в другом формате
             if img.mode != 'RGB':
                 img = img.convert('RGB')
-            # Вычисляем average_hash
-            return str(imagehash.average_hash(img))
+            return thumbnail(img)
     except Exception as e:
         print(f"Ошибка при вычислении pHash для {image_path}: {e}")
         print(traceback.format_exc())
         return None
 
 def process_batch(batch):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
+    """
+    Считает хеши пакета файлов в процессе-обработчике; в БД не пишет
+
+    Args:
+        batch: кортежи (id, path, phash_mtime); при известном phash_mtime
+            неизмененный файл пропускается
+
+    Returns:
+        tuple: (строки для UPDATE, число ошибок, число неизмененных файлов)
+    """
     results = []
-    
-    for id, path in batch:
-        if os.path.exists(path):
-            phash = compute_phash(path)
-            if phash:
-                results.append((id, phash))
-    
-    # Обновляем записи пакетом
+    failed = 0
+    unchanged = 0
+
+    for id, path, stored_mtime in batch:
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            failed += 1
+            continue
+        if stored_mtime is not None and mtime == stored_mtime:
+            unchanged += 1
+            continue
+        thumb = compute_phash(path)
+        if thumb is not None:
+            results.append((id, mtime, thumb))
+        else:
+            failed += 1
+
+    # phash, aHash, pHash (DCT), dHash и wHash - одним вызовом на пакет миниатюр
+    rows = []
     if results:
-        cur.executemany(f"UPDATE {TABLE_NAME} SET phash = ? WHERE id = ?", 
-                       [(phash, id) for id, phash in results])
-        conn.commit()
-    
-    conn.close()
-    return len(results)
+        fingerprints = fingerprint_rows([thumb for _, _, thumb in results])
+        rows = [
+            (row['phash'], phash_to_db(row['phash']), *(row[column] for column in FINGERPRINT_COLUMNS.values()), mtime, id)
+            for (id, mtime, _), row in zip(results, fingerprints)
+        ]
+    return rows, failed, unchanged
 
-def add_phash_column():
+def write_rows(conn, rows):
+    """Записывает пакет хешей одной транзакцией"""
+    assignments = ", ".join(f"{column} = ?" for column in [*HASH_COLUMNS, PHASH_MTIME_COLUMN])
+    conn.executemany(f"UPDATE {TABLE_NAME} SET {assignments} WHERE id = ?", rows)
+    conn.commit()
+
+def select_records(cur, recheck=False, force=False):
+    """
+    Записи для обработки: без какого-либо из хешей, а с recheck - все записи:
+    файл с сохраненным phash_mtime пересчитывается, только если изменился
+    (mtime сверяется в процессах), а записи без phash_mtime (посчитанные до
+    его появления) пересчитываются безусловно
+
+    Returns:
+        list: кортежи (id, path, phash_mtime или None - считать безусловно)
+    """
+    if force:
+        cur.execute(f"SELECT id, path, NULL FROM {TABLE_NAME}")
+        return cur.fetchall()
+    missing = " OR ".join(f"{column} IS NULL" for column in HASH_COLUMNS)
+    if recheck:
+        cur.execute(f"""
+            SELECT id, path, CASE WHEN {missing} THEN NULL ELSE {PHASH_MTIME_COLUMN} END
+            FROM {TABLE_NAME}
+        """)
+    else:
+        cur.execute(f"SELECT id, path, NULL FROM {TABLE_NAME} WHERE {missing}")
+    return cur.fetchall()
+
+def add_phash_column(workers=None, recheck=False, force=False):
     conn = sqlite3.connect(DB_FILE)
     cur = conn.cursor()
-    
+
     # Добавляем колонку phash, если её нет
     cur.execute(f"PRAGMA table_info({TABLE_NAME})")
     columns = [row[1] for row in cur.fetchall()]
@@ -53,33 +123,55 @@ def add_phash_column():
         print("Добавляем колонку phash...")
         cur.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN phash TEXT")
         conn.commit()
-    
-    # Сбрасываем все pHash значения
-    print("Сбрасываем все pHash значения...")
-    cur.execute(f"UPDATE {TABLE_NAME} SET phash = NULL")
-    conn.commit()
-    
-    # Получаем все записи без phash
-    cur.execute(f"SELECT id, path FROM {TABLE_NAME} WHERE phash IS NULL")
-    records = cur.fetchall()
-    
-    print(f"Найдено {len(records)} записей без pHash")
-    
+    if PHASH_MTIME_COLUMN not in columns:
+        cur.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {PHASH_MTIME_COLUMN} REAL")
+        conn.commit()
+    ensure_phash_int_column(conn, TABLE_NAME)
+    ensure_fingerprint_columns(conn, TABLE_NAME)
+
+    # Посчитанные хеши не сбрасываются: прерванный запуск продолжается с того же места
+    records = select_records(cur, recheck, force)
+    print(f"Найдено {len(records)} записей для подсчета pHash")
+    if not records:
+        conn.close()
+        return
+
     # Разбиваем записи на пакеты
-    batch_size = 100
-    batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
-    
-    # Обрабатываем пакеты в нескольких потоках
+    batches = [records[i:i + BATCH_SIZE] for i in range(0, len(records), BATCH_SIZE)]
+
+    # Декодирование - в процессах (PIL держит GIL), запись - только здесь, одним соединением
     total_processed = 0
-    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+    total_failed = 0
+    total_unchanged = 0
+    pending = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
         futures = [executor.submit(process_batch, batch) for batch in batches]
-        
+
         for future in tqdm(as_completed(futures), total=len(batches), desc="Обработка пакетов"):
-            total_processed += future.result()
-    
-    print(f"Обработано {total_processed} фотографий")
+            rows, failed, unchanged = future.result()
+            total_failed += failed
+            total_unchanged += unchanged
+            pending.extend(rows)
+            if len(pending) >= COMMIT_EVERY:
+                write_rows(conn, pending)
+                total_processed += len(pending)
+                pending = []
+    if pending:
+        write_rows(conn, pending)
+        total_processed += len(pending)
+
+    elapsed = time.perf_counter() - started
+    print(f"Обработано {total_processed} фотографий ({total_processed / elapsed:.1f} фото/с), "
+          f"без изменений: {total_unchanged}, ошибок: {total_failed}")
     conn.close()
 
 if __name__ == "__main__":
-    add_phash_column()
-    print("Готово!") 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Досчитывает pHash и остальные хеши фотографий")
+    parser.add_argument("--workers", type=int, default=None, help="Число процессов (по умолчанию - все ядра)")
+    parser.add_argument("--recheck", action="store_true",
+                        help="Пересчитать хеши файлов, изменившихся после подсчета")
+    parser.add_argument("--force", action="store_true", help="Пересчитать хеши всех записей")
+    args = parser.parse_args()
+    add_phash_column(args.workers, args.recheck, args.force)
+    print("Готово!")
\ No newline at end of file
@@ -0,0 +1,92 @@
+import time
+import argparse
+
+import numpy as np
+
+from hash_index import HashIndex, hamming_distances, max_distance
+from duplicate_groups import cluster_hashes
+
+
+def make_hashes(size, queries, noise, seed=0):
+    """
+    Случайные 64-битные хеши и запросы - их копии с noise измененными битами
+    (как у пережатых фотографий из канала)
+    """
+    rng = np.random.default_rng(seed)
+    hashes = rng.integers(0, 2**64, size=size, dtype=np.uint64)
+    targets = rng.integers(0, size, size=queries)
+    result = []
+    for target in targets:
+        value = int(hashes[target])
+        for bit in rng.choice(64, size=noise, replace=False):
+            value ^= 1 << int(bit)
+        result.append(value)
+    return hashes, result
+
+
+def timed(function, queries):
+    """Среднее время одного запроса в миллисекундах"""
+    started = time.perf_counter()
+    for query in queries:
+        function(query)
+    return (time.perf_counter() - started) / len(queries) * 1000
+
+
+def python_scan(hex_hashes, query, radius):
+    """Прежний подход: перебор всех хешей базы в Python"""
+    return [i for i, value in enumerate(hex_hashes) if bin(int(value, 16) ^ query).count('1') <= radius]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер индекса хешей по расстоянию Хэмминга")
+    parser.add_argument("--size", type=int, default=1_000_000, help="Число хешей в индексе")
+    parser.add_argument("--queries", type=int, default=200, help="Число запросов")
+    parser.add_argument("--noise", type=int, default=3, help="Сколько бит запроса отличается от исходного хеша")
+    parser.add_argument("--python-queries", type=int, default=3,
+                        help="Запросов для замера перебора в Python (он медленный)")
+    parser.add_argument("--cluster-size", type=int, default=200_000,
+                        help="Число хешей для замера поиска групп дубликатов (0 - не замерять)")
+    args = parser.parse_args()
+
+    hashes, queries = make_hashes(args.size, args.queries, args.noise)
+    print(f"Хешей: {args.size}, запросов: {len(queries)}, измененных бит: {args.noise}\n")
+
+    started = time.perf_counter()
+    index = HashIndex(hashes)
+    print(f"Построение индекса: {time.perf_counter() - started:.2f} с\n")
+
+    hex_hashes = [f"{value:016x}" for value in hashes.tolist()]
+    python_ms = timed(lambda q: python_scan(hex_hashes, q, 6), queries[:args.python_queries])
+
+    print(f"{'Запрос':<28} {'Индекс, мс':>11} {'NumPy, мс':>10} {'Python r=6, мс':>15}")
+    for similarity in (0.95, 0.90, 0.80, 0.75):
+        radius = max_distance(similarity)
+        index_ms = timed(lambda q: index.radius_query(q, radius), queries)
+        numpy_ms = timed(lambda q: np.flatnonzero(hamming_distances(hashes, q) <= radius), queries)
+        print(f"{f'radius_query r={radius} ({similarity:.0%})':<28} {index_ms:>11.3f} {numpy_ms:>10.3f} {python_ms:>15.1f}")
+
+    for k in (1, 10):
+        index_ms = timed(lambda q: index.knn(q, k), queries)
+        numpy_ms = timed(lambda q: np.argpartition(hamming_distances(hashes, q), k)[:k], queries)
+        print(f"{f'knn k={k}':<28} {index_ms:>11.3f} {numpy_ms:>10.3f} {python_ms:>15.1f}")
+
+    # Проверка: индекс находит то же, что полный просмотр
+    radius = max_distance(0.80)
+    for query in queries[:20]:
+        expected = set(np.flatnonzero(hamming_distances(hashes, query) <= radius).tolist())
+        assert {i for i, _ in index.radius_query(query, radius)} == expected
+    print("\n✅ Результаты индекса совпадают с полным просмотром")
+
+    if args.cluster_size:
+        # Каждый десятый хеш - почти-копия другого, как в find_duplicates.py
+        duplicates, copies = make_hashes(args.cluster_size, args.cluster_size // 10, args.noise, seed=1)
+        duplicates[-len(copies):] = np.array(copies, dtype=np.uint64)
+        print(f"\nГруппы дубликатов на {args.cluster_size} хешах:")
+        for radius in (2, 4, 6):
+            started = time.perf_counter()
+            groups = cluster_hashes(duplicates, radius)
+            print(f"  r={radius}: {len(groups)} групп за {time.perf_counter() - started:.2f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ DB_FILE = os.getenv('DB_FILE', os.path.abspath(os.path.join(os.path.dirname(__fi
 REVIEW_DIR = os.getenv('REVIEW_DIR', "review")
 TELEGRAM_DB = os.getenv('TELEGRAM_DB', os.path.abspath(os.path.join(os.path.dirname(__file__), "telegram_bot", "published_photos.sqlite")))
 LOG_DIR = os.getenv('LOG_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), "logs")))
+EMBEDDINGS_DIR = os.getenv('EMBEDDINGS_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), "DB", "embeddings", "clip_vit_b32")))  # эмбеддинги CLIP по hash_sha256
+LIKES_EMBEDDINGS_DIR = os.getenv('LIKES_EMBEDDINGS_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), "DB", "embeddings", "openai_clip_vit_b32")))  # эмбеддинги encode_image пакета clip для LikesPredictor
 
 # Параметры PostgreSQL
 POSTGRES_HOST = os.getenv('POSTGRES_HOST', '192.168.2.228')
@@ -30,6 +32,53 @@ NSFW_THRESHOLD = float(os.getenv('NSFW_THRESHOLD', "0.8"))
 CLIP_THRESHOLD = float(os.getenv('CLIP_THRESHOLD', "0.8"))
 MIN_IMAGE_SIZE = int(os.getenv('MIN_IMAGE_SIZE', "1500"))  # минимальный размер изображения (ширина или высота)
 MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', "10000"))  # максимальный размер изображения (ширина или высота)
+SMALL_IMAGE_SIZE = int(os.getenv('SMALL_IMAGE_SIZE', "2500"))  # фото маленькое, если обе стороны меньше (см. image_size.py)
+NSFW_BATCH_SIZE = int(os.getenv('NSFW_BATCH_SIZE', "8"))  # размер пакета для модели Marqo
+DECODE_SIZE = int(os.getenv('DECODE_SIZE', "640"))  # минимальная сторона при декодировании для моделей (0 - полное разрешение)
+
+# Бэкенд модели Marqo: 'torch' или 'onnx' (модель из detect_nude/marqo_onnx.py export)
+MARQO_BACKEND = os.getenv('MARQO_BACKEND', "torch")
+MARQO_ONNX_PATH = os.getenv('MARQO_ONNX_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), "models", "marqo_nsfw_384.int8.onnx")))
+
+# Каскад NSFW-детекторов: модели от дешевой к дорогой (nudenet, opennsfw2, marqo).
+# Следующая модель запускается, только если оценка предыдущей попала в зону неуверенности
+CASCADE_STAGES = [stage.strip() for stage in os.getenv('CASCADE_STAGES', "opennsfw2,marqo").split(',') if stage.strip()]
+CASCADE_SAFE_THRESHOLD = float(os.getenv('CASCADE_SAFE_THRESHOLD', "0.1"))  # оценка не выше - явно безопасное
+CASCADE_NSFW_THRESHOLD = float(os.getenv('CASCADE_NSFW_THRESHOLD', "0.9"))  # оценка не ниже - явно NSFW
+# Ранний выход из каскада. Пока выключен: пороги nsfw_score и отбор на проверку
+# рассчитаны на оценку Marqo, а с ранним выходом nsfw_score дает модель,
+# принявшая решение. Без него все этапы запускаются для каждого фото,
+# nsfw_score - оценка последнего этапа (Marqo), clip_nude_score - OpenNSFW2
+CASCADE_EARLY_EXIT = os.getenv('CASCADE_EARLY_EXIT', "0") == "1"
+NUDENET_INTRA_OP_THREADS = int(os.getenv('NUDENET_INTRA_OP_THREADS', "0"))  # потоки ONNX Runtime внутри оператора (0 - из CPU_THREAD_BUDGET)
+NUDENET_INTER_OP_THREADS = int(os.getenv('NUDENET_INTER_OP_THREADS', "0"))  # потоки ONNX Runtime между операторами (0 - из CPU_THREAD_BUDGET)
+
+# Политика сканирования: 'full' - все модели для каждого фото,
+# 'face_first' - сначала лица, NSFW модели только для фото без лиц
+# (пропущенные оценки досчитываются запуском с --backfill)
+SCAN_POLICY = os.getenv('SCAN_POLICY', "full")
+
+# Детектор лиц YOLO
+FACE_IMGSZ = int(os.getenv('FACE_IMGSZ', "640"))  # размер входа модели
+FACE_CONF = float(os.getenv('FACE_CONF', "0.25"))  # порог уверенности для лиц
+FACE_MAX_SIDE = int(os.getenv('FACE_MAX_SIDE', "1280"))  # большая сторона уменьшается до этого размера перед детекцией (0 - без уменьшения)
+FACE_BACKEND = os.getenv('FACE_BACKEND', "torch")  # 'torch' (ultralytics) или 'onnx' (модель из detect_nude/face_onnx.py export)
+FACE_ONNX_PATH = os.getenv('FACE_ONNX_PATH', "yolov8n-face.onnx")
+FACE_ONNX_THREADS = int(os.getenv('FACE_ONNX_THREADS', "0"))  # потоки ONNX Runtime (0 - из CPU_THREAD_BUDGET)
+
+# Параметры конвейера обработки
+WALK_WORKERS = int(os.getenv('WALK_WORKERS', "8"))  # потоки обхода директорий на SMB
+PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', "4"))  # потоки чтения и декодирования
+DECODE_QUEUE_SIZE = int(os.getenv('DECODE_QUEUE_SIZE', "32"))  # глубина очереди декодированных изображений
+RESULT_QUEUE_SIZE = int(os.getenv('RESULT_QUEUE_SIZE', "64"))  # глубина очереди результатов для записи в БД
+
+# Бюджет потоков CPU: делится поровну между процессами-обработчиками, в каждом
+# процессе задает потоки torch, TensorFlow, ONNX Runtime и OpenCV (detect_nude/runtime_config.py)
+CPU_THREAD_BUDGET = int(os.getenv('CPU_THREAD_BUDGET', "0"))  # всего потоков вычислений (0 - все доступные ядра)
+
+# Поиск почти-дубликатов (find_duplicates.py, review_scripts/select_for_review.py): фото с расстоянием Хэмминга
+# между phash не больше радиуса попадают в одну группу
+DUPLICATE_RADIUS = int(os.getenv('DUPLICATE_RADIUS', "4"))  # из 64 бит хеша
 
 # Параметры многопоточности
 MAX_WORKERS = min(4, os.cpu_count())  # Ограничиваем количество процессов
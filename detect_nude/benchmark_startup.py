@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Код, выполняемый в отдельном процессе: импорт скрипта и (опционально) загрузка моделей
+PROBE = r"""
+import os, sys, json, time, resource, importlib.util
+script_dir, script, models = sys.argv[1], sys.argv[2], sys.argv[3:]
+sys.path.insert(0, script_dir)
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("scan_script", os.path.join(script_dir, script))
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+timings = {}
+for name in models:
+    t = time.perf_counter()
+    module.models.get(name)
+    timings[name] = time.perf_counter() - t
+print(json.dumps({
+    "import_seconds": imported - started,
+    "model_seconds": timings,
+    "total_seconds": time.perf_counter() - started,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": [m for m in ("torch", "tensorflow", "transformers", "ultralytics", "opennsfw2") if m in sys.modules],
+}))
+"""
+
+
+def measure(script, models):
+    """Запускает замер в чистом процессе и возвращает результат"""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, SCRIPT_DIR, script, *models],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_measurement(title, result):
+    print(f"\n{title}")
+    print(f"  Импорт: {result['import_seconds']:.2f} с")
+    for name, seconds in result['model_seconds'].items():
+        print(f"  Загрузка {name}: {seconds:.2f} с")
+    print(f"  Всего: {result['total_seconds']:.2f} с, пик RSS: {result['max_rss_mb']:.0f} МБ")
+    print(f"  Загруженные тяжелые модули: {', '.join(result['heavy_modules']) or 'нет'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени запуска скриптов detect_nude")
+    parser.add_argument("--script", default="detect_nude.py", help="detect_nude.py или detect_nude_pg.py")
+    parser.add_argument("--models", nargs="*", default=["marqo", "opennsfw2", "face"],
+                        help="Модели для загрузки во втором замере (как это было при импорте раньше)")
+    parser.add_argument("--runs", type=int, default=3, help="Число повторов каждого замера")
+    args = parser.parse_args()
+
+    # Только импорт: так запускаются утилиты, которым нужны compute_sha256 или find_all_jpgs
+    lazy = min((measure(args.script, []) for _ in range(args.runs)), key=lambda r: r['total_seconds'])
+    print_measurement("Ленивый импорт (модели не загружаются)", lazy)
+
+    # Импорт и загрузка всех моделей: прежнее поведение при импорте модуля
+    eager = min((measure(args.script, args.models) for _ in range(args.runs)), key=lambda r: r['total_seconds'])
+    print_measurement("Импорт + загрузка всех моделей", eager)
+
+    print(f"\nВыигрыш при импорте: {eager['total_seconds'] - lazy['total_seconds']:.2f} с, "
+          f"{eager['max_rss_mb'] - lazy['max_rss_mb']:.0f} МБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from runtime_config import available_cpus
+
+# Код процесса-обработчика: загрузка моделей и прогон выборки изображений.
+# В режиме budget потоки задаются runtime_config, в режиме default библиотеки
+# сами занимают все ядра (как было до появления бюджета)
+PROBE = r"""
+import os, sys, json, time
+script_dir, mode, total, workers, images, models = (
+    sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), sys.argv[5], sys.argv[6:]
+)
+sys.path.insert(0, script_dir)
+import runtime_config
+if mode == "budget":
+    runtime_config.apply_thread_budget(runtime_config.thread_budget(total, workers))
+from model_registry import create_registry
+from image_context import ImageContext
+from cascade import STAGE_SCORERS
+
+registry = create_registry()
+paths = json.loads(images)
+contexts = [ImageContext.load(path, target_size=640) for path in paths]
+contexts = [context for context in contexts if context is not None and context.is_loaded]
+
+def run(name):
+    model = registry.get(name)
+    if name == "face":
+        return model.detect_faces_batch([context.bgr for context in contexts])
+    return STAGE_SCORERS[name](model, contexts)
+
+for name in models:
+    run(name)  # прогрев: загрузка модели и первая компиляция
+
+started = time.perf_counter()
+for name in models:
+    run(name)
+print(json.dumps({"images": len(contexts), "seconds": time.perf_counter() - started}))
+"""
+
+
+def collect_images(directory, limit):
+    """Первые limit изображений JPEG из директории"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(('.jpg', '.jpeg')):
+                paths.append(os.path.join(root, name))
+                if len(paths) >= limit:
+                    return paths
+    return paths
+
+
+def measure(mode, total, workers, paths, models):
+    """
+    Запускает workers процессов одновременно, каждый со своей копией моделей
+
+    Returns:
+        float: изображений в секунду суммарно по всем процессам
+    """
+    started = time.perf_counter()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", PROBE, SCRIPT_DIR, mode, str(total), str(workers),
+             json.dumps(paths), *models],
+            stdout=subprocess.PIPE, text=True
+        )
+        for _ in range(workers)
+    ]
+    results = []
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"Процесс замера завершился с кодом {process.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    # Загрузка моделей у процессов идет с разной скоростью, поэтому
+    # пропускная способность считается по самому медленному процессу
+    slowest = max(result['seconds'] for result in results)
+    return sum(result['images'] for result in results) / slowest if slowest > 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер пропускной способности с бюджетом потоков и без него")
+    parser.add_argument("images", help="Директория с изображениями выборки")
+    parser.add_argument("--limit", type=int, default=32, help="Изображений на процесс")
+    parser.add_argument("--models", nargs="*", default=["face", "opennsfw2", "marqo"],
+                        help="Модели, которые прогоняются в каждом процессе")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4],
+                        help="Число одновременных процессов-обработчиков")
+    parser.add_argument("--budget", type=int, default=0,
+                        help="Всего потоков на все процессы (0 - все доступные ядра)")
+    args = parser.parse_args()
+
+    paths = collect_images(args.images, args.limit)
+    if not paths:
+        print(f"❌ В {args.images} не найдено изображений")
+        sys.exit(1)
+
+    total = args.budget or available_cpus()
+    print(f"Ядер: {available_cpus()}, бюджет: {total}, изображений на процесс: {len(paths)}")
+    print(f"Модели: {', '.join(args.models)}\n")
+    print(f"{'Процессов':>10} {'Без бюджета':>14} {'С бюджетом':>14} {'Ускорение':>10}")
+
+    for workers in args.workers:
+        default = measure("default", total, workers, paths, args.models)
+        budget = measure("budget", total, workers, paths, args.models)
+        speedup = budget / default if default else 0.0
+        print(f"{workers:>10} {default:>10.1f} и/с {budget:>10.1f} и/с {speedup:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
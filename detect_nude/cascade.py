@@ -0,0 +1,173 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _score_marqo(model, contexts):
+    """Marqo ViT: один тензор на весь пакет"""
+    return model.analyze_batch([context.rgb for context in contexts])
+
+
+def _score_opennsfw2(model, contexts):
+    """OpenNSFW2: пакет уже декодированных изображений за один вызов модели"""
+    results = model.analyze_batch([context.rgb for context in contexts])
+    for result in results:
+        if 'is_erotic' in result:
+            result['is_nsfw'] = result['is_erotic']
+    return results
+
+
+def _score_nudenet(model, contexts):
+    """Классификатор NudeNet (ONNX): уже декодированные пиксели одним тензором"""
+    try:
+        scores = model.classify_batch([context.rgb for context in contexts])
+    except Exception as e:
+        logger.error(f"❌ Ошибка при анализе NudeNet: {str(e)}")
+        return [{'error': str(e)} for _ in contexts]
+    return [
+        {
+            'is_nsfw': score['unsafe'] > 0.5,
+            'nsfw_score': score['unsafe'],
+            'safe_score': score['safe'],
+            'confidence': max(score['unsafe'], score['safe'])
+        }
+        for score in scores
+    ]
+
+
+# Функции оценки пакета изображений для каждого этапа каскада
+STAGE_SCORERS = {
+    'nudenet': _score_nudenet,
+    'opennsfw2': _score_opennsfw2,
+    'marqo': _score_marqo,
+}
+
+
+class DetectorCascade:
+    """
+    Каскад NSFW-детекторов от дешевого к дорогому.
+
+    Следующий этап запускается только для изображений, оценка которых
+    на предыдущем этапе попала в зону неуверенности
+    (safe_threshold, nsfw_threshold). Явно безопасные и явно NSFW
+    изображения дальше не идут.
+
+    С early_exit=False все этапы выполняются для каждого изображения,
+    и итоговая оценка всегда принадлежит последнему этапу.
+    """
+
+    def __init__(self, models, stages, safe_threshold, nsfw_threshold, cache=None, early_exit=True):
+        """
+        Args:
+            models: ModelRegistry с моделями этапов
+            stages: имена моделей в порядке запуска (от дешевой к дорогой)
+            safe_threshold: оценка не выше порога - изображение безопасно
+            nsfw_threshold: оценка не ниже порога - изображение NSFW
+            cache: DetectionCache; модели этапов запускаются только для
+                изображений, которых нет в кеше
+            early_exit: пропускать следующие этапы для уверенных оценок
+        """
+        unknown = [stage for stage in stages if stage not in STAGE_SCORERS]
+        if unknown:
+            raise ValueError(f"Неизвестные этапы каскада: {', '.join(unknown)}")
+        if not stages:
+            raise ValueError("Каскад должен содержать хотя бы один этап")
+        self.models = models
+        self.stages = list(stages)
+        self.safe_threshold = safe_threshold
+        self.nsfw_threshold = nsfw_threshold
+        self.cache = cache
+        self.early_exit = early_exit
+
+    def is_confident(self, result):
+        """Оценка этапа достаточно уверенная, чтобы не запускать следующий"""
+        if not result or 'error' in result:
+            return False
+        score = result.get('nsfw_score', 0.0)
+        return score <= self.safe_threshold or score >= self.nsfw_threshold
+
+    def _score(self, stage, contexts):
+        """Результаты этапа: из кеша, модель загружается только при промахах"""
+        score = lambda batch: STAGE_SCORERS[stage](self.models.get(stage), batch)
+        if self.cache is None:
+            return score(contexts)
+        return self.cache.cached(stage, self.models.revision(stage), contexts, score)
+
+    def run(self, contexts):
+        """
+        Прогоняет пакет изображений через каскад
+
+        Args:
+            contexts: список ImageContext
+
+        Returns:
+            list: для каждого изображения словарь
+                'results' - результаты выполненных этапов по имени модели,
+                'final' - этап, результат которого считается итоговым,
+                'skipped' - пропущенные этапы
+        """
+        outcomes = [{'results': {}, 'final': None, 'skipped': []} for _ in contexts]
+        pending = list(range(len(contexts)))
+
+        for position, stage in enumerate(self.stages):
+            if not pending:
+                break
+
+            stage_results = self._score(stage, [contexts[i] for i in pending])
+
+            last_stage = position == len(self.stages) - 1
+            uncertain = []
+            for i, result in zip(pending, stage_results):
+                outcomes[i]['results'][stage] = result
+                if not result or 'error' in result:
+                    # Ошибку этапа решает следующий этап
+                    uncertain.append(i)
+                    continue
+                outcomes[i]['final'] = stage
+                if not last_stage and not (self.early_exit and self.is_confident(result)):
+                    uncertain.append(i)
+            pending = uncertain
+
+        for outcome in outcomes:
+            outcome['skipped'] = [
+                stage for stage in self.stages if stage not in outcome['results']
+            ]
+        return outcomes
+
+    def final_result(self, outcome):
+        """Результат этапа, принявшего решение (пустой словарь, если все этапы упали)"""
+        if outcome['final'] is None:
+            return {}
+        return outcome['results'][outcome['final']]
+
+    def skip_all(self):
+        """Результат для изображения, которое не проверяется на NSFW (все этапы пропущены)"""
+        return {'results': {}, 'final': None, 'skipped': list(self.stages)}
+
+    def scores(self, outcome):
+        """
+        Итоговые оценки каскада для записи в БД
+
+        Returns:
+            dict: nsfw_score, is_nsfw, confidence (None, если ни один этап
+                не дал результата), opennsfw2_score (None, если этап не
+                выполнялся) и skipped_stages - пропущенные этапы через запятую
+        """
+        final = self.final_result(outcome)
+        opennsfw2 = outcome['results'].get('opennsfw2')
+        if final:
+            nsfw_score = float(final.get('nsfw_score', 0.0))
+            is_nsfw = nsfw_score > 0.5 or bool(final.get('is_nsfw', False))
+            confidence = float(final.get('confidence', 0.0))
+        else:
+            nsfw_score = is_nsfw = confidence = None
+        return {
+            'nsfw_score': nsfw_score,
+            'is_nsfw': is_nsfw,
+            'confidence': confidence,
+            'opennsfw2_score': (
+                float(opennsfw2.get('nsfw_score', 0.0))
+                if opennsfw2 and 'error' not in opennsfw2 else None
+            ),
+            'skipped_stages': ','.join(outcome['skipped'])
+        }
@@ -1,3 +1,5 @@
+import hashlib
+import logging
 import torch
 import torchvision.transforms as T
 from PIL import Image
@@ -5,13 +7,132 @@ from transformers import AutoFeatureExtractor, AutoModelForImageClassification
 import numpy as np
 from transformers import CLIPModel, CLIPProcessor
 
+logger = logging.getLogger(__name__)
+
 class CLIPNudeChecker:
-    def __init__(self, device="cuda" if torch.cuda.is_available() else "cpu"):
+    def __init__(self, device="cuda" if torch.cuda.is_available() else "cpu", batch_size=32, store=None):
+        """
+        Args:
+            device: устройство для модели
+            batch_size: размер пакета изображений
+            store: EmbeddingStore с эмбеддингами изображений по sha256 (необязательно)
+        """
         self.device = device
+        self.batch_size = batch_size
+        self.store = store
         model_name = "openai/clip-vit-base-patch32"
         self.model = CLIPModel.from_pretrained(model_name).to(device)
+        self.model.eval()
         self.processor = CLIPProcessor.from_pretrained(model_name)
         
+        # Нормированные эмбеддинги текста по набору промптов
+        self._text_cache = {}
+        
+    def text_embeddings(self, prompts):
+        """Нормированные эмбеддинги промптов (кешируются по набору промптов)"""
+        key = tuple(prompts)
+        if key not in self._text_cache:
+            inputs = self.processor(text=list(prompts), return_tensors="pt", padding=True)
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            with torch.no_grad():
+                features = self.model.get_text_features(**inputs)
+            self._text_cache[key] = torch.nn.functional.normalize(features, dim=-1)
+        return self._text_cache[key]
+        
+    def embed_images(self, images, batch_size=None):
+        """
+        Эмбеддинги изображений пакетами (ненормированные признаки
+        get_image_features; с encode_image пакета clip не сверялись)
+        
+        Args:
+            images: пути или PIL изображения
+            batch_size: размер пакета (по умолчанию из конструктора)
+            
+        Returns:
+            np.ndarray: (число изображений, размерность) float32
+        """
+        batch_size = batch_size or self.batch_size
+        embeddings = []
+        for start in range(0, len(images), batch_size):
+            chunk = [
+                Image.open(image).convert("RGB") if isinstance(image, str) else image.convert("RGB")
+                for image in images[start:start + batch_size]
+            ]
+            inputs = self.processor(images=chunk, return_tensors="pt")
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            with torch.no_grad():
+                features = self.model.get_image_features(**inputs)
+            embeddings.append(features.cpu().numpy())
+        if not embeddings:
+            return np.zeros((0, self.model.config.projection_dim), dtype=np.float32)
+        return np.concatenate(embeddings).astype(np.float32)
+        
+    def embed_files(self, paths, hashes=None):
+        """
+        Эмбеддинги файлов: сначала из хранилища, модель - только для новых
+        
+        Args:
+            paths: пути к изображениям
+            hashes: hash_sha256 файлов (если не заданы, считаются по содержимому)
+            
+        Returns:
+            np.ndarray: (число файлов, размерность) float32; для файлов,
+                которые не удалось прочитать, строка из NaN
+        """
+        if self.store is None:
+            return self._embed_paths(paths)
+        if hashes is None:
+            hashes = [self._file_sha256(path) for path in paths]
+        return self.store.get_or_compute(list(hashes), list(paths), self._embed_paths)
+        
+    @staticmethod
+    def _file_sha256(path):
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+        
+    def _embed_paths(self, paths):
+        """Эмбеддинги по путям; нечитаемые файлы дают строку из NaN"""
+        images = []
+        valid = []
+        for i, path in enumerate(paths):
+            try:
+                images.append(Image.open(path).convert("RGB"))
+                valid.append(i)
+            except Exception as e:
+                logger.error(f"❌ Ошибка при чтении {path}: {str(e)}")
+        result = np.full((len(paths), self.model.config.projection_dim), np.nan, dtype=np.float32)
+        if images:
+            result[valid] = self.embed_images(images)
+        return result
+        
+    def score_prompt_sets(self, image_embeddings, prompt_sets):
+        """
+        Оценивает эмбеддинги изображений по нескольким наборам промптов
+        одним умножением матриц
+        
+        Args:
+            image_embeddings: результат embed_images или embed_files, (N, размерность)
+            prompt_sets: список наборов промптов
+            
+        Returns:
+            list: для каждого набора массив вероятностей (N, число промптов набора)
+        """
+        text = torch.cat([self.text_embeddings(prompts) for prompts in prompt_sets])
+        images = torch.as_tensor(np.asarray(image_embeddings), dtype=text.dtype, device=self.device)
+        images = torch.nn.functional.normalize(images, dim=-1)
+        
+        with torch.no_grad():
+            logits = self.model.logit_scale.exp() * images @ text.T
+        
+        # Softmax отдельно внутри каждого набора промптов
+        results = []
+        offset = 0
+        for prompts in prompt_sets:
+            set_logits = logits[:, offset:offset + len(prompts)]
+            results.append(torch.nn.functional.softmax(set_logits, dim=-1).cpu().numpy())
+            offset += len(prompts)
+        return results
+        
     def classify(self, image_path):
         """Базовая классификация safe/nsfw"""
         return self.classify_with_prompts(image_path, ["safe photo", "nsfw content"])
@@ -23,24 +144,15 @@ class CLIPNudeChecker:
     def classify_with_prompts(self, image_path, prompts):
         """Классификация с произвольными промптами"""
         try:
-            # Загружаем и обрабатываем изображение
-            image = Image.open(image_path).convert("RGB")
-            inputs = self.processor(
-                text=prompts,
-                images=image,
-                return_tensors="pt",
-                padding=True
-            )
-            
-            # Переносим на нужное устройство
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Получаем эмбеддинги
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                logits = outputs.logits_per_image[0]
-                probs = torch.nn.functional.softmax(logits, dim=-1)
-                scores = probs.cpu().numpy()
+            # Изображение кодируется один раз (или берется из хранилища),
+            # эмбеддинги промптов берутся из кеша
+            if isinstance(image_path, str):
+                embeddings = self.embed_files([image_path])
+                if np.isnan(embeddings).any():
+                    return {'error': f"Не удалось прочитать {image_path}"}
+            else:
+                embeddings = self.embed_images([image_path])
+            scores = self.score_prompt_sets(embeddings, [prompts])[0][0]
             
             # Возвращаем словарь с вероятностями
             return {
@@ -49,4 +161,4 @@ class CLIPNudeChecker:
             }
             
         except Exception as e:
-            return {'error': str(e)}
\ No newline at end of file
+            return {'error': str(e)}
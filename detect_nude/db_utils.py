@@ -0,0 +1,7 @@
+import sys
+
+
+def placeholder(conn):
+    """Плейсхолдер параметров для драйвера соединения (sqlite3 или psycopg2)"""
+    module = sys.modules.get(type(conn).__module__.split('.')[0])
+    return '?' if getattr(module, 'paramstyle', 'qmark') == 'qmark' else '%s'
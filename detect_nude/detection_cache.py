@@ -0,0 +1,189 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+
+from db_utils import placeholder
+
+logger = logging.getLogger(__name__)
+
+DETECTIONS_TABLE = "detections"
+
+
+def file_revision(path):
+    """Версия весов модели по файлу: имя, размер и время изменения"""
+    name = os.path.basename(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return name
+    return f"{name}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def _to_json(result):
+    # numpy числа и кортежи приводятся к обычным типам JSON
+    return json.dumps(result, ensure_ascii=False, default=float)
+
+
+class DetectionCache:
+    """
+    Кеш результатов детекторов по содержимому файла.
+
+    Ключ - (hash_sha256, модель, версия модели), значение - полный результат
+    модели (все вероятности) в JSON. Копии файла под другими путями
+    и повторные сканирования после перемещения не запускают модели.
+
+    Соединение открывается отдельно в каждом потоке и процессе
+    через переданную функцию connect, поэтому кешем можно пользоваться
+    из потоков конвейера и процессов-обработчиков.
+    """
+
+    def __init__(self, connect):
+        """
+        Args:
+            connect: функция без аргументов, возвращающая соединение с БД
+                (sqlite3 или psycopg2)
+        """
+        self.connect = connect
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            if conn is None:
+                raise RuntimeError("Нет соединения с БД для кеша детекций")
+            self._local.conn = conn
+        return conn
+
+    def ensure_schema(self, conn):
+        """Создает таблицу кеша детекций"""
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DETECTIONS_TABLE} (
+                hash_sha256 TEXT NOT NULL,
+                model TEXT NOT NULL,
+                revision TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at TEXT,
+                PRIMARY KEY (hash_sha256, model, revision)
+            )
+        """)
+        conn.commit()
+
+    def lookup(self, hashes, model, revision):
+        """
+        Результаты модели для набора хешей одним запросом
+
+        Returns:
+            dict: {sha256: результат} для найденных хешей
+        """
+        hashes = sorted({sha256 for sha256 in hashes if sha256})
+        if not hashes:
+            return {}
+        conn = self._conn()
+        ph = placeholder(conn)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT hash_sha256, result FROM {DETECTIONS_TABLE}
+            WHERE model = {ph} AND revision = {ph}
+              AND hash_sha256 IN ({', '.join([ph] * len(hashes))})
+        """, (model, revision, *hashes))
+        rows = cursor.fetchall()
+        conn.commit()
+        return {sha256: json.loads(result) for sha256, result in rows}
+
+    def covers(self, sha256, keys):
+        """
+        Есть ли в кеше результаты всех пар (модель, версия) для файла.
+
+        Позволяет не декодировать изображение, которому модели не понадобятся.
+        Ошибка БД считается промахом.
+
+        Args:
+            sha256: хеш содержимого файла
+            keys: пары (модель, версия)
+        """
+        if not sha256:
+            return False
+        try:
+            conn = self._conn()
+            ph = placeholder(conn)
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT model, revision FROM {DETECTIONS_TABLE}
+                WHERE hash_sha256 = {ph}
+            """, (sha256,))
+            found = set(cursor.fetchall())
+            conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Ошибка чтения кеша детекций: {str(e)}")
+            return False
+        return all(tuple(key) in found for key in keys)
+
+    def store(self, model, revision, entries):
+        """
+        Сохраняет результаты модели; ошибки детекторов не сохраняются
+
+        Args:
+            entries: пары (sha256, результат)
+        """
+        rows = [
+            (sha256, model, revision, _to_json(result), datetime.now().isoformat())
+            for sha256, result in entries
+            if sha256 and result and 'error' not in result
+        ]
+        if not rows:
+            return
+        conn = self._conn()
+        ph = placeholder(conn)
+        cursor = conn.cursor()
+        cursor.executemany(f"""
+            INSERT INTO {DETECTIONS_TABLE} (hash_sha256, model, revision, result, created_at)
+            VALUES ({ph}, {ph}, {ph}, {ph}, {ph})
+            ON CONFLICT (hash_sha256, model, revision) DO NOTHING
+        """, rows)
+        conn.commit()
+
+    def cached(self, model, revision, contexts, compute):
+        """
+        Результаты модели из кеша; для остальных изображений модель
+        запускается одним вызовом, и результаты сохраняются
+
+        Ошибка БД не останавливает обработку: изображения считаются моделью.
+
+        Args:
+            model: имя модели
+            revision: версия модели
+            contexts: список ImageContext
+            compute: функция [ImageContext] -> [результат]
+
+        Returns:
+            list: результаты в том же порядке, что и contexts
+        """
+        hashes = [context.sha256 for context in contexts]
+        try:
+            found = self.lookup(hashes, model, revision)
+        except Exception as e:
+            logger.error(f"❌ Ошибка чтения кеша детекций {model}: {str(e)}")
+            found = {}
+
+        # Копии одного файла в пакете считаются один раз
+        missing = {}
+        for i, sha256 in enumerate(hashes):
+            if sha256 not in found and sha256 not in missing:
+                missing[sha256] = i
+        hits = sum(sha256 in found for sha256 in hashes)
+        if hits:
+            logger.info(f"💾 {model}: из кеша {hits} из {len(contexts)}")
+        if not missing:
+            return [found[sha256] for sha256 in hashes]
+
+        computed = dict(zip(missing, compute([contexts[i] for i in missing.values()])))
+        try:
+            self.store(model, revision, computed.items())
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи кеша детекций {model}: {str(e)}")
+        found.update(computed)
+        return [found[sha256] for sha256 in hashes]
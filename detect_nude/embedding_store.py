@@ -0,0 +1,184 @@
+import os
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f16"
+IDS_FILE = "ids.txt"
+
+
+class EmbeddingStore:
+    """
+    Хранилище эмбеддингов изображений, адресуемое по hash_sha256.
+
+    Векторы лежат подряд в одном файле float16 и читаются через memmap,
+    идентификаторы - построчно в ids.txt (номер строки = номер вектора).
+    Оба файла только дописываются: вектор записывается раньше своего
+    идентификатора, а при открытии файлы выравниваются по длине, поэтому
+    оборванная запись просто не попадает в индекс.
+    """
+
+    def __init__(self, directory, dim=512):
+        """
+        Args:
+            directory: директория хранилища (создается при необходимости)
+            dim: размерность эмбеддингов
+        """
+        self.directory = directory
+        self.dim = dim
+        self.vectors_path = os.path.join(directory, VECTORS_FILE)
+        self.ids_path = os.path.join(directory, IDS_FILE)
+        self._lock = threading.Lock()
+        self._matrix = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _row_bytes(self):
+        return self.dim * np.dtype(np.float16).itemsize
+
+    def _load_index(self):
+        """Читает индекс идентификаторов, отбрасывая строки без полного вектора"""
+        ids = []
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, encoding="utf-8") as f:
+                ids = [line.strip() for line in f if line.strip()]
+
+        rows = os.path.getsize(self.vectors_path) // self._row_bytes() if os.path.exists(self.vectors_path) else 0
+        if len(ids) > rows:
+            logger.warning(f"⚠️ В индексе эмбеддингов {len(ids)} записей, векторов {rows}: лишние отброшены")
+            ids = ids[:rows]
+            with open(self.ids_path, "w", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key in ids))
+        elif rows > len(ids):
+            # Векторы записаны, а идентификаторы нет (запись прервана): обрезаем хвост
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(len(ids) * self._row_bytes())
+
+        self.ids = ids
+        self.index = {key: row for row, key in enumerate(ids)}
+        self._matrix = None
+        logger.info(f"📦 Эмбеддингов в хранилище: {len(ids)}")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def matrix(self):
+        """Все векторы хранилища как memmap (число записей, dim) float16"""
+        if self._matrix is None or self._matrix.shape[0] != len(self.ids):
+            if not self.ids:
+                return np.zeros((0, self.dim), dtype=np.float16)
+            self._matrix = np.memmap(
+                self.vectors_path, dtype=np.float16, mode="r", shape=(len(self.ids), self.dim)
+            )
+        return self._matrix
+
+    def get_many(self, keys):
+        """
+        Пакетное чтение эмбеддингов
+
+        Args:
+            keys: список hash_sha256
+
+        Returns:
+            tuple: (массив (len(keys), dim) float32 с нулями для отсутствующих,
+                булева маска найденных)
+        """
+        rows = np.array([self.index.get(key, -1) for key in keys], dtype=np.int64)
+        found = rows >= 0
+        result = np.zeros((len(keys), self.dim), dtype=np.float32)
+        if found.any():
+            result[found] = self.matrix()[rows[found]]
+        return result, found
+
+    def add_many(self, keys, embeddings):
+        """
+        Дописывает эмбеддинги; уже сохраненные ключи пропускаются
+
+        Args:
+            keys: список hash_sha256
+            embeddings: массив (len(keys), dim)
+
+        Returns:
+            int: число добавленных записей
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            new_keys = []
+            new_rows = []
+            seen = set()
+            for key, embedding in zip(keys, embeddings):
+                if key and key not in self.index and key not in seen:
+                    seen.add(key)
+                    new_keys.append(key)
+                    new_rows.append(embedding)
+            if not new_keys:
+                return 0
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(new_rows).astype(np.float16).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.ids_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key in new_keys))
+
+            for key in new_keys:
+                self.index[key] = len(self.ids)
+                self.ids.append(key)
+            return len(new_keys)
+
+    def get_or_compute(self, keys, items, compute):
+        """
+        Эмбеддинги из хранилища; отсутствующие считаются и сохраняются
+
+        Args:
+            keys: список hash_sha256
+            items: объекты, по которым считается эмбеддинг (пути, изображения)
+            compute: функция [items] -> массив (N, dim); строки NaN не сохраняются
+
+        Returns:
+            np.ndarray: (len(keys), dim) float32 в том же порядке
+        """
+        result, found = self.get_many(keys)
+        missing = [i for i in range(len(keys)) if not found[i]]
+        if missing:
+            computed = np.asarray(compute([items[i] for i in missing]), dtype=np.float32)
+            result[missing] = computed
+            valid = ~np.isnan(computed).any(axis=1)
+            self.add_many(
+                [keys[i] for i, ok in zip(missing, valid) if ok],
+                computed[valid]
+            )
+        return result
+
+    def most_similar(self, embedding, k=10):
+        """
+        Ближайшие по косинусной близости записи хранилища
+
+        Returns:
+            list: пары (hash_sha256, близость) по убыванию близости
+        """
+        matrix = self.matrix()
+        if not len(matrix):
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        similarities = np.empty(len(matrix), dtype=np.float32)
+        # Память не копируется целиком: хранилище читается блоками
+        for start in range(0, len(matrix), 65536):
+            block = np.asarray(matrix[start:start + 65536], dtype=np.float32)
+            norms = np.linalg.norm(block, axis=1)
+            norms[norms == 0] = 1.0
+            similarities[start:start + len(block)] = block @ query / norms
+
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(self.ids[i], float(similarities[i])) for i in top]
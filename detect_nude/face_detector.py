@@ -1,41 +1,113 @@
-from ultralytics import YOLO
 import cv2
+import numpy as np
 
 class FaceDetector:
-    def __init__(self, model_path="yolov8n-face.pt"):
+    def __init__(self, model_path="yolov8n-face.pt", imgsz=640, conf=0.25, max_side=None):
+        """
+        Args:
+            model_path: путь к весам YOLO
+            imgsz: размер входа модели
+            conf: порог уверенности для найденных лиц
+            max_side: изображения с большей стороной больше этой уменьшаются
+                перед передачей в модель (None - без уменьшения)
+        """
+        from ultralytics import YOLO
         self.model = YOLO(model_path)
+        self.imgsz = imgsz
+        self.conf = conf
+        self.max_side = max_side
 
-    def detect_faces(self, image):
+    @staticmethod
+    def _empty_result():
+        return {
+            'face_count': 0,
+            'face_locations': [],
+            'face_angles': [],
+            'face_landmarks': []
+        }
+
+    def _prepare(self, image, max_side):
+        """
+        Загружает и при необходимости уменьшает изображение
+
+        Returns:
+            tuple: (BGR массив или None, во сколько раз уменьшено)
+        """
         if isinstance(image, str):
             image = cv2.imread(image)
             if image is None:
-                return {
-                    'face_count': 0,
-                    'face_locations': [],
-                    'face_angles': [],
-                    'face_landmarks': []
-                }
+                return None, 1.0
 
-        results = self.model.predict(image, verbose=False)[0]
         height, width = image.shape[:2]
+        if max_side and max(height, width) > max_side:
+            ratio = max_side / max(height, width)
+            image = cv2.resize(
+                image,
+                (max(1, round(width * ratio)), max(1, round(height * ratio))),
+                interpolation=cv2.INTER_AREA
+            )
+            return image, width / image.shape[1]
+        return image, 1.0
 
-        face_locations = []
-        face_angles = []
-        face_landmarks = []
+    def _predict_boxes(self, arrays, imgsz, conf):
+        """
+        Рамки лиц для списка BGR массивов одним вызовом модели
 
-        for box in results.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            w, h = x2 - x1, y2 - y1
-            face_locations.append((x1, y1, w, h))
-            face_angles.append(0.0)
-            face_landmarks.append([])
+        Returns:
+            list: для каждого массива numpy массив рамок (x1, y1, x2, y2)
+                в координатах переданного массива
+        """
+        predictions = self.model.predict(arrays, imgsz=imgsz, conf=conf, verbose=False)
+        return [prediction.boxes.xyxy.cpu().numpy() for prediction in predictions]
 
-        return {
-            'face_count': len(face_locations),
-            'face_locations': face_locations,
-            'face_angles': face_angles,
-            'face_landmarks': face_landmarks
-        }
+    def detect_faces_batch(self, images, scales=None, imgsz=None, conf=None, max_side=None):
+        """
+        Обнаруживает лица на пакете изображений одним вызовом YOLO
+
+        Args:
+            images: список BGR массивов или путей к изображениям
+            scales: для каждого изображения множитель до исходного разрешения,
+                если оно уже передано уменьшенным (по умолчанию 1.0)
+            imgsz: размер входа модели (по умолчанию из конструктора)
+            conf: порог уверенности (по умолчанию из конструктора)
+            max_side: ограничение большей стороны (по умолчанию из конструктора)
+
+        Returns:
+            list: результаты в том же порядке, что и images;
+                координаты лиц - в масштабе исходных изображений
+        """
+        imgsz = imgsz or self.imgsz
+        conf = self.conf if conf is None else conf
+        max_side = max_side or self.max_side
+        scales = scales or [1.0] * len(images)
+
+        prepared = []
+        for image, scale in zip(images, scales):
+            array, ratio = self._prepare(image, max_side)
+            prepared.append((array, scale * ratio))
+
+        valid = [array for array, _ in prepared if array is not None]
+        predictions = iter(self._predict_boxes(valid, imgsz, conf) if valid else [])
+
+        results = []
+        for array, scale in prepared:
+            if array is None:
+                results.append(self._empty_result())
+                continue
+
+            boxes = next(predictions)
+            result = self._empty_result()
+            for box in boxes:
+                x1, y1, x2, y2 = (int(round(float(value) * scale)) for value in box)
+                result['face_locations'].append((x1, y1, x2 - x1, y2 - y1))
+                result['face_angles'].append(0.0)
+                result['face_landmarks'].append([])
+            result['face_count'] = len(result['face_locations'])
+            results.append(result)
+        return results
+
+    def detect_faces(self, image, scale=1.0):
+        return self.detect_faces_batch([image], scales=[scale])[0]
 
     def analyze_faces(self, image):
         faces = self.detect_faces(image)
@@ -60,3 +132,104 @@ class FaceDetector:
             result['faces'].append(face_info)
 
         return result
+
+
+class OnnxFaceDetector(FaceDetector):
+    """
+    Детектор лиц YOLOv8 на ONNX Runtime для CPU.
+
+    Модель экспортируется face_onnx.py с фиксированной формой входа
+    (1, 3, imgsz, imgsz); изображения приводятся к ней letterbox-ом,
+    как в ultralytics. Результат совпадает по формату с FaceDetector.
+    """
+
+    def __init__(self, model_path="yolov8n-face.onnx", conf=0.25, max_side=None,
+                 threads=None, iou=0.7):
+        """
+        Args:
+            model_path: путь к ONNX модели
+            conf: порог уверенности для найденных лиц
+            max_side: ограничение большей стороны перед детекцией
+            threads: число потоков ONNX Runtime внутри оператора (None - по умолчанию)
+            iou: порог IoU для подавления пересекающихся рамок
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Форма входа фиксируется при экспорте, imgsz берется из модели
+        self.imgsz = int(model_input.shape[2])
+        self.conf = conf
+        self.max_side = max_side
+        self.iou = iou
+
+    def _letterbox(self, image):
+        """
+        Приводит изображение к квадрату imgsz с сохранением пропорций
+
+        Returns:
+            tuple: (тензор 1x3xHxW, коэффициент масштаба, отступ x, отступ y)
+        """
+        height, width = image.shape[:2]
+        ratio = min(self.imgsz / height, self.imgsz / width)
+        new_width, new_height = round(width * ratio), round(height * ratio)
+        pad_x = (self.imgsz - new_width) / 2
+        pad_y = (self.imgsz - new_height) / 2
+
+        resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        top, left = round(pad_y - 0.1), round(pad_x - 0.1)
+        canvas = cv2.copyMakeBorder(
+            resized, top, self.imgsz - new_height - top, left, self.imgsz - new_width - left,
+            cv2.BORDER_CONSTANT, value=(114, 114, 114)
+        )
+        tensor = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)[np.newaxis]
+        return np.ascontiguousarray(tensor, dtype=np.float32) / 255.0, ratio, left, top
+
+    def _decode(self, output, conf, ratio, left, top, shape):
+        """Рамки из выхода YOLOv8 (1, 4 + 1 + ..., N) с NMS и обратным letterbox"""
+        predictions = output[0].T
+        scores = predictions[:, 4]
+        keep = scores >= conf
+        predictions, scores = predictions[keep], scores[keep]
+        if not len(scores):
+            return np.zeros((0, 4), dtype=np.float32)
+
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        boxes = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+        indices = cv2.dnn.NMSBoxes(boxes.tolist(), scores.tolist(), conf, self.iou)
+        boxes = boxes[np.array(indices, dtype=int).reshape(-1)]
+
+        height, width = shape[:2]
+        x1 = np.clip((boxes[:, 0] - left) / ratio, 0, width)
+        y1 = np.clip((boxes[:, 1] - top) / ratio, 0, height)
+        x2 = np.clip((boxes[:, 0] + boxes[:, 2] - left) / ratio, 0, width)
+        y2 = np.clip((boxes[:, 1] + boxes[:, 3] - top) / ratio, 0, height)
+        return np.stack([x1, y1, x2, y2], axis=1)
+
+    def _predict_boxes(self, arrays, imgsz, conf):
+        """Рамки лиц: форма входа фиксирована, изображения идут по одному"""
+        results = []
+        for array in arrays:
+            tensor, ratio, left, top = self._letterbox(array)
+            output = self.session.run(None, {self.input_name: tensor})[0]
+            results.append(self._decode(output, conf, ratio, left, top, array.shape))
+        return results
+
+
+def export_onnx(model_path="yolov8n-face.pt", imgsz=640, opset=12):
+    """
+    Экспортирует YOLO модель лиц в ONNX с фиксированной формой входа
+
+    Returns:
+        str: путь к ONNX модели (рядом с исходной)
+    """
+    from ultralytics import YOLO
+    return YOLO(model_path).export(
+        format="onnx", imgsz=imgsz, dynamic=False, simplify=True, opset=opset, batch=1
+    )
@@ -0,0 +1,154 @@
+import os
+import sys
+import time
+import logging
+import argparse
+
+import cv2
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from face_detector import FaceDetector, OnnxFaceDetector, export_onnx
+from walker import walk_files
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def iou(a, b):
+    """IoU двух рамок (x, y, ширина, высота)"""
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    inter_w = max(0, min(ax2, bx2) - max(a[0], b[0]))
+    inter_h = max(0, min(ay2, by2) - max(a[1], b[1]))
+    inter = inter_w * inter_h
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_boxes(reference, candidate):
+    """
+    Жадное сопоставление рамок по IoU
+
+    Returns:
+        tuple: (список IoU сопоставленных пар, число несопоставленных рамок)
+    """
+    pairs = sorted(
+        ((iou(a, b), i, j) for i, a in enumerate(reference) for j, b in enumerate(candidate)),
+        reverse=True
+    )
+    used_ref, used_cand, ious = set(), set(), []
+    for value, i, j in pairs:
+        if value <= 0 or i in used_ref or j in used_cand:
+            continue
+        used_ref.add(i)
+        used_cand.add(j)
+        ious.append(value)
+    unmatched = len(reference) - len(used_ref) + len(candidate) - len(used_cand)
+    return ious, unmatched
+
+
+def parity(images_dir, pt_path, onnx_path, limit=100, conf=0.25, max_side=1280,
+           min_iou=0.9, max_count_mismatch=0.02):
+    """
+    Сравнивает рамки лиц PyTorch и ONNX моделей на выборке изображений
+
+    Returns:
+        bool: True, если расхождения в допустимых пределах
+    """
+    torch_detector = FaceDetector(pt_path, conf=conf, max_side=max_side)
+    onnx_detector = OnnxFaceDetector(onnx_path, conf=conf, max_side=max_side)
+    torch_detector.imgsz = onnx_detector.imgsz
+
+    images = 0
+    count_mismatch = 0
+    unmatched_boxes = 0
+    ious = []
+    timings = {'torch': 0.0, 'onnx': 0.0}
+
+    for entry in walk_files(images_dir, with_stat=False):
+        if images >= limit:
+            break
+        image = cv2.imread(entry.path)
+        if image is None:
+            logger.error(f"❌ Не удалось загрузить изображение: {entry.path}")
+            continue
+        images += 1
+
+        started = time.perf_counter()
+        expected = torch_detector.detect_faces(image)
+        timings['torch'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        actual = onnx_detector.detect_faces(image)
+        timings['onnx'] += time.perf_counter() - started
+
+        if expected['face_count'] != actual['face_count']:
+            count_mismatch += 1
+            logger.warning(
+                f"⚠️ Число лиц {expected['face_count']} != {actual['face_count']}: {entry.path}"
+            )
+        matched, unmatched = match_boxes(expected['face_locations'], actual['face_locations'])
+        ious.extend(matched)
+        unmatched_boxes += unmatched
+
+    if not images:
+        logger.error(f"❌ В {images_dir} не найдено изображений")
+        return False
+
+    mean_iou = sum(ious) / len(ious) if ious else 1.0
+    min_found_iou = min(ious) if ious else 1.0
+    mismatch_ratio = count_mismatch / images
+
+    print(f"\nВыборка: {images} изображений, вход {onnx_detector.imgsz}")
+    print(f"  PyTorch: {timings['torch'] / images * 1000:.1f} мс/изображение")
+    print(f"  ONNX:    {timings['onnx'] / images * 1000:.1f} мс/изображение")
+    print(f"  Разное число лиц: {count_mismatch} ({mismatch_ratio:.1%})")
+    print(f"  Несопоставленных рамок: {unmatched_boxes}")
+    print(f"  IoU сопоставленных рамок: среднее {mean_iou:.3f}, минимум {min_found_iou:.3f}")
+
+    passed = mean_iou >= min_iou and mismatch_ratio <= max_count_mismatch
+    print(f"\n{'✅ Паритет соблюден' if passed else '❌ Паритет нарушен'}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Экспорт модели лиц YOLO в ONNX и проверка паритета")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Экспорт в ONNX с фиксированной формой входа")
+    export_parser.add_argument("--model", default="yolov8n-face.pt")
+    export_parser.add_argument("--imgsz", type=int, default=640)
+    export_parser.add_argument("--opset", type=int, default=12)
+
+    parity_parser = subparsers.add_parser("parity", help="Сравнение рамок PyTorch и ONNX на выборке")
+    parity_parser.add_argument("images", help="Директория с изображениями выборки")
+    parity_parser.add_argument("--model", default="yolov8n-face.pt")
+    parity_parser.add_argument("--onnx", default="yolov8n-face.onnx")
+    parity_parser.add_argument("--limit", type=int, default=100, help="Размер выборки")
+    parity_parser.add_argument("--conf", type=float, default=0.25)
+    parity_parser.add_argument("--max-side", type=int, default=1280)
+    parity_parser.add_argument("--min-iou", type=float, default=0.9,
+                               help="Минимальное среднее IoU сопоставленных рамок")
+    parity_parser.add_argument("--max-count-mismatch", type=float, default=0.02,
+                               help="Допустимая доля изображений с разным числом лиц")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        path = export_onnx(args.model, imgsz=args.imgsz, opset=args.opset)
+        logger.info(f"✅ Модель сохранена: {path}")
+    else:
+        passed = parity(
+            args.images, args.model, args.onnx, limit=args.limit, conf=args.conf,
+            max_side=args.max_side or None, min_iou=args.min_iou,
+            max_count_mismatch=args.max_count_mismatch
+        )
+        sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
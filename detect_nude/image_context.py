@@ -0,0 +1,193 @@
+import io
+import os
+import hashlib
+import logging
+from datetime import datetime
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+from PIL.ExifTags import TAGS
+
+from jpeg_header import read_jpeg_size
+
+logger = logging.getLogger(__name__)
+
+# Теги EXIF с датой съемки в порядке приоритета
+EXIF_DATE_TAGS = ('DateTimeOriginal', 'DateTimeDigitized')
+EXIF_DATE_FORMAT = '%Y:%m:%d %H:%M:%S'
+
+
+class ImageContext:
+    """
+    Изображение, прочитанное с диска один раз и декодированное один раз.
+
+    Все этапы анализа (хеш, EXIF, проверка размеров, детекторы) берут
+    байты и пиксели отсюда, а не открывают файл заново.
+
+    Если задан target_size, JPEG декодируется с масштабированием DCT
+    (1/2, 1/4 или 1/8) до наименьшего размера, у которого обе стороны
+    не меньше target_size. Полное разрешение декодируется только по
+    явному запросу full_rgb().
+    """
+
+    def __init__(self, path, data, mtime=None, file_size=None, dimensions=None, target_size=None):
+        self.path = path
+        self.data = data
+        self.mtime = mtime
+        self.file_size = file_size if file_size is not None else (len(data) if data is not None else None)
+        self.dimensions = dimensions
+        self.target_size = target_size
+        self._sha256 = None
+        self._header = None
+        self._rgb = None
+        self._oriented = None
+        self._bgr = None
+
+    @classmethod
+    def load(cls, path, accept=None, target_size=None):
+        """
+        Читает файл целиком за одно обращение к диску.
+
+        Сначала из заголовка JPEG берутся размеры; если accept их отвергает,
+        остальная часть файла не читается и контекст содержит только
+        размеры (data = None).
+
+        Args:
+            path: путь к изображению
+            accept: функция (ширина, высота) -> bool для предварительного отбора
+            target_size: минимальная сторона декодированного изображения
+                (None - полное разрешение)
+
+        Returns:
+            ImageContext: контекст изображения
+        """
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            dimensions = read_jpeg_size(f)
+            if dimensions is not None and accept is not None and not accept(*dimensions):
+                return cls(path, None, stat.st_mtime, stat.st_size, dimensions, target_size)
+            f.seek(0)
+            data = f.read()
+        return cls(path, data, stat.st_mtime, stat.st_size, dimensions, target_size)
+
+    @property
+    def is_loaded(self):
+        """Прочитано ли содержимое файла (а не только заголовок)"""
+        return self.data is not None
+
+    @property
+    def sha256(self):
+        """SHA256 от уже прочитанных байтов (None, если прочитан только заголовок)"""
+        if self._sha256 is None and self.data is not None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest()
+        return self._sha256
+
+    @property
+    def header(self):
+        """Открытый PIL образ без декодирования пикселей (размеры, EXIF)"""
+        if self._header is None:
+            self._header = Image.open(io.BytesIO(self.data))
+        return self._header
+
+    @property
+    def size(self):
+        """Размеры изображения (ширина, высота), по возможности из заголовка JPEG"""
+        if self.dimensions is None:
+            self.dimensions = self.header.size
+        return self.dimensions
+
+    @property
+    def rgb(self):
+        """Декодированное RGB изображение PIL (уменьшенное, если задан target_size)"""
+        if self._rgb is None:
+            # Исходные размеры запоминаются до draft(), который их меняет
+            width, height = self.size
+            image = self.header
+            if self.target_size and min(width, height) > self.target_size:
+                image.draft('RGB', (self.target_size, self.target_size))
+            self._rgb = image.convert('RGB')
+        return self._rgb
+
+    @property
+    def scale(self):
+        """Во сколько раз исходное изображение больше декодированного"""
+        return self.size[0] / self.rgb.size[0]
+
+    def full_rgb(self):
+        """
+        Декодирует изображение в полном разрешении (не кешируется).
+
+        Нужно только этапам, которым явно требуются все пиксели.
+        """
+        if not self.target_size or self.scale == 1:
+            return self.rgb
+        with Image.open(io.BytesIO(self.data)) as image:
+            return image.convert('RGB')
+
+    @property
+    def oriented_rgb(self):
+        """
+        Декодированное RGB изображение с примененной ориентацией из EXIF,
+        как после cv2.imread (по нему считались хеши и работал детектор лиц)
+        """
+        if self._oriented is None:
+            self._oriented = ImageOps.exif_transpose(self.rgb)
+        return self._oriented
+
+    @property
+    def bgr(self):
+        """
+        Массив BGR для OpenCV/YOLO.
+
+        Строится из уже декодированного RGB; ориентация из EXIF применяется
+        так же, как это делал cv2.imread.
+        """
+        if self._bgr is None:
+            self._bgr = cv2.cvtColor(np.asarray(self.oriented_rgb), cv2.COLOR_RGB2BGR)
+        return self._bgr
+
+    def decode(self):
+        """Декодирует пиксели заранее, чтобы не делать этого на стадии инференса"""
+        self.bgr
+        return self
+
+    def stream(self):
+        """Файловый объект поверх общих байтов для библиотек, ожидающих файл"""
+        return io.BytesIO(self.data)
+
+    def shooting_date(self):
+        """
+        Дата съемки из EXIF
+
+        Returns:
+            str: дата в формате ISO или None, если в EXIF ее нет
+        """
+        try:
+            exif = self.header._getexif()
+        except Exception:
+            return None
+        if not exif:
+            return None
+
+        for tag_id, value in exif.items():
+            if TAGS.get(tag_id, tag_id) in EXIF_DATE_TAGS:
+                try:
+                    return datetime.strptime(value, EXIF_DATE_FORMAT).isoformat()
+                except (TypeError, ValueError):
+                    pass
+        return None
+
+    def modification_date(self):
+        """Дата изменения файла в формате ISO"""
+        mtime = self.mtime if self.mtime is not None else os.path.getmtime(self.path)
+        return datetime.fromtimestamp(mtime).isoformat()
+
+    def release(self):
+        """Освобождает декодированные пиксели, оставляя байты и хеш"""
+        self._rgb = None
+        self._oriented = None
+        self._bgr = None
+        if self._header is not None:
+            self._header.close()
+            self._header = None
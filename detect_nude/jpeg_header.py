@@ -0,0 +1,108 @@
+import io
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Маркеры SOF (Start Of Frame), в которых записаны размеры кадра.
+# C4 (DHT), C8 (JPG) и CC (DAC) - не SOF, хотя лежат в том же диапазоне
+SOF_MARKERS = {
+    0xC0, 0xC1, 0xC2, 0xC3,
+    0xC5, 0xC6, 0xC7,
+    0xC9, 0xCA, 0xCB,
+    0xCD, 0xCE, 0xCF,
+}
+
+# Маркеры без поля длины
+STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
+
+# Чтение заголовка прекращается после этого объема (EXIF и ICC обычно меньше)
+MAX_HEADER_BYTES = 1 << 20
+
+
+def _read_jpeg_size(f):
+    """Разбирает маркеры JPEG до SOF, пропуская сегменты через seek"""
+    if f.read(2) != b'\xff\xd8':
+        return None
+
+    while f.tell() < MAX_HEADER_BYTES:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+
+        # Между маркерами допускаются байты-заполнители 0xFF
+        marker = 0xFF
+        while marker == 0xFF:
+            byte = f.read(1)
+            if not byte:
+                return None
+            marker = byte[0]
+
+        if marker in STANDALONE_MARKERS or marker == 0x00:
+            continue
+        if marker in (0xD9, 0xDA):
+            # Конец изображения или начало данных без SOF
+            return None
+
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+
+        if marker in SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            _, height, width = struct.unpack('>BHH', frame)
+            return width, height
+
+        f.seek(length - 2, io.SEEK_CUR)
+
+    return None
+
+
+def read_jpeg_size(source):
+    """
+    Размеры JPEG из маркера SOF без декодирования пикселей.
+
+    Читаются только заголовки сегментов (обычно первые несколько КБ файла),
+    содержимое EXIF и других сегментов пропускается.
+
+    Args:
+        source: путь к файлу, bytes или открытый бинарный файл
+            (читается с текущей позиции)
+
+    Returns:
+        tuple: (ширина, высота) или None, если это не JPEG или SOF не найден
+    """
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return _read_jpeg_size(io.BytesIO(source))
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                return _read_jpeg_size(f)
+        return _read_jpeg_size(source)
+    except (OSError, struct.error) as e:
+        logger.error(f"❌ Ошибка при чтении заголовка JPEG: {str(e)}")
+        return None
+
+
+def read_image_size(path):
+    """
+    Размеры изображения: для JPEG по заголовку, для остальных форматов через PIL
+
+    Returns:
+        tuple: (ширина, высота) или None
+    """
+    size = read_jpeg_size(path)
+    if size is not None:
+        return size
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            return img.size
+    except Exception as e:
+        logger.error(f"❌ Ошибка при получении размеров {path}: {str(e)}")
+        return None
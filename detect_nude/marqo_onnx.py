@@ -0,0 +1,305 @@
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from onnx_nsfw_detector import OnnxMarqoDetector, preprocess_image, preprocess_path
+from image_context import ImageContext
+from walker import walk_files
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "models"))
+FP32_NAME = "marqo_nsfw_384.onnx"
+INT8_NAME = "marqo_nsfw_384.int8.onnx"
+
+# Допустимое расхождение предобработки на numpy с процессором модели
+PREPROCESS_TOLERANCE = 1e-3
+
+# Отчет о расхождении с PyTorch сохраняется рядом с моделями
+REPORT_NAME = "marqo_onnx_report.json"
+# Границы, при которых ONNX модель можно ставить вместо PyTorch (MARQO_BACKEND=onnx):
+# p95 |Δ nsfw_score| и доля изображений, у которых изменилось решение при пороге
+ACCEPT_P95_DIFF = 0.02
+ACCEPT_FLIP_RATE = 0.01
+
+
+def preprocess_config(processor, id2label):
+    """
+    Параметры предобработки процессора Marqo для OnnxMarqoDetector
+
+    Процессор timm-модели работает только с torch, поэтому для ONNX бэкенда
+    его параметры сохраняются в JSON и повторяются на numpy.
+    """
+    data_config = getattr(processor, "data_config", None)
+    if data_config:
+        # Процессор timm: resize меньшей стороны и центральный кроп
+        if data_config.get("crop_mode", "center") != "center":
+            raise ValueError(f"Неподдерживаемый crop_mode: {data_config['crop_mode']}")
+        height, width = data_config["input_size"][1:]
+        crop_pct = data_config.get("crop_pct") or 1.0
+        config = {
+            "mode": "center_crop",
+            "resize": int(math.floor(height / crop_pct)),
+            "size": [height, width],
+            "interpolation": data_config["interpolation"],
+            "mean": list(data_config["mean"]),
+            "std": list(data_config["std"]),
+        }
+    else:
+        # Процессор transformers (ViTImageProcessor и т.п.): растяжение до размера входа
+        from PIL import Image
+        names = {Image.NEAREST: "nearest", Image.BILINEAR: "bilinear",
+                 Image.BICUBIC: "bicubic", Image.LANCZOS: "lanczos"}
+        config = {
+            "mode": "squash",
+            "size": [processor.size["height"], processor.size["width"]],
+            "interpolation": names[processor.resample],
+            "mean": list(processor.image_mean),
+            "std": list(processor.image_std),
+        }
+    config["id2label"] = {str(idx): label for idx, label in id2label.items()}
+    return config
+
+
+def check_preprocess(processor, config):
+    """Сравнивает предобработку на numpy с процессором на неквадратных изображениях"""
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    for size in ((500, 333), (333, 500), (384, 384)):
+        image = Image.fromarray(rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8))
+        expected = processor(images=[image], return_tensors="np")["pixel_values"][0]
+        actual = preprocess_image(image, config)
+        diff = float(np.abs(np.asarray(expected, dtype=np.float32) - actual).max())
+        if diff > PREPROCESS_TOLERANCE:
+            raise RuntimeError(f"Предобработка на numpy расходится с процессором на {diff:.4f} для {size}")
+    logger.info("✅ Предобработка на numpy совпадает с процессором модели")
+
+
+def export(output_dir, opset=17, quantize=True):
+    """
+    Экспортирует Marqo в ONNX и создает динамически квантизованную int8 версию
+
+    Returns:
+        list: пути к созданным моделям
+    """
+    import torch
+    from PIL import Image
+    from nsfw_detector import MarqoNSFWDetector
+
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, FP32_NAME)
+
+    detector = MarqoNSFWDetector(batch_size=1)
+    model = detector.model.to("cpu").eval()
+
+    class LogitsOnly(torch.nn.Module):
+        """Обертка, возвращающая только логиты (ONNX не поддерживает выход-словарь)"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return self.model(pixel_values=pixel_values).logits
+
+    # Форма входа берется из процессора модели
+    dummy = detector.processor(images=[Image.new("RGB", (384, 384))], return_tensors="pt")["pixel_values"]
+    config = preprocess_config(detector.processor, detector.id2label)
+    check_preprocess(detector.processor, config)
+
+    logger.info(f"🔄 Экспорт в ONNX: {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            LogitsOnly(model),
+            (dummy,),
+            fp32_path,
+            input_names=["pixel_values"],
+            output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=opset,
+            do_constant_folding=True
+        )
+    paths = [fp32_path]
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        int8_path = os.path.join(output_dir, INT8_NAME)
+        logger.info(f"🔄 Динамическая квантизация int8: {int8_path}")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        paths.append(int8_path)
+
+    for path in paths:
+        # Предобработка и классы для OnnxMarqoDetector, которому не нужен torch
+        with open(preprocess_path(path), "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        logger.info(f"✅ {path}: {os.path.getsize(path) / 1024 / 1024:.1f} МБ")
+    return paths
+
+
+def load_sample(images_dir, limit, decode_size):
+    """Изображения выборки, декодированные так же, как при сканировании"""
+    images = []
+    for entry in walk_files(images_dir, with_stat=False):
+        try:
+            context = ImageContext.load(entry.path, target_size=decode_size or None)
+            images.append((entry.path, context.rgb.copy()))
+            context.release()
+        except Exception as e:
+            logger.error(f"❌ Ошибка при чтении {entry.path}: {str(e)}")
+        if len(images) >= limit:
+            break
+    return images
+
+
+def run_detector(detector, images, batch_size):
+    """
+    Returns:
+        tuple: (массив nsfw_score, секунд на изображение)
+    """
+    # Первый пакет прогревает модель и в замер не входит
+    detector.analyze_batch(images[:batch_size], batch_size=batch_size)
+    started = time.perf_counter()
+    results = detector.analyze_batch(images, batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    return np.array([result['nsfw_score'] for result in results]), elapsed / len(images)
+
+
+def compare(reference, scores, thresholds):
+    """Расхождение оценок с эталонной моделью PyTorch"""
+    diff = np.abs(scores - reference)
+    report = {
+        "mean_abs_diff": float(diff.mean()),
+        "p95_abs_diff": float(np.percentile(diff, 95)),
+        "max_abs_diff": float(diff.max()),
+        "decision_flips": {}
+    }
+    for threshold in thresholds:
+        flips = int(np.sum((reference > threshold) != (scores > threshold)))
+        report["decision_flips"][str(threshold)] = flips
+    report["accepted"] = bool(
+        report["p95_abs_diff"] <= ACCEPT_P95_DIFF
+        and max(report["decision_flips"].values(), default=0) <= ACCEPT_FLIP_RATE * len(diff)
+    )
+    return report
+
+
+def report(images_dir, model_dir, limit=200, batch_size=8, decode_size=640,
+           thresholds=(0.1, 0.5, 0.9), output=None):
+    """
+    Отчет о расхождении ONNX (fp32 и int8) с PyTorch на выборке изображений
+
+    По умолчанию сохраняется в model_dir/REPORT_NAME, рядом с моделями,
+    для которых он посчитан.
+
+    Returns:
+        dict: скорость каждого бэкенда и ошибки относительно PyTorch
+    """
+    images = load_sample(images_dir, limit, decode_size)
+    if not images:
+        logger.error(f"❌ В {images_dir} не найдено изображений")
+        return None
+    pixels = [image for _, image in images]
+    logger.info(f"📊 Выборка: {len(pixels)} изображений")
+
+    from nsfw_detector import MarqoNSFWDetector
+
+    reference, reference_time = run_detector(MarqoNSFWDetector(batch_size=batch_size), pixels, batch_size)
+    result = {
+        "images": len(pixels),
+        "batch_size": batch_size,
+        "thresholds": list(thresholds),
+        "accept": {"p95_abs_diff": ACCEPT_P95_DIFF, "flip_rate": ACCEPT_FLIP_RATE},
+        "backends": {"torch": {"ms_per_image": reference_time * 1000}}
+    }
+
+    for name in (FP32_NAME, INT8_NAME):
+        path = os.path.join(model_dir, name)
+        if not os.path.exists(path):
+            logger.warning(f"⚠️ Модель не найдена: {path}")
+            continue
+        scores, seconds = run_detector(OnnxMarqoDetector(path, batch_size=batch_size), pixels, batch_size)
+        entry = compare(reference, scores, thresholds)
+        entry["ms_per_image"] = seconds * 1000
+        entry["speedup"] = reference_time / seconds
+        # Изображения с наибольшим расхождением - для ручной проверки
+        worst = np.argsort(-np.abs(scores - reference))[:5]
+        entry["worst"] = [
+            {"path": images[i][0], "torch": float(reference[i]), "onnx": float(scores[i])}
+            for i in worst
+        ]
+        result["backends"][name] = entry
+
+    print_report(result)
+    output = output or os.path.join(model_dir, REPORT_NAME)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    logger.info(f"💾 Отчет сохранен: {output}")
+    return result
+
+
+def print_report(result):
+    print(f"\nВыборка: {result['images']} изображений, пакет {result['batch_size']}")
+    for name, entry in result["backends"].items():
+        print(f"\n{name}: {entry['ms_per_image']:.1f} мс/изображение", end="")
+        if "speedup" not in entry:
+            print(" (эталон)")
+            continue
+        print(f", ускорение x{entry['speedup']:.2f}")
+        print(f"  |Δ nsfw_score|: среднее {entry['mean_abs_diff']:.4f}, "
+              f"p95 {entry['p95_abs_diff']:.4f}, максимум {entry['max_abs_diff']:.4f}")
+        for threshold, flips in entry["decision_flips"].items():
+            print(f"  Изменилось решение при пороге {threshold}: {flips}")
+        for item in entry["worst"]:
+            print(f"  {item['torch']:.3f} -> {item['onnx']:.3f}  {item['path']}")
+        verdict = "✅ в пределах" if entry["accepted"] else "❌ вне"
+        print(f"  {verdict} допустимых границ (p95 ≤ {ACCEPT_P95_DIFF}, "
+              f"изменившихся решений ≤ {ACCEPT_FLIP_RATE:.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Экспорт Marqo в ONNX/int8 и сравнение с PyTorch")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Экспорт в ONNX и квантизация int8")
+    export_parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    export_parser.add_argument("--opset", type=int, default=17)
+    export_parser.add_argument("--no-quantize", action="store_true", help="Только fp32 модель")
+
+    report_parser = subparsers.add_parser("report", help="Расхождение ONNX с PyTorch на выборке")
+    report_parser.add_argument("images", help="Директория с изображениями выборки")
+    report_parser.add_argument("--model-dir", default=DEFAULT_OUTPUT_DIR)
+    report_parser.add_argument("--limit", type=int, default=200, help="Размер выборки")
+    report_parser.add_argument("--batch-size", type=int, default=8)
+    report_parser.add_argument("--decode-size", type=int, default=640,
+                               help="Минимальная сторона при декодировании (как DECODE_SIZE)")
+    report_parser.add_argument("--thresholds", type=float, nargs="+", default=[0.1, 0.5, 0.9],
+                               help="Пороги, для которых считаются изменившиеся решения")
+    report_parser.add_argument("--output", help=f"Путь к JSON отчету (по умолчанию MODEL_DIR/{REPORT_NAME})")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export(args.output_dir, opset=args.opset, quantize=not args.no_quantize)
+    else:
+        report(
+            args.images, args.model_dir, limit=args.limit, batch_size=args.batch_size,
+            decode_size=args.decode_size, thresholds=args.thresholds, output=args.output
+        )
+
+
+if __name__ == "__main__":
+    main()
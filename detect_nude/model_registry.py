@@ -0,0 +1,249 @@
+import gc
+import os
+import sys
+import logging
+import threading
+
+from runtime_config import configure_framework, current_budget
+from detection_cache import file_revision
+
+logger = logging.getLogger(__name__)
+
+
+def configure_tensorflow():
+    """
+    Настройка TensorFlow (GPU по требованию, XLA и оптимизации графа).
+
+    Вызывается только при загрузке модели, которой нужен TensorFlow.
+    """
+    import tensorflow as tf
+
+    # Потоки задаются до инициализации контекста TensorFlow
+    configure_framework('tensorflow')
+
+    physical_devices = tf.config.list_physical_devices('GPU')
+    if physical_devices:
+        try:
+            # Включаем память GPU по требованию
+            for device in physical_devices:
+                tf.config.experimental.set_memory_growth(device, True)
+            logger.info(f"✅ Найдено {len(physical_devices)} GPU устройств")
+        except RuntimeError as e:
+            logger.error(f"❌ Ошибка при настройке GPU: {e}")
+    else:
+        logger.warning("⚠️ GPU не найдены, используется CPU")
+
+    # Оптимизация производительности
+    tf.config.optimizer.set_jit(True)  # Включаем XLA оптимизации
+    tf.config.optimizer.set_experimental_options({
+        'layout_optimizer': True,
+        'constant_folding': True,
+        'shape_optimization': True,
+        'remapping': True,
+        'arithmetic_optimization': True,
+        'dependency_optimization': True,
+        'loop_optimization': True,
+        'function_optimization': True,
+        'debug_stripper': True,
+    })
+    logger.info("✅ TensorFlow настроен")
+
+
+def configure_torch():
+    """Применяет бюджет потоков к torch при загрузке первой модели на нем"""
+    import torch
+
+    configure_framework('torch')
+    logger.info(f"✅ torch настроен: {torch.get_num_threads()} потоков")
+
+
+class ModelRegistry:
+    """
+    Ленивый реестр моделей: модель создается при первом обращении
+    и может быть явно выгружена.
+
+    Для каждой модели регистрируется фабрика, набор фреймворков,
+    которые нужно подготовить перед ее загрузкой (например, 'tensorflow'),
+    и версия для кеша детекций (известна без загрузки модели).
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._frameworks = {}
+        self._revisions = {}
+        self._models = {}
+        self._configured = set()
+        self._lock = threading.RLock()
+        self._setup = {'tensorflow': configure_tensorflow, 'torch': configure_torch}
+
+    def register(self, name, factory, frameworks=(), revision=None):
+        """
+        Регистрирует модель
+
+        Args:
+            name: имя модели в реестре
+            factory: функция без аргументов, создающая модель
+            frameworks: фреймворки, которые нужно настроить перед загрузкой
+            revision: версия весов и параметров, влияющих на результат
+        """
+        self._factories[name] = factory
+        self._frameworks[name] = tuple(frameworks)
+        self._revisions[name] = revision or name
+
+    def revision(self, name):
+        """Версия модели для кеша детекций"""
+        return self._revisions[name]
+
+    def get(self, name):
+        """Возвращает модель, загружая ее при первом обращении"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            if name not in self._models:
+                if name not in self._factories:
+                    raise KeyError(f"Модель {name} не зарегистрирована")
+                for framework in self._frameworks[name]:
+                    if framework not in self._configured and framework in self._setup:
+                        self._setup[framework]()
+                    self._configured.add(framework)
+                logger.info(f"🔄 Загрузка модели {name}...")
+                self._models[name] = self._factories[name]()
+                logger.info(f"✅ Модель {name} загружена")
+            return self._models[name]
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def loaded(self):
+        """Имена загруженных моделей"""
+        return list(self._models)
+
+    def unload(self, name=None):
+        """
+        Выгружает модель (или все модели, если name не указан)
+        и освобождает память фреймворков
+        """
+        with self._lock:
+            names = [name] if name is not None else list(self._models)
+            for model_name in names:
+                if self._models.pop(model_name, None) is not None:
+                    logger.info(f"🗑️ Модель {model_name} выгружена")
+            gc.collect()
+
+            # Очищаем сессию TensorFlow, только если он уже был загружен
+            if 'tensorflow' in sys.modules and not self._models:
+                sys.modules['tensorflow'].keras.backend.clear_session()
+
+
+def _package_revision(package):
+    """Версия модели, веса которой поставляются вместе с пакетом"""
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        return f"{package}=={version(package)}"
+    except PackageNotFoundError:
+        return package
+
+
+def decode_revision(decode_size):
+    """
+    Часть версии результата, зависящая от декодирования: модели и хеши видят
+    пиксели после draft() до decode_size (ImageContext.target_size)
+    """
+    return f"decode=draft:{decode_size}" if decode_size else "decode=full"
+
+
+def create_registry(nsfw_batch_size=8, face_imgsz=640, face_conf=0.25, face_max_side=None,
+                    marqo_backend='torch', marqo_onnx_path=None,
+                    face_backend='torch', face_onnx_path=None, face_onnx_threads=None,
+                    nudenet_threads=(None, None), decode_size=None):
+    """
+    Реестр со стандартным набором детекторов каталога.
+
+    Импорт torch/transformers/ultralytics/opennsfw2/onnxruntime происходит внутри
+    фабрик, поэтому сам вызов ничего не загружает.
+
+    Args:
+        nsfw_batch_size: размер пакета для моделей Marqo и OpenNSFW2
+        face_imgsz: размер входа детектора лиц
+        face_conf: порог уверенности детектора лиц
+        face_max_side: ограничение большей стороны изображения для детектора лиц
+        marqo_backend: 'torch' или 'onnx'
+        marqo_onnx_path: путь к ONNX модели Marqo для бэкенда 'onnx'
+        face_backend: 'torch' или 'onnx'
+        face_onnx_path: путь к ONNX модели лиц для бэкенда 'onnx'
+        face_onnx_threads: число потоков ONNX Runtime для модели лиц
+        nudenet_threads: потоки ONNX Runtime классификатора NudeNet (intra-op, inter-op)
+        decode_size: минимальная сторона декодированного изображения (DECODE_SIZE);
+            входит в версию каждой модели, так как результаты от нее зависят
+
+    Не заданные явно потоки ONNX Runtime берутся из бюджета процесса
+    (runtime_config) в момент загрузки модели.
+    """
+    def marqo():
+        if marqo_backend == 'onnx':
+            from onnx_nsfw_detector import OnnxMarqoDetector
+            return OnnxMarqoDetector(
+                marqo_onnx_path, batch_size=nsfw_batch_size, threads=current_budget().intra_op
+            )
+        from nsfw_detector import MarqoNSFWDetector
+        return MarqoNSFWDetector(batch_size=nsfw_batch_size)
+
+    def opennsfw2():
+        from opennsfw2_detector import OpenNSFW2Detector
+        return OpenNSFW2Detector(batch_size=nsfw_batch_size)
+
+    def face():
+        if face_backend == 'onnx':
+            from face_detector import OnnxFaceDetector
+            return OnnxFaceDetector(
+                face_onnx_path, conf=face_conf, max_side=face_max_side,
+                threads=face_onnx_threads or current_budget().intra_op
+            )
+        from face_detector import FaceDetector
+        return FaceDetector(imgsz=face_imgsz, conf=face_conf, max_side=face_max_side)
+
+    def nudenet():
+        from nudenet import NudeClassifier
+        intra_op_threads, inter_op_threads = nudenet_threads
+        budget = current_budget()
+        return NudeClassifier(
+            intra_op_threads=intra_op_threads or budget.intra_op,
+            inter_op_threads=inter_op_threads or budget.inter_op
+        )
+
+    registry = ModelRegistry()
+    decode = decode_revision(decode_size)
+    if marqo_backend not in ('torch', 'onnx'):
+        raise ValueError(f"Неизвестный бэкенд Marqo: {marqo_backend}")
+    registry.register(
+        'marqo', marqo,
+        frameworks=('onnxruntime',) if marqo_backend == 'onnx' else ('torch',),
+        revision=(
+            f"onnx:{file_revision(marqo_onnx_path)}:{decode}" if marqo_backend == 'onnx'
+            else f"Marqo/nsfw-image-detection-384:{decode}"
+        )
+    )
+    registry.register(
+        'opennsfw2', opennsfw2, frameworks=('tensorflow',),
+        revision=f"{_package_revision('opennsfw2')}:{decode}"
+    )
+    if face_backend not in ('torch', 'onnx'):
+        raise ValueError(f"Неизвестный бэкенд детектора лиц: {face_backend}")
+    face_params = f"conf={face_conf}:max_side={face_max_side}:{decode}"
+    registry.register(
+        'face', face,
+        frameworks=('onnxruntime',) if face_backend == 'onnx' else ('torch',),
+        revision=(
+            f"onnx:{file_revision(face_onnx_path)}:{face_params}" if face_backend == 'onnx'
+            else f"{file_revision('yolov8n-face.pt')}:imgsz={face_imgsz}:{face_params}"
+        )
+    )
+    registry.register(
+        'nudenet', nudenet, frameworks=('onnxruntime',),
+        revision=(
+            f"{file_revision(os.path.join(os.path.dirname(__file__), '..', 'nudenet', 'classifier_model.onnx'))}:{decode}"
+        )
+    )
+    return registry
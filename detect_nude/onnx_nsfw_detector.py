@@ -0,0 +1,292 @@
+import os
+import json
+import logging
+from abc import ABC, abstractmethod
+
+import numpy as np
+from PIL import Image
+
+# Модуль не импортирует torch и transformers: бэкенд marqo_backend='onnx'
+# работает только на onnxruntime, numpy и PIL
+
+logger = logging.getLogger(__name__)
+
+# Способы интерполяции из конфигурации предобработки
+RESAMPLE = {
+    'nearest': Image.NEAREST,
+    'bilinear': Image.BILINEAR,
+    'bicubic': Image.BICUBIC,
+    'lanczos': Image.LANCZOS,
+}
+
+
+def preprocess_path(model_path):
+    """Путь к конфигурации предобработки, которую marqo_onnx.py сохраняет рядом с моделью"""
+    return f"{model_path}.json"
+
+
+def preprocess_image(image, config):
+    """
+    Предобработка изображения как у процессора исходной модели Marqo
+
+    Args:
+        image: PIL изображение в RGB
+        config: конфигурация предобработки (см. marqo_onnx.preprocess_config)
+
+    Returns:
+        np.ndarray: float32 массив формы (3, высота, ширина)
+    """
+    resample = RESAMPLE[config['interpolation']]
+    height, width = config['size']
+    if config['mode'] == 'squash':
+        image = image.resize((width, height), resample)
+    else:
+        # Меньшая сторона приводится к resize, затем центральный кроп size
+        resize = config['resize']
+        w, h = image.size
+        if w <= h:
+            new_size = (resize, int(resize * h / w))
+        else:
+            new_size = (int(resize * w / h), resize)
+        image = image.resize(new_size, resample)
+        left = int(round((image.width - width) / 2.0))
+        top = int(round((image.height - height) / 2.0))
+        image = image.crop((left, top, left + width, top + height))
+
+    pixels = np.asarray(image, dtype=np.float32) / 255.0
+    pixels = (pixels - np.asarray(config['mean'], dtype=np.float32)) / np.asarray(config['std'], dtype=np.float32)
+    return pixels.transpose(2, 0, 1)
+
+
+class NSFWDetector(ABC):
+    """Базовый класс для детекторов NSFW контента"""
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Название модели"""
+        pass
+
+    @abstractmethod
+    def analyze_image(self, image_path: str) -> dict:
+        """
+        Анализ изображения на наличие NSFW контента
+
+        Args:
+            image_path: путь к изображению
+
+        Returns:
+            dict: словарь с результатами анализа
+        """
+        pass
+
+
+class MarqoDetectorBase(NSFWDetector):
+    """
+    Общая часть детекторов Marqo: пакетный анализ и формирование результатов.
+
+    Наследники задают id2label, batch_size и _predict_probs.
+    """
+
+    MODEL_NAME = "Marqo/nsfw-image-detection-384"
+
+    # Классы, которые могут указывать на NSFW / безопасный контент
+    NSFW_CLASSES = ['nsfw', 'porn', 'sexy', 'hentai']
+    SAFE_CLASSES = ['normal', 'safe', 'neutral', 'sfw']
+
+    @property
+    def name(self) -> str:
+        return self.MODEL_NAME
+
+    @staticmethod
+    def _to_rgb(image):
+        """Загружает изображение по пути или приводит PIL изображение к RGB"""
+        if isinstance(image, str):
+            return Image.open(image).convert("RGB")
+        if image.mode != "RGB":
+            return image.convert("RGB")
+        return image
+
+    def _build_result(self, probs) -> dict:
+        """
+        Формирует словарь результатов по вероятностям одного изображения
+
+        Args:
+            probs: вероятности классов после softmax (тензор или массив)
+
+        Returns:
+            dict: словарь с результатами анализа
+        """
+        # Получаем названия классов
+        id2label = self.id2label
+
+        # Формируем результаты
+        results = {}
+        max_prob = 0
+
+        logger.info("🧠 NSFW классификация:")
+        for idx, prob in enumerate(probs):
+            label = id2label[idx]
+            prob_value = float(prob)
+            results[label] = prob_value
+            logger.info(f"{label:<10}: {prob_value:.3f}")
+
+            if prob_value > max_prob:
+                max_prob = prob_value
+
+        nsfw_score = 0.0
+        safe_score = 0.0
+
+        for label, score in results.items():
+            if any(nsfw_term in label.lower() for nsfw_term in self.NSFW_CLASSES):
+                nsfw_score += score
+            elif any(safe_term in label.lower() for safe_term in self.SAFE_CLASSES):
+                safe_score += score
+
+        # Если у нас есть только два класса (NSFW и SFW), используем их напрямую
+        if len(results) == 2 and 'nsfw' in results and 'sfw' in results:
+            nsfw_score = results['nsfw']
+            safe_score = results['sfw']
+
+        return {
+            'is_nsfw': nsfw_score > 0.5,
+            'nsfw_score': nsfw_score,
+            'safe_score': safe_score,
+            'confidence': max_prob,
+            'details': results,
+            'model': self.name
+        }
+
+    def _error_result(self, error) -> dict:
+        """Результат для изображения, которое не удалось проанализировать"""
+        return {
+            'is_nsfw': False,
+            'nsfw_score': 0.0,
+            'safe_score': 0.0,
+            'confidence': 0.0,
+            'details': {},
+            'error': str(error),
+            'model': self.name
+        }
+
+    def analyze_image(self, image) -> dict:
+        """
+        Анализ изображения на наличие NSFW контента
+
+        Args:
+            image: путь к изображению или уже декодированное PIL изображение
+
+        Returns:
+            dict: словарь с результатами анализа
+        """
+        try:
+            image = self._to_rgb(image)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при анализе изображения: {str(e)}")
+            return self._error_result(e)
+        return self.analyze_batch([image], batch_size=1)[0]
+
+    @abstractmethod
+    def _predict_probs(self, chunk):
+        """
+        Вероятности классов для пакета изображений
+
+        Args:
+            chunk: список PIL изображений в RGB
+
+        Returns:
+            строки вероятностей, по одной на изображение
+        """
+        pass
+
+    def analyze_batch(self, images, batch_size=None) -> list:
+        """
+        Пакетный анализ изображений: каждый пакет проходит через процессор
+        и модель одним тензором
+
+        Args:
+            images: список путей или декодированных PIL изображений
+            batch_size: размер пакета (по умолчанию из конструктора)
+
+        Returns:
+            list: словари результатов в том же порядке, что и images
+        """
+        batch_size = batch_size or self.batch_size
+        results = []
+
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            try:
+                chunk = [self._to_rgb(image) for image in chunk]
+                probs = self._predict_probs(chunk)
+                results.extend(self._build_result(row) for row in probs)
+
+            except Exception as e:
+                logger.error(f"❌ Ошибка при пакетном анализе изображений: {str(e)}")
+                results.extend(self._error_result(e) for _ in chunk)
+
+        return results
+
+
+class OnnxMarqoDetector(MarqoDetectorBase):
+    """
+    Детектор Marqo на ONNX Runtime для CPU.
+
+    Использует модель, экспортированную marqo_onnx.py (fp32 или
+    динамически квантизованную int8). Предобработка и названия классов
+    читаются из конфигурации, сохраненной при экспорте рядом с моделью,
+    поэтому результаты совместимы с MarqoNSFWDetector без загрузки torch.
+    """
+
+    def __init__(self, model_path, batch_size=8, threads=None):
+        """
+        Инициализация детектора
+
+        Args:
+            model_path: путь к ONNX модели
+            batch_size: сколько изображений прогонять через модель за один вызов
+            threads: число потоков ONNX Runtime внутри оператора (None - по умолчанию)
+        """
+        try:
+            import onnxruntime as ort
+
+            self.batch_size = batch_size
+            self.model_path = model_path
+
+            config_path = preprocess_path(model_path)
+            if not os.path.exists(config_path):
+                raise FileNotFoundError(
+                    f"Нет конфигурации предобработки {config_path}, "
+                    f"выполните заново: python marqo_onnx.py export"
+                )
+            with open(config_path, encoding="utf-8") as f:
+                self.preprocess = json.load(f)
+            self.id2label = {int(idx): label for idx, label in self.preprocess['id2label'].items()}
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if threads:
+                options.intra_op_num_threads = threads
+            self.session = ort.InferenceSession(
+                model_path, options, providers=["CPUExecutionProvider"]
+            )
+            self.input_name = self.session.get_inputs()[0].name
+
+            logging.info(f"✅ Модель {self.name} успешно загружена")
+
+        except Exception as e:
+            logging.error(f"❌ Ошибка при инициализации OnnxMarqoDetector: {str(e)}")
+            raise
+
+    @property
+    def name(self) -> str:
+        return f"{self.MODEL_NAME} (onnx: {os.path.basename(self.model_path)})"
+
+    def _predict_probs(self, chunk):
+        """Вероятности классов для пакета изображений через ONNX Runtime"""
+        pixel_values = np.stack([preprocess_image(image, self.preprocess) for image in chunk])
+        logits = self.session.run(None, {self.input_name: pixel_values})[0]
+
+        # softmax по классам
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return exp / exp.sum(axis=-1, keepdims=True)
@@ -1,49 +1,116 @@
-import torch
-import torchvision
-import torchvision.transforms as transforms
+import logging
 from PIL import Image
 import numpy as np
+import tensorflow as tf
 import opennsfw2
 
+logger = logging.getLogger(__name__)
+
+
 class OpenNSFW2Detector:
-    def __init__(self):
-        # OpenNSFW2 использует TensorFlow внутри, поэтому нам не нужно явно указывать устройство
-        self.model = opennsfw2
-        
-        # Предобработка изображений
-        self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                              std=[0.229, 0.224, 0.225])
-        ])
-
-    def analyze_image(self, image_path):
-        try:
-            # Используем встроенную функцию predict_image из opennsfw2
-            nsfw_score = opennsfw2.predict_image(image_path)
-            safe_score = 1.0 - nsfw_score
-            
-            # Определение уверенности и деталей
-            confidence = max(safe_score, nsfw_score)
-            is_erotic = nsfw_score > safe_score
-            
-            details = []
-            if is_erotic:
-                if nsfw_score > 0.9:
-                    details.append("Высокая вероятность NSFW контента")
-                elif nsfw_score > 0.7:
-                    details.append("Средняя вероятность NSFW контента")
-                else:
-                    details.append("Низкая вероятность NSFW контента")
-            
-            return {
-                'is_erotic': is_erotic,
-                'nsfw_score': float(nsfw_score),
-                'safe_score': float(safe_score),
-                'confidence': float(confidence),
-                'details': details
-            }
-            
-        except Exception as e:
-            return {'error': str(e)} 
\ No newline at end of file
+    """
+    Детектор NSFW на основе OpenNSFW2.
+
+    Модель Keras строится и загружает веса один раз при создании детектора.
+    Пакет изображений проходит через модель одним вызовом, скомпилированным
+    XLA под фиксированную форму входа (batch_size, 224, 224, 3).
+    """
+
+    INPUT_SHAPE = (224, 224, 3)
+
+    def __init__(self, batch_size=8, warmup=True):
+        """
+        Args:
+            batch_size: сколько изображений прогонять через модель за один вызов
+            warmup: сразу скомпилировать модель на пустом пакете
+        """
+        self.batch_size = batch_size
+        self.model = opennsfw2.make_open_nsfw_model(input_shape=self.INPUT_SHAPE)
+
+        # Неполные пакеты дополняются до batch_size, поэтому компиляция одна
+        self._predict = tf.function(
+            lambda batch: self.model(batch, training=False),
+            input_signature=[tf.TensorSpec((batch_size,) + self.INPUT_SHAPE, tf.float32)],
+            jit_compile=True
+        )
+        if warmup:
+            self._predict(np.zeros((batch_size,) + self.INPUT_SHAPE, dtype=np.float32))
+            logger.info(f"✅ OpenNSFW2 скомпилирован для пакета из {batch_size} изображений")
+
+    @staticmethod
+    def _to_pil(image):
+        """Приводит путь, файловый объект, массив RGB или PIL изображение к PIL"""
+        if isinstance(image, Image.Image):
+            return image
+        if isinstance(image, np.ndarray):
+            return Image.fromarray(image)
+        return Image.open(image)
+
+    def preprocess(self, image):
+        """Предобработка одного изображения так же, как при обучении модели"""
+        return opennsfw2.preprocess_image(self._to_pil(image), opennsfw2.Preprocessing.YAHOO)
+
+    @staticmethod
+    def _build_result(nsfw_score):
+        safe_score = 1.0 - nsfw_score
+
+        # Определение уверенности и деталей
+        confidence = max(safe_score, nsfw_score)
+        is_erotic = nsfw_score > safe_score
+
+        details = []
+        if is_erotic:
+            if nsfw_score > 0.9:
+                details.append("Высокая вероятность NSFW контента")
+            elif nsfw_score > 0.7:
+                details.append("Средняя вероятность NSFW контента")
+            else:
+                details.append("Низкая вероятность NSFW контента")
+
+        return {
+            'is_erotic': is_erotic,
+            'nsfw_score': float(nsfw_score),
+            'safe_score': float(safe_score),
+            'confidence': float(confidence),
+            'details': details
+        }
+
+    def analyze_image(self, image):
+        """
+        Args:
+            image: путь, файловый объект, массив RGB или PIL изображение
+        """
+        return self.analyze_batch([image])[0]
+
+    def analyze_batch(self, images):
+        """
+        Пакетный анализ изображений
+
+        Args:
+            images: список путей, файловых объектов, массивов RGB или PIL изображений
+
+        Returns:
+            list: словари результатов в том же порядке, что и images
+        """
+        results = []
+        for start in range(0, len(images), self.batch_size):
+            chunk = images[start:start + self.batch_size]
+            batch = np.zeros((self.batch_size,) + self.INPUT_SHAPE, dtype=np.float32)
+            errors = {}
+            for i, image in enumerate(chunk):
+                try:
+                    batch[i] = self.preprocess(image)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка при подготовке изображения для OpenNSFW2: {str(e)}")
+                    errors[i] = {'error': str(e)}
+            try:
+                scores = self._predict(batch).numpy()[:len(chunk), 1]
+            except Exception as e:
+                logger.error(f"❌ Ошибка при анализе OpenNSFW2: {str(e)}")
+                results.extend({'error': str(e)} for _ in chunk)
+                continue
+            results.extend(
+                errors.get(i) or self._build_result(float(score))
+                for i, score in enumerate(scores)
+            )
+        return results
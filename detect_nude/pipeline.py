@@ -0,0 +1,142 @@
+import queue
+import logging
+from collections import Counter
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Маркер конца потока данных между стадиями
+_DONE = object()
+
+
+class ScanPipeline:
+    """
+    Конвейер обработки изображений с ограниченными очередями:
+
+        пути -> [пул потоков: чтение + декодирование] -> очередь декодированных
+             -> [поток инференса: пакеты моделей]     -> очередь результатов
+             -> [запись в БД в вызывающем потоке]
+
+    Чтение с SMB и декодирование перекрываются с инференсом, а размер
+    очередей ограничивает число изображений, одновременно лежащих в памяти.
+    Запись идет в потоке, вызвавшем run(), поэтому соединение с БД
+    можно создавать как обычно.
+    """
+
+    def __init__(self, load, infer, write, prefetch_workers=4,
+                 decode_queue_size=32, result_queue_size=64, batch_size=8):
+        """
+        Args:
+            load: функция path -> контекст изображения или None
+            infer: функция [(path, контекст)] -> [(path, результат)]
+            write: функция (path, результат), сохраняющая результат
+            prefetch_workers: число потоков чтения и декодирования
+            decode_queue_size: глубина очереди декодированных изображений
+            result_queue_size: глубина очереди результатов для записи
+            batch_size: размер пакета для стадии инференса
+        """
+        self.load = load
+        self.infer = infer
+        self.write = write
+        self.prefetch_workers = max(1, prefetch_workers)
+        self.batch_size = max(1, batch_size)
+        self.path_queue = queue.Queue(maxsize=self.prefetch_workers * 2)
+        self.decoded_queue = queue.Queue(maxsize=max(1, decode_queue_size))
+        self.result_queue = queue.Queue(maxsize=max(1, result_queue_size))
+
+    def _feed(self, paths):
+        """Раздает пути потокам предзагрузки"""
+        try:
+            for path in paths:
+                self.path_queue.put(path)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении списка файлов: {str(e)}")
+        finally:
+            for _ in range(self.prefetch_workers):
+                self.path_queue.put(_DONE)
+
+    def _prefetch(self):
+        """Читает и декодирует изображения"""
+        while True:
+            path = self.path_queue.get()
+            if path is _DONE:
+                self.decoded_queue.put(_DONE)
+                return
+            try:
+                context = self.load(path)
+            except Exception as e:
+                logger.error(f"❌ Ошибка при чтении {path}: {str(e)}")
+                context = None
+            self.decoded_queue.put((path, context))
+
+    def _run_batch(self, batch):
+        """Прогоняет пакет через модели и передает результаты на запись"""
+        try:
+            results = self.infer(batch)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при анализе пакета: {str(e)}")
+            results = [(path, None) for path, _ in batch]
+        for item in results:
+            self.result_queue.put(item)
+
+    def _inference(self):
+        """Собирает декодированные изображения в пакеты и анализирует их"""
+        finished_loaders = 0
+        batch = []
+        try:
+            while finished_loaders < self.prefetch_workers:
+                item = self.decoded_queue.get()
+                if item is _DONE:
+                    finished_loaders += 1
+                    continue
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self._run_batch(batch)
+                    batch = []
+            if batch:
+                self._run_batch(batch)
+        finally:
+            self.result_queue.put(_DONE)
+
+    def run(self, paths, progress=None):
+        """
+        Запускает конвейер и записывает результаты
+
+        Args:
+            paths: итерируемый набор путей (может быть генератором)
+            progress: функция, вызываемая с числом завершенных изображений
+
+        Returns:
+            Counter: число изображений по исходу: 'processed', 'skipped'
+                и значения поля 'action' результатов без инференса
+        """
+        threads = [threading.Thread(target=self._feed, args=(paths,), daemon=True)]
+        threads += [
+            threading.Thread(target=self._prefetch, daemon=True)
+            for _ in range(self.prefetch_workers)
+        ]
+        threads.append(threading.Thread(target=self._inference, daemon=True))
+        for thread in threads:
+            thread.start()
+
+        stats = Counter(processed=0, skipped=0)
+        while True:
+            item = self.result_queue.get()
+            if item is _DONE:
+                break
+            path, result = item
+            try:
+                if result:
+                    self.write(path, result)
+                    stats[result.get('action', 'processed')] += 1
+                else:
+                    stats['skipped'] += 1
+            except Exception as e:
+                stats['skipped'] += 1
+                logger.error(f"❌ Ошибка при сохранении {path}: {str(e)}")
+            if progress:
+                progress(1)
+
+        for thread in threads:
+            thread.join()
+        return stats
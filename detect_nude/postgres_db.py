@@ -9,6 +9,8 @@ root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, root_dir)
 
 from config import TABLE_NAME, PG_CONNECTION_PARAMS
+from phash_db import ensure_phash_int_column
+from fingerprints import ensure_fingerprint_columns
 
 # Настройка логирования
 logging.basicConfig(
@@ -46,11 +48,30 @@ def ensure_table_schema(conn):
                     status TEXT,
                     phash TEXT,
                     shooting_date TIMESTAMP,
-                    modification_date TIMESTAMP
+                    modification_date TIMESTAMP,
+                    width INTEGER,
+                    height INTEGER,
+                    skipped_stages TEXT,
+                    phash_int BIGINT,
+                    ahash_int BIGINT,
+                    phash_dct_int BIGINT,
+                    dhash_int BIGINT,
+                    whash_int BIGINT
                 )
             """)
+            # Колонки, добавленные после создания таблицы
+            cursor.execute(f"""
+                ALTER TABLE {TABLE_NAME}
+                    ADD COLUMN IF NOT EXISTS width INTEGER,
+                    ADD COLUMN IF NOT EXISTS height INTEGER,
+                    ADD COLUMN IF NOT EXISTS skipped_stages TEXT
+            """)
             conn.commit()
-            logger.info("✅ Схема таблицы проверена/создана")
+        # Хеш как 64-битное целое: колонка, заполнение из phash и индекс
+        ensure_phash_int_column(conn, TABLE_NAME)
+        # aHash, pHash (DCT), dHash и wHash как 64-битные целые
+        ensure_fingerprint_columns(conn, TABLE_NAME)
+        logger.info("✅ Схема таблицы проверена/создана")
     except Exception as e:
         logger.error(f"❌ Ошибка при создании схемы: {str(e)}")
         conn.rollback()
@@ -58,6 +79,10 @@ def ensure_table_schema(conn):
 def insert_or_update_photo(conn, photo_data):
     """
     Вставляет или обновляет информацию о фото
+
+    Статус существующей записи (approved, published и т.д.) при повторном
+    анализе измененного файла сохраняется, статус из photo_data получают
+    только новые записи.
     """
     try:
         with conn.cursor() as cursor:
@@ -65,11 +90,13 @@ def insert_or_update_photo(conn, photo_data):
                 INSERT INTO {TABLE_NAME} (
                     path, is_nude, has_face, hash_sha256,
                     clip_nude_score, nsfw_score, is_small,
-                    status, phash, shooting_date, modification_date
+                    status, phash, phash_int, ahash_int, phash_dct_int, dhash_int, whash_int,
+                    shooting_date, modification_date, width, height, skipped_stages
                 ) VALUES (
                     %(path)s, %(is_nude)s, %(has_face)s, %(hash_sha256)s,
                     %(clip_nude_score)s, %(nsfw_score)s, %(is_small)s,
-                    %(status)s, %(phash)s, %(shooting_date)s, %(modification_date)s
+                    %(status)s, %(phash)s, %(phash_int)s, %(ahash_int)s, %(phash_dct_int)s, %(dhash_int)s, %(whash_int)s,
+                    %(shooting_date)s, %(modification_date)s, %(width)s, %(height)s, %(skipped_stages)s
                 )
                 ON CONFLICT (path) DO UPDATE SET
                     is_nude = EXCLUDED.is_nude,
@@ -78,10 +105,18 @@ def insert_or_update_photo(conn, photo_data):
                     clip_nude_score = EXCLUDED.clip_nude_score,
                     nsfw_score = EXCLUDED.nsfw_score,
                     is_small = EXCLUDED.is_small,
-                    status = EXCLUDED.status,
+                    status = COALESCE({TABLE_NAME}.status, EXCLUDED.status),
                     phash = EXCLUDED.phash,
+                    phash_int = EXCLUDED.phash_int,
+                    ahash_int = EXCLUDED.ahash_int,
+                    phash_dct_int = EXCLUDED.phash_dct_int,
+                    dhash_int = EXCLUDED.dhash_int,
+                    whash_int = EXCLUDED.whash_int,
                     shooting_date = EXCLUDED.shooting_date,
-                    modification_date = EXCLUDED.modification_date
+                    modification_date = EXCLUDED.modification_date,
+                    width = EXCLUDED.width,
+                    height = EXCLUDED.height,
+                    skipped_stages = EXCLUDED.skipped_stages
             """, photo_data)
             conn.commit()
             return True
@@ -90,6 +125,81 @@ def insert_or_update_photo(conn, photo_data):
         conn.rollback()
         return False
 
+def rename_photo(conn, old_path, new_path):
+    """
+    Переносит запись о фото на новый путь (файл переименован или перемещен)
+    
+    Returns:
+        bool: True, если запись со старым путем найдена и обновлена
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {TABLE_NAME} SET path = %s
+                WHERE path = %s
+            """, (new_path, old_path))
+            updated = cursor.rowcount > 0
+            conn.commit()
+            return updated
+    except Exception as e:
+        logger.error(f"❌ Ошибка при переименовании фото: {str(e)}")
+        conn.rollback()
+        return False
+
+def get_stored_hashes(conn):
+    """
+    Пути и sha256 всех фото в таблице (для файлов, обработанных до появления манифеста)
+
+    Returns:
+        dict: {path: sha256}
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT path, hash_sha256 FROM {TABLE_NAME}")
+        return dict(cursor.fetchall())
+
+def get_paths_without_nsfw_scores(conn):
+    """
+    Пути фото, для которых NSFW модели были пропущены (политика face_first)
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT path FROM {TABLE_NAME}
+                WHERE nsfw_score IS NULL AND COALESCE(skipped_stages, '') != ''
+            """)
+            return [row[0] for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"❌ Ошибка при получении фото без NSFW оценок: {str(e)}")
+        conn.rollback()
+        return []
+
+def update_nsfw_scores(conn, path, scores):
+    """
+    Записывает досчитанные NSFW оценки фото
+    
+    Args:
+        scores: результат DetectorCascade.scores()
+    """
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {TABLE_NAME}
+                SET is_nude = %s, nsfw_score = %s, clip_nude_score = %s, skipped_stages = %s
+                WHERE path = %s
+            """, (
+                bool(scores['is_nsfw']),
+                scores['nsfw_score'],
+                scores['opennsfw2_score'],
+                scores['skipped_stages'],
+                path
+            ))
+            conn.commit()
+            return cursor.rowcount > 0
+    except Exception as e:
+        logger.error(f"❌ Ошибка при обновлении NSFW оценок: {str(e)}")
+        conn.rollback()
+        return False
+
 def get_photo_by_path(conn, path):
     """
     Получает информацию о фото по пути
@@ -0,0 +1,126 @@
+import os
+import sys
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Переменные окружения, задающие размер пулов потоков библиотек
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'TF_NUM_INTRAOP_THREADS',
+)
+
+# Потоки одного процесса: внутри оператора и между операторами
+ThreadBudget = namedtuple('ThreadBudget', ['intra_op', 'inter_op', 'workers', 'total'])
+
+# Бюджет, примененный в текущем процессе
+_current = None
+
+
+def available_cpus():
+    """Число ядер, доступных процессу (с учетом привязки к ядрам)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def thread_budget(total=0, workers=1):
+    """
+    Делит общий бюджет потоков между процессами-обработчиками
+
+    Args:
+        total: всего потоков вычислений на все процессы (0 - все доступные ядра)
+        workers: число процессов с моделями
+
+    Returns:
+        ThreadBudget: потоки одного процесса. Модели в процессе работают
+            по очереди, поэтому параллелизм между операторами не нужен
+    """
+    total = total or available_cpus()
+    workers = max(1, workers)
+    return ThreadBudget(intra_op=max(1, total // workers), inter_op=1, workers=workers, total=total)
+
+
+def current_budget():
+    """Бюджет текущего процесса (если не применялся - все ядра на один процесс)"""
+    return _current or thread_budget()
+
+
+def _configure_torch(budget):
+    torch = sys.modules['torch']
+    torch.set_num_threads(budget.intra_op)
+    try:
+        torch.set_num_interop_threads(budget.inter_op)
+    except RuntimeError:
+        # Пул между операторами задается один раз до первой параллельной работы
+        logger.warning("⚠️ Потоки torch между операторами уже заданы")
+
+
+def _configure_tensorflow(budget):
+    tf = sys.modules['tensorflow']
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(budget.intra_op)
+        tf.config.threading.set_inter_op_parallelism_threads(budget.inter_op)
+    except RuntimeError:
+        # После инициализации контекста TensorFlow потоки не меняются
+        logger.warning("⚠️ TensorFlow уже инициализирован, потоки не изменены")
+
+
+def _configure_opencv(budget):
+    sys.modules['cv2'].setNumThreads(budget.intra_op)
+
+
+# Настройка потоков уже импортированных библиотек
+FRAMEWORK_SETUP = {
+    'torch': _configure_torch,
+    'tensorflow': _configure_tensorflow,
+    'cv2': _configure_opencv,
+}
+
+
+def configure_framework(name):
+    """
+    Применяет бюджет к библиотеке сразу после ее импорта
+
+    Вызывается реестром моделей перед загрузкой модели, которой нужна библиотека.
+    """
+    if name in FRAMEWORK_SETUP and name in sys.modules:
+        FRAMEWORK_SETUP[name](current_budget())
+
+
+def apply_thread_budget(budget):
+    """
+    Ограничивает потоки torch, TensorFlow, ONNX Runtime и OpenCV в текущем процессе.
+
+    Переменные окружения наследуются дочерними процессами и читаются
+    библиотеками при инициализации, поэтому выставляются до их загрузки.
+    Уже импортированные библиотеки настраиваются сразу, ничего не импортируется
+    ради настройки. Сессии ONNX Runtime берут потоки из current_budget().
+
+    Returns:
+        ThreadBudget: примененный бюджет
+    """
+    global _current
+    _current = budget
+
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(budget.intra_op)
+    os.environ['TF_NUM_INTEROP_THREADS'] = str(budget.inter_op)
+
+    for name in FRAMEWORK_SETUP:
+        configure_framework(name)
+    return budget
+
+
+def log_thread_budget(budget):
+    """Выводит распределение потоков в лог при запуске"""
+    loaded = [name for name in ('torch', 'tensorflow', 'onnxruntime', 'cv2') if name in sys.modules]
+    logger.info(
+        f"🧵 Бюджет потоков: {budget.total} на {budget.workers} процесс(ов), "
+        f"в каждом {budget.intra_op} внутри оператора и {budget.inter_op} между операторами "
+        f"(torch, TensorFlow, ONNX Runtime, OpenCV; уже загружены: {', '.join(loaded) or 'нет'})"
+    )
@@ -0,0 +1,114 @@
+import os
+import logging
+from datetime import datetime
+
+from db_utils import placeholder
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_TABLE = "scan_manifest"
+
+
+class ScanManifest:
+    """
+    Манифест сканирования: размер, mtime и sha256 каждого файла.
+
+    Позволяет пропускать неизмененные файлы по (path, size, mtime) без их
+    открытия, повторно анализировать файлы с измененным содержимым и
+    узнавать переименованные файлы по sha256.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.ph = placeholder(conn)
+        self.entries = {}
+
+    def ensure_schema(self):
+        """Создает таблицу манифеста и индекс по sha256"""
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+                path TEXT PRIMARY KEY,
+                size BIGINT,
+                mtime DOUBLE PRECISION,
+                hash_sha256 TEXT,
+                scanned_at TEXT
+            )
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{MANIFEST_TABLE}_sha256
+            ON {MANIFEST_TABLE} (hash_sha256)
+        """)
+        self.conn.commit()
+
+    def load(self):
+        """Загружает манифест в память"""
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT path, size, mtime, hash_sha256 FROM {MANIFEST_TABLE}")
+        self.entries = {
+            path: (size, mtime, sha256)
+            for path, size, mtime, sha256 in cursor.fetchall()
+        }
+        logger.info(f"📒 В манифесте {len(self.entries)} файлов")
+        return self
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def is_unchanged(self, path, size, mtime):
+        """Файл не менялся с прошлого сканирования (без открытия файла)"""
+        entry = self.entries.get(path)
+        return entry is not None and entry[0] == size and entry[1] == mtime
+
+    def paths_by_hash(self):
+        """
+        Словарь sha256 -> список путей для поиска переименованных файлов
+
+        Returns:
+            dict: {sha256: [path, ...]}
+        """
+        result = {}
+        for path, (_, _, sha256) in self.entries.items():
+            if sha256:
+                result.setdefault(sha256, []).append(path)
+        return result
+
+    def record(self, path, size, mtime, sha256):
+        """Записывает состояние файла (коммит делает вызывающий код)"""
+        ph = self.ph
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            INSERT INTO {MANIFEST_TABLE} (path, size, mtime, hash_sha256, scanned_at)
+            VALUES ({ph}, {ph}, {ph}, {ph}, {ph})
+            ON CONFLICT (path) DO UPDATE SET
+                size = excluded.size,
+                mtime = excluded.mtime,
+                hash_sha256 = excluded.hash_sha256,
+                scanned_at = excluded.scanned_at
+        """, (path, size, mtime, sha256, datetime.now().isoformat()))
+        self.entries[path] = (size, mtime, sha256)
+
+    def rename(self, old_path, new_path, size, mtime, sha256):
+        """Переносит запись манифеста на новый путь"""
+        cursor = self.conn.cursor()
+        cursor.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE path = {self.ph}", (old_path,))
+        self.entries.pop(old_path, None)
+        self.record(new_path, size, mtime, sha256)
+
+
+def find_moved_source(path, sha256, paths_by_hash):
+    """
+    Ищет прежний путь файла с тем же содержимым, которого больше нет на диске
+
+    Args:
+        path: текущий путь файла
+        sha256: хеш содержимого
+        paths_by_hash: словарь из ScanManifest.paths_by_hash()
+
+    Returns:
+        str: старый путь или None
+    """
+    for old_path in paths_by_hash.get(sha256, ()):
+        if old_path != path and not os.path.exists(old_path):
+            return old_path
+    return None
@@ -0,0 +1,769 @@
+import os
+import sys
+
+# Добавляем путь к корневой директории nude_catalog
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, root_dir)
+
+import hashlib
+import importlib
+from tqdm import tqdm
+from datetime import datetime
+import logging
+import argparse
+from collections import Counter
+from model_registry import create_registry, decode_revision
+from cascade import DetectorCascade
+from detection_cache import DetectionCache
+from image_context import ImageContext
+from pipeline import ScanPipeline
+from workers import WorkerPool
+from runtime_config import thread_budget, apply_thread_budget, log_thread_budget
+from scan_manifest import ScanManifest, find_moved_source
+from walker import walk_files
+from phash_db import phash_to_db
+from fingerprints import FINGERPRINT_COLUMNS, image_fingerprints
+from image_size import is_small_size
+
+from config import (
+    PHOTO_DIR, MIN_IMAGE_SIZE, MAX_IMAGE_SIZE, MAX_WORKERS, NSFW_BATCH_SIZE, DECODE_SIZE, LOG_DIR,
+    PREFETCH_WORKERS, DECODE_QUEUE_SIZE, RESULT_QUEUE_SIZE, WALK_WORKERS,
+    CASCADE_STAGES, CASCADE_SAFE_THRESHOLD, CASCADE_NSFW_THRESHOLD, CASCADE_EARLY_EXIT,
+    FACE_IMGSZ, FACE_CONF, FACE_MAX_SIDE, SCAN_POLICY,
+    MARQO_BACKEND, MARQO_ONNX_PATH, FACE_BACKEND, FACE_ONNX_PATH, FACE_ONNX_THREADS,
+    NUDENET_INTRA_OP_THREADS, NUDENET_INTER_OP_THREADS, CPU_THREAD_BUDGET
+)
+
+# Общий конвейер сканирования для detect_nude.py (SQLite) и detect_nude_pg.py (PostgreSQL):
+# пакетный анализ, каскад детекторов, кеш детекций, манифест, досчет оценок
+# и многопроцессный режим. От базы данных зависит только модуль доступа к ней
+# (sqlite_db или postgres_db), который выбирается через use_db()
+
+logger = logging.getLogger(__name__)
+
+# Модуль доступа к БД: connect_db, ensure_table_schema, insert_or_update_photo,
+# rename_photo, get_stored_hashes, get_paths_without_nsfw_scores, update_nsfw_scores
+db = None
+
+def use_db(module):
+    """
+    Выбирает модуль доступа к БД (объект модуля или его имя для импорта)
+
+    Имя нужно процессам-обработчикам: они запускаются через spawn
+    и импортируют модуль заново.
+    """
+    global db
+    db = importlib.import_module(module) if isinstance(module, str) else module
+    return db
+
+def connect_db():
+    """Подключение к БД выбранного модуля"""
+    if db is None:
+        raise RuntimeError("Модуль БД не выбран (use_db)")
+    return db.connect_db()
+
+# Модели загружаются при первом обращении, TensorFlow настраивается
+# только при загрузке OpenNSFW2
+models = create_registry(
+    nsfw_batch_size=NSFW_BATCH_SIZE,
+    face_imgsz=FACE_IMGSZ,
+    face_conf=FACE_CONF,
+    face_max_side=FACE_MAX_SIDE or None,
+    marqo_backend=MARQO_BACKEND,
+    marqo_onnx_path=MARQO_ONNX_PATH,
+    face_backend=FACE_BACKEND,
+    face_onnx_path=FACE_ONNX_PATH,
+    face_onnx_threads=FACE_ONNX_THREADS or None,
+    nudenet_threads=(NUDENET_INTRA_OP_THREADS or None, NUDENET_INTER_OP_THREADS or None),
+    decode_size=DECODE_SIZE or None
+)
+
+# Кеш результатов моделей по sha256: копии и перемещенные файлы не анализируются повторно
+detection_cache = DetectionCache(connect_db)
+
+# phash и остальные хеши тоже кешируются по sha256: при попадании в кеш
+# всех моделей и хешей изображение не декодируется
+HASHES_CACHE_KEY = 'fingerprints'
+HASHES_REVISION = f"fingerprints-v4:{decode_revision(DECODE_SIZE or None)}"
+
+# Каскад NSFW-детекторов: с CASCADE_EARLY_EXIT дорогие модели запускаются
+# только для неоднозначных изображений
+cascade = DetectorCascade(
+    models,
+    stages=CASCADE_STAGES,
+    safe_threshold=CASCADE_SAFE_THRESHOLD,
+    nsfw_threshold=CASCADE_NSFW_THRESHOLD,
+    cache=detection_cache,
+    early_exit=CASCADE_EARLY_EXIT
+)
+
+# sha256 -> пути файлов из манифеста сканирования (для поиска перемещенных файлов)
+known_hashes = {}
+
+def get_image_dates(image):
+    """
+    Получает дату съемки и дату изменения изображения
+    
+    Args:
+        image: ImageContext изображения
+        
+    Returns:
+        tuple: (дата_съемки, дата_изменения) в формате ISO
+    """
+    try:
+        modification_date = image.modification_date()
+        shooting_date = image.shooting_date()
+        
+        # Если не нашли дату съемки, используем дату изменения
+        return shooting_date or modification_date, modification_date
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка при получении дат изображения {image.path}: {str(e)}")
+        # В случае ошибки возвращаем текущую дату
+        current_date = datetime.now().isoformat()
+        return current_date, current_date
+
+def compute_sha256(filepath):
+    """Вычисление SHA256 хеша файла"""
+    with open(filepath, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def is_valid_path(path):
+    """Проверка пути на наличие недопустимых символов"""
+    if '\0' in path:
+        logger.error(f"❌ Нулевой символ в пути: {path}")
+        return False
+    return True
+
+def normalize_path(path):
+    """Нормализация пути"""
+    normalized_path = os.path.normpath(path)
+    normalized_path = normalized_path.replace('\0', '')
+    return normalized_path
+
+def find_all_jpgs(directory):
+    """Поиск всех JPG файлов в директории (параллельный обход, пути отдаются по мере нахождения)"""
+    for entry in walk_files(directory, workers=WALK_WORKERS, with_stat=False):
+        yield entry.path
+
+def get_image_dimensions(image):
+    """Получение размеров изображения из заголовка JPEG (без декодирования пикселей)"""
+    return image.size
+
+def check_image_size(image):
+    """Проверка размеров изображения"""
+    try:
+        width, height = get_image_dimensions(image)
+        return (MIN_IMAGE_SIZE <= width <= MAX_IMAGE_SIZE and 
+                MIN_IMAGE_SIZE <= height <= MAX_IMAGE_SIZE)
+    except Exception as e:
+        logger.error(f"❌ Ошибка при проверке размеров изображения: {str(e)}")
+        return False
+
+def is_normal_size(width, height):
+    """Проверка нормальности размеров изображения"""
+    return (MIN_IMAGE_SIZE <= width <= MAX_IMAGE_SIZE and 
+            MIN_IMAGE_SIZE <= height <= MAX_IMAGE_SIZE)
+
+def is_image_small(image):
+    """Проверка, является ли изображение маленьким (правило из image_size.py)"""
+    size = get_image_dimensions(image)
+    if size:
+        width, height = size
+        return is_small_size(width, height)
+    return False
+
+def image_hashes(contexts):
+    """
+    phash и остальные хеши пакета: из кеша детекций по sha256, остальные -
+    за один проход по каждому изображению в градациях серого
+
+    Хеши считаются по изображению с ориентацией из EXIF, как раньше по
+    cv2.imread, иначе phash повернутых фото разойдется с сохраненными
+
+    Returns:
+        list: словари колонка -> значение (см. fingerprint_rows);
+            для нечитаемых изображений - словарь с ключом 'error'
+    """
+    def compute(batch):
+        rows = []
+        for context in batch:
+            try:
+                rows.append(image_fingerprints(context.oriented_rgb))
+            except Exception as e:
+                logger.error(f"❌ Ошибка при вычислении phash: {str(e)}")
+                rows.append({'error': str(e)})
+        return rows
+    return detection_cache.cached(HASHES_CACHE_KEY, HASHES_REVISION, contexts, compute)
+
+def cached_keys():
+    """Пары (модель, версия), результаты которых нужны для нового файла"""
+    return [
+        (HASHES_CACHE_KEY, HASHES_REVISION),
+        ('face', models.revision('face')),
+        *((stage, models.revision(stage)) for stage in cascade.stages)
+    ]
+
+def analyze_photo(context, cascade_outcome=None, face_result=None, hashes=None):
+    """
+    Анализирует изображение на наличие NSFW контента
+    
+    Args:
+        context: ImageContext с уже прочитанными байтами изображения
+        cascade_outcome: готовый результат каскада, если изображение уже прошло пакетный анализ
+        face_result: готовый результат детектора лиц из пакетного анализа
+        hashes: готовые хеши из пакетного анализа (image_hashes)
+    """
+    try:
+        # phash и остальные хеши, если пакетный анализ еще не сделан
+        if hashes is None:
+            hashes = image_hashes([context])[0]
+        if 'error' in hashes:
+            phash = None
+            fingerprints = {}
+        else:
+            phash = hashes.get('phash')
+            fingerprints = {column: value for column, value in hashes.items() if column != 'phash'}
+        
+        # Обнаруживаем лица, если пакетный анализ еще не сделан
+        if face_result is None:
+            face_result = detect_faces([context])[0]
+        
+        # Выводим результаты (координаты лиц - в масштабе исходного изображения)
+        face_count = face_result.get('face_count', 0)
+        face_locations = face_result.get('face_locations', [])
+        face_angles = face_result.get('face_angles', [])
+        
+        logger.info(f"👥 Обнаружено лиц: {face_count}")
+        
+        # Прогоняем изображение через каскад, если пакетный анализ еще не сделан
+        if cascade_outcome is None:
+            cascade_outcome = select_cascade_outcomes([context], [face_result])[0]
+        
+        # Итог дает последний выполненный этап каскада
+        scores = cascade.scores(cascade_outcome)
+        skipped_stages = cascade_outcome['skipped']
+        if skipped_stages:
+            logger.info(f"⏭️ Пропущены этапы каскада: {', '.join(skipped_stages)}")
+        
+        # Объединяем результаты
+        result = {
+            'nsfw_score': scores['nsfw_score'],
+            'is_erotic': scores['is_nsfw'],
+            'confidence': scores['confidence'],
+            'opennsfw2_score': scores['opennsfw2_score'],
+            'details': {
+                'nsfw_analysis': cascade_outcome['results'].get('marqo'),
+                'opennsfw2_analysis': cascade_outcome['results'].get('opennsfw2'),
+                'nudenet_analysis': cascade_outcome['results'].get('nudenet')
+            },
+            'decided_by': cascade_outcome['final'],
+            'skipped_stages': skipped_stages,
+            'face_count': face_count,
+            'face_locations': face_locations,
+            'face_angles': face_angles,
+            'face_landmarks': [],
+            'phash': phash,
+            'fingerprints': fingerprints
+        }
+        
+        return result
+        
+    except Exception as e:
+        logging.error(f"❌ Ошибка при анализе изображения: {str(e)}")
+        return None
+
+def load_image(image_path):
+    """
+    Читает изображение с диска за одно обращение
+    
+    Args:
+        image_path: путь к изображению
+        
+    Returns:
+        ImageContext: контекст изображения или None, если файл не прочитан
+    """
+    try:
+        # Читаем файл один раз для всех этапов
+        # Размеры берутся из заголовка: неподходящие файлы не читаются целиком.
+        # Пиксели декодируются сразу в размере, достаточном для моделей
+        return ImageContext.load(
+            image_path,
+            accept=is_normal_size,
+            target_size=DECODE_SIZE or None
+        )
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка при чтении изображения {image_path}: {str(e)}")
+        return None
+
+def process_image(image, cascade_outcome=None, face_result=None, hashes=None):
+    """
+    Обрабатывает одно изображение и возвращает результат анализа
+    
+    Args:
+        image: путь к изображению или ImageContext
+        cascade_outcome: готовый результат каскада из пакетного анализа
+        face_result: готовый результат детектора лиц из пакетного анализа
+        hashes: готовые хеши из пакетного анализа
+        
+    Returns:
+        dict: результат анализа или None в случае ошибки
+    """
+    context = image if isinstance(image, ImageContext) else load_image(image)
+    if context is None:
+        return None
+        
+    try:
+        # Получаем даты изображения
+        shooting_date, modification_date = get_image_dates(context)
+            
+        # Анализируем фото
+        result = analyze_photo(context, cascade_outcome, face_result, hashes)
+        if result is None:
+            return None
+            
+        # Безопасно получаем результаты анализа
+        face_count = int(result.get('face_count', 0))
+        phash = result.get('phash', '')
+        
+        # Если NSFW модели не запускались (политика face_first), оценки остаются
+        # пустыми до запуска с --backfill
+        nsfw_score = result.get('nsfw_score')
+        is_nsfw = result.get('is_erotic')
+        confidence = result.get('confidence')
+        
+        # Оценка OpenNSFW2 сохраняется, только если этот этап каскада выполнялся
+        clip_nude_score = result.get('opennsfw2_score')
+        
+        # Формируем итоговый результат
+        final_result = {
+            'is_nsfw': is_nsfw,
+            'nsfw_score': nsfw_score,
+            'clip_nude_score': clip_nude_score,
+            'face_count': face_count,
+            'confidence': confidence,
+            'shooting_date': shooting_date,
+            'modification_date': modification_date,
+            'phash': phash,
+            'fingerprints': result.get('fingerprints', {}),
+            'skipped_stages': ','.join(result.get('skipped_stages', [])),
+            'hash_sha256': context.sha256,
+            'is_small': is_image_small(context),
+            'width': context.size[0],
+            'height': context.size[1],
+            'file_size': context.file_size,
+            'mtime': context.mtime
+        }
+        
+        return final_result
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка при обработке изображения: {str(e)}")
+        return None
+    finally:
+        context.release()
+
+def prefetch_image(image_path):
+    """
+    Читает изображение и декодирует его на стадии предзагрузки, если пиксели
+    понадобятся: файлы с известным содержимым (тронутые и перемещенные)
+    и файлы, все результаты которых есть в кеше детекций, не декодируются
+    """
+    context = load_image(image_path)
+    if context is None or not context.is_loaded or not check_image_size(context):
+        return context
+    if context.sha256 in known_hashes or detection_cache.covers(context.sha256, cached_keys()):
+        return context
+    context.decode()
+    return context
+
+def set_known_hashes(hashes):
+    """Задает словарь sha256 -> пути из манифеста"""
+    global known_hashes
+    known_hashes = hashes
+
+def init_worker(db_module, hashes):
+    """Подготовка процесса-обработчика: модуль БД для кеша детекций и хеши манифеста"""
+    use_db(db_module)
+    set_known_hashes(hashes)
+
+def scan_result(context, action, **extra):
+    """
+    Результат без инференса: только данные файла для манифеста
+    
+    Args:
+        context: ImageContext изображения
+        action: 'unchanged', 'moved' или 'rejected'
+    """
+    result = {
+        'action': action,
+        'hash_sha256': context.sha256,
+        'file_size': context.file_size,
+        'mtime': context.mtime
+    }
+    result.update(extra)
+    return result
+
+def detect_faces(contexts):
+    """
+    Лица для пакета изображений: из кеша детекций, остальные
+    одним вызовом YOLO (координаты в масштабе исходных изображений)
+    """
+    detect = lambda batch: models.get('face').detect_faces_batch(
+        [context.bgr for context in batch],
+        scales=[context.scale for context in batch]
+    )
+    return detection_cache.cached('face', models.revision('face'), contexts, detect)
+
+def select_cascade_outcomes(contexts, faces):
+    """
+    Прогоняет изображения через каскад NSFW детекторов с учетом политики сканирования.
+    
+    При SCAN_POLICY = 'face_first' фото с найденным лицом в отбор на проверку
+    не попадают, поэтому NSFW модели для них не запускаются, а этапы
+    отмечаются пропущенными.
+    
+    Args:
+        contexts: список ImageContext
+        faces: результаты детектора лиц для тех же изображений
+        
+    Returns:
+        list: результаты каскада в том же порядке
+    """
+    if SCAN_POLICY != 'face_first':
+        return cascade.run(contexts)
+    
+    outcomes = [cascade.skip_all() for _ in contexts]
+    pending = [i for i, face in enumerate(faces) if face.get('face_count', 0) == 0]
+    if pending:
+        for i, outcome in zip(pending, cascade.run([contexts[i] for i in pending])):
+            outcomes[i] = outcome
+    return outcomes
+
+def process_batch(items):
+    """
+    Обрабатывает пакет изображений: каждый этап каскада считается сразу для пакета,
+    до дорогих моделей доходят только неоднозначные изображения.
+    Лица ищутся одним вызовом YOLO на весь пакет (до NSFW моделей).
+    Файлы с уже известным содержимым (тронутые или перемещенные) не анализируются.
+    
+    Args:
+        items: список пар (путь, ImageContext или None)
+        
+    Returns:
+        list: пары (путь, результат анализа или None)
+    """
+    results = {}
+    loaded = []
+    for path, context in items:
+        if context is None:
+            continue
+            
+        if not check_image_size(context):
+            logger.warning(f"⚠️ Изображение слишком маленькое или большое: {path}")
+            results[path] = scan_result(context, 'rejected')
+        elif path in known_hashes.get(context.sha256, ()):
+            # Изменилась только дата файла, содержимое то же
+            results[path] = scan_result(context, 'unchanged')
+        else:
+            moved_from = find_moved_source(path, context.sha256, known_hashes)
+            if moved_from:
+                logger.info(f"🚚 Файл перемещен: {moved_from} -> {path}")
+                results[path] = scan_result(context, 'moved', moved_from=moved_from)
+            else:
+                loaded.append((path, context))
+                continue
+        context.release()
+    
+    outcomes = []
+    faces = []
+    hashes = []
+    if loaded:
+        contexts = [context for _, context in loaded]
+        hashes = image_hashes(contexts)
+        faces = detect_faces(contexts)
+        outcomes = select_cascade_outcomes(contexts, faces)
+    
+    for (path, context), outcome, face_result, image_hash in zip(loaded, outcomes, faces, hashes):
+        results[path] = process_image(context, outcome, face_result, image_hash)
+    return [(path, results.get(path)) for path, _ in items]
+
+def print_result(result):
+    """Вывод результатов анализа в консоль"""
+    if result:
+        print(f"\nРезультаты анализа:")
+        print(f"Путь к изображению: {result['path']}")
+        print(f"Размеры: {result['dimensions']['width']}x{result['dimensions']['height']}")
+        print(f"Количество каналов: {result['dimensions']['channels']}")
+        
+        # NSFW анализ
+        nsfw_analysis = result['details']['nsfw_analysis']
+        print(f"Модель: {nsfw_analysis.get('model', 'Неизвестно')}")
+        print(f"NSFW анализ: {'NSFW' if nsfw_analysis['is_nsfw'] else 'Безопасное'}")
+        print(f"NSFW оценка: {nsfw_analysis['nsfw_score']:.4f}")
+        print(f"Безопасная оценка: {nsfw_analysis['safe_score']:.4f}")
+        print(f"Уверенность: {nsfw_analysis['confidence']:.4f}")
+        print("Детали NSFW:")
+        for class_name, score in nsfw_analysis['details'].items():
+            print(f"  {class_name}: {score:.4f}")
+        
+        # OpenNSFW2 анализ
+        opennsfw2_analysis = result['details']['opennsfw2_analysis']
+        print("OpenNSFW2 анализ:")
+        print(f"  NSFW: {opennsfw2_analysis['nsfw_score']:.4f}")
+        print(f"  Безопасное: {opennsfw2_analysis['safe_score']:.4f}")
+    else:
+        print("Не удалось проанализировать изображение")
+
+def save_result(conn, manifest, path, result):
+    """
+    Сохраняет результат анализа изображения в БД и манифест
+    
+    Args:
+        conn: соединение с БД
+        manifest: ScanManifest текущего сканирования
+        path: путь к изображению
+        result: результат process_batch
+    """
+    action = result.get('action')
+    
+    if action == 'moved':
+        if not db.rename_photo(conn, result['moved_from'], path):
+            # Старую запись уже занял другой файл: проанализируем этот в следующий раз
+            logger.warning(f"⚠️ Запись {result['moved_from']} не найдена для {path}")
+            return
+        manifest.rename(result['moved_from'], path, result['file_size'], result['mtime'], result['hash_sha256'])
+    elif action is None:
+        photo_data = {
+            'path': path,
+            'is_nude': None if result.get('is_nsfw') is None else bool(result['is_nsfw']),
+            'has_face': bool(result.get('face_count', 0) > 0),
+            'hash_sha256': result.get('hash_sha256'),
+            'clip_nude_score': result.get('clip_nude_score', 0.0),
+            'nsfw_score': result.get('nsfw_score'),
+            'is_small': bool(result.get('is_small', False)),
+            'status': 'review',
+            'phash': result.get('phash', ''),
+            'phash_int': phash_to_db(result.get('phash')),
+            **{column: result.get('fingerprints', {}).get(column) for column in FINGERPRINT_COLUMNS.values()},
+            'shooting_date': result.get('shooting_date', ''),
+            'modification_date': result.get('modification_date', ''),
+            'width': result.get('width'),
+            'height': result.get('height'),
+            'skipped_stages': result.get('skipped_stages', '')
+        }
+        if not db.insert_or_update_photo(conn, photo_data):
+            return
+        manifest.record(path, result['file_size'], result['mtime'], result['hash_sha256'])
+    else:
+        manifest.record(path, result['file_size'], result['mtime'], result['hash_sha256'])
+    conn.commit()
+
+def select_changed_files(entries, manifest, stored_hashes, legacy_entries, counts, progress=None):
+    """
+    Отбирает новые и измененные файлы по (размер, mtime), не открывая их
+    
+    Args:
+        entries: FileEntry из обхода директории
+        manifest: ScanManifest текущего сканирования
+        stored_hashes: path -> sha256 из основной таблицы
+        legacy_entries: сюда добавляются файлы, обработанные до появления манифеста
+        counts: Counter, в 'found' считается число найденных файлов
+        progress: функция, вызываемая для каждого пропущенного файла
+        
+    Yields:
+        str: путь файла, который нужно прочитать
+    """
+    for entry in entries:
+        counts['found'] += 1
+        if manifest.is_unchanged(entry.path, entry.size, entry.mtime):
+            pass
+        elif entry.path not in manifest and stored_hashes.get(entry.path):
+            # Файл обработан до появления манифеста: запомним его состояние после обхода
+            legacy_entries.append((entry, stored_hashes[entry.path]))
+        else:
+            yield entry.path
+            continue
+        if progress:
+            progress(1)
+
+def process_directory(directory_path, workers=1):
+    """
+    Обрабатывает все изображения в директории конвейером
+    
+    Args:
+        directory_path: путь к директории с изображениями
+        workers: число процессов-обработчиков (1 - все в текущем процессе)
+    """
+    try:
+        # Подключаемся к БД
+        conn = connect_db()
+        if not conn:
+            return
+            
+        # Создаем таблицу если нужно
+        db.ensure_table_schema(conn)
+        
+        # Загружаем манифест сканирования
+        manifest = ScanManifest(conn)
+        manifest.ensure_schema()
+        detection_cache.ensure_schema(conn)
+        manifest.load()
+        
+        # Пути и хеши, сохраненные в базе до появления манифеста
+        stored_hashes = db.get_stored_hashes(conn)
+        
+        hashes = manifest.paths_by_hash()
+        write = lambda path, result: save_result(conn, manifest, path, result)
+        legacy_entries = []
+        found = Counter()
+        
+        with tqdm(desc="Обработка изображений") as pbar:
+            # Файлы поступают в обработку по мере обхода директорий
+            entries = walk_files(directory_path, workers=WALK_WORKERS)
+            pending_paths = select_changed_files(
+                entries, manifest, stored_hashes, legacy_entries, found, pbar.update
+            )
+            if workers > 1:
+                # Каждый процесс загружает свои модели, запись идет только здесь
+                pool = WorkerPool(
+                    load=load_image,
+                    infer=process_batch,
+                    workers=workers,
+                    batch_size=NSFW_BATCH_SIZE,
+                    initializer=init_worker,
+                    initargs=(db.__name__, hashes),
+                    thread_total=CPU_THREAD_BUDGET
+                )
+                stats = pool.run(pending_paths, write=write, progress=pbar.update)
+            else:
+                # Чтение, инференс и запись в БД идут параллельно через ограниченные очереди
+                set_known_hashes(hashes)
+                pipeline = ScanPipeline(
+                    load=prefetch_image,
+                    infer=process_batch,
+                    write=write,
+                    prefetch_workers=PREFETCH_WORKERS,
+                    decode_queue_size=DECODE_QUEUE_SIZE,
+                    result_queue_size=RESULT_QUEUE_SIZE,
+                    batch_size=NSFW_BATCH_SIZE
+                )
+                stats = pipeline.run(pending_paths, progress=pbar.update)
+        processed_count = stats['processed']
+        
+        for entry, sha256 in legacy_entries:
+            manifest.record(entry.path, entry.size, entry.mtime, sha256)
+        conn.commit()
+        
+        total_images = found['found']
+        if total_images == 0:
+            logger.info("❌ Изображения не найдены")
+            return
+        skipped_count = total_images - sum(stats.values())
+                
+        logger.info(f"✅ Обработка завершена:")
+        logger.info(f"   - Пропущено (не изменились): {skipped_count + stats['unchanged']}")
+        logger.info(f"   - Перемещено без повторного анализа: {stats['moved']}")
+        logger.info(f"   - Отклонено по размеру: {stats['rejected']}")
+        logger.info(f"   - Обработано новых и измененных: {processed_count}")
+        logger.info(f"   - Ошибок: {stats['skipped']}")
+        logger.info(f"   - Всего: {total_images}")
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка при обработке директории: {str(e)}")
+    finally:
+        if conn:
+            conn.close()
+
+def backfill_nsfw_scores():
+    """
+    Досчитывает NSFW оценки для фото, у которых NSFW модели были пропущены
+    (политика face_first). Лица повторно не ищутся.
+    """
+    conn = connect_db()
+    if not conn:
+        return
+    
+    try:
+        db.ensure_table_schema(conn)
+        detection_cache.ensure_schema(conn)
+        paths = db.get_paths_without_nsfw_scores(conn)
+        logger.info(f"🔄 Фото без NSFW оценок: {len(paths)}")
+        
+        updated = 0
+        with tqdm(total=len(paths), desc="Досчет NSFW оценок") as pbar:
+            for start in range(0, len(paths), NSFW_BATCH_SIZE):
+                chunk = paths[start:start + NSFW_BATCH_SIZE]
+                loaded = []
+                for path in chunk:
+                    context = load_image(path)
+                    if context is not None and context.is_loaded:
+                        loaded.append((path, context))
+                    else:
+                        logger.warning(f"⚠️ Не удалось прочитать {path}")
+                
+                outcomes = cascade.run([context for _, context in loaded]) if loaded else []
+                for (path, context), outcome in zip(loaded, outcomes):
+                    context.release()
+                    scores = cascade.scores(outcome)
+                    if scores['nsfw_score'] is not None and db.update_nsfw_scores(conn, path, scores):
+                        updated += 1
+                pbar.update(len(chunk))
+        
+        logger.info(f"✅ NSFW оценки досчитаны: {updated} из {len(paths)}")
+    finally:
+        conn.close()
+
+def main(db_module):
+    """
+    Точка входа скриптов сканирования
+    
+    Args:
+        db_module: модуль доступа к БД (sqlite_db или postgres_db)
+    """
+    use_db(db_module)
+    parser = argparse.ArgumentParser(description="Поиск NSFW фотографий в каталоге")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Число процессов-обработчиков, каждый со своим набором моделей")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Досчитать NSFW оценки, пропущенные политикой face_first, вместо сканирования")
+    args = parser.parse_args()
+    
+    # Создаем директорию для логов если её нет
+    if not os.path.exists(LOG_DIR):
+        os.makedirs(LOG_DIR)
+        
+    # Формируем имя файла лога с текущей датой
+    current_date = datetime.now().strftime('%Y-%m-%d')
+    log_file = os.path.join(LOG_DIR, f'detect_nude_{current_date}.log')
+    
+    # Настройка логирования
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file, encoding='utf-8'),
+            logging.StreamHandler()  # Для вывода в консоль
+        ]
+    )
+    
+    logger.info(f"🔄 Начало обработки. Логи сохраняются в {log_file}")
+    
+    try:
+        if args.backfill or args.workers <= 1:
+            # Модели работают в этом процессе: весь бюджет потоков его
+            log_thread_budget(apply_thread_budget(thread_budget(CPU_THREAD_BUDGET)))
+        
+        if args.backfill:
+            # Досчитываем пропущенные NSFW оценки
+            backfill_nsfw_scores()
+        else:
+            # Обрабатываем директорию
+            process_directory(PHOTO_DIR, workers=args.workers)
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка: {str(e)}")
+    finally:
+        # Очищаем ресурсы при завершении
+        models.unload()
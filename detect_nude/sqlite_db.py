@@ -0,0 +1,213 @@
+import os
+import sys
+import sqlite3
+import logging
+
+# Добавляем корневую директорию в sys.path
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, root_dir)
+
+from config import DB_FILE, TABLE_NAME
+from phash_db import ensure_phash_int_column
+from fingerprints import ensure_fingerprint_columns
+
+logger = logging.getLogger(__name__)
+
+def connect_db():
+    """Подключение к базе данных"""
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        return conn
+    except sqlite3.Error as e:
+        logger.error(f"❌ Ошибка подключения к БД: {e}")
+        return None
+
+def ensure_table_schema(conn):
+    """Создание таблицы, если не существует"""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        path TEXT UNIQUE,
+        is_nude INTEGER,
+        has_face INTEGER,
+        hash_sha256 TEXT,
+        clip_nude_score REAL,
+        nsfw_score REAL,
+        status TEXT DEFAULT 'new',
+        is_small INTEGER,
+        phash TEXT,
+        views INTEGER,
+        forwards INTEGER,
+        reactions INTEGER,
+        predicted_likes INTEGER,
+        subscribers INTEGER,
+        normalized_views REAL,
+        normalized_forwards REAL,
+        publication_date TEXT,
+        message_id TEXT,
+        shooting_date TEXT,
+        modification_date TEXT,
+        width INTEGER,
+        height INTEGER,
+        skipped_stages TEXT,
+        phash_int INTEGER,
+        ahash_int INTEGER,
+        phash_dct_int INTEGER,
+        dhash_int INTEGER,
+        whash_int INTEGER
+    )
+    ''')
+
+    # Проверяем наличие всех необходимых колонок
+    existing_columns = set(
+        row[1] for row in cursor.execute(f"PRAGMA table_info({TABLE_NAME})")
+    )
+    expected_columns = {
+        'clip_nude_score': "REAL",
+        'nsfw_score': "REAL",
+        'status': "TEXT DEFAULT 'new'",
+        'is_small': "INTEGER",
+        'phash': "TEXT",
+        'views': "INTEGER",
+        'forwards': "INTEGER",
+        'reactions': "INTEGER",
+        'predicted_likes': "INTEGER",
+        'subscribers': "INTEGER",
+        'normalized_views': "REAL",
+        'normalized_forwards': "REAL",
+        'publication_date': "TEXT",
+        'message_id': "TEXT",
+        'shooting_date': "TEXT",
+        'modification_date': "TEXT",
+        'width': "INTEGER",
+        'height': "INTEGER",
+        'skipped_stages': "TEXT"
+    }
+
+    for col, coltype in expected_columns.items():
+        if col not in existing_columns:
+            cursor.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {col} {coltype}")
+
+    # Хеш как 64-битное целое: колонка, заполнение из phash и индекс
+    ensure_phash_int_column(conn, TABLE_NAME)
+    # aHash, pHash (DCT), dHash и wHash как 64-битные целые
+    ensure_fingerprint_columns(conn, TABLE_NAME)
+
+    conn.commit()
+
+def insert_or_update_photo(conn, photo_data):
+    """
+    Вставляет или обновляет информацию о фото
+
+    Статус существующей записи (approved, published и т.д.) при повторном
+    анализе измененного файла сохраняется, статус из photo_data получают
+    только новые записи.
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            INSERT INTO {TABLE_NAME} (
+                path, is_nude, has_face, hash_sha256,
+                clip_nude_score, nsfw_score, is_small,
+                status, phash, phash_int, ahash_int, phash_dct_int, dhash_int, whash_int,
+                shooting_date, modification_date, width, height, skipped_stages
+            ) VALUES (
+                :path, :is_nude, :has_face, :hash_sha256,
+                :clip_nude_score, :nsfw_score, :is_small,
+                :status, :phash, :phash_int, :ahash_int, :phash_dct_int, :dhash_int, :whash_int,
+                :shooting_date, :modification_date, :width, :height, :skipped_stages
+            )
+            ON CONFLICT (path) DO UPDATE SET
+                is_nude = excluded.is_nude,
+                has_face = excluded.has_face,
+                hash_sha256 = excluded.hash_sha256,
+                clip_nude_score = excluded.clip_nude_score,
+                nsfw_score = excluded.nsfw_score,
+                is_small = excluded.is_small,
+                status = COALESCE({TABLE_NAME}.status, excluded.status),
+                phash = excluded.phash,
+                phash_int = excluded.phash_int,
+                ahash_int = excluded.ahash_int,
+                phash_dct_int = excluded.phash_dct_int,
+                dhash_int = excluded.dhash_int,
+                whash_int = excluded.whash_int,
+                shooting_date = excluded.shooting_date,
+                modification_date = excluded.modification_date,
+                width = excluded.width,
+                height = excluded.height,
+                skipped_stages = excluded.skipped_stages
+        """, photo_data)
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"❌ Ошибка при вставке/обновлении фото: {str(e)}")
+        conn.rollback()
+        return False
+
+def rename_photo(conn, old_path, new_path):
+    """
+    Переносит запись о фото на новый путь (файл переименован или перемещен)
+
+    Returns:
+        bool: True, если запись со старым путем найдена и обновлена
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"UPDATE {TABLE_NAME} SET path = ? WHERE path = ?", (new_path, old_path))
+        updated = cursor.rowcount > 0
+        conn.commit()
+        return updated
+    except sqlite3.Error as e:
+        logger.error(f"❌ Ошибка при переименовании фото: {str(e)}")
+        conn.rollback()
+        return False
+
+def get_stored_hashes(conn):
+    """
+    Пути и sha256 всех фото в таблице (для файлов, обработанных до появления манифеста)
+
+    Returns:
+        dict: {path: sha256}
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT path, hash_sha256 FROM {TABLE_NAME}")
+    return dict(cursor.fetchall())
+
+def get_paths_without_nsfw_scores(conn):
+    """
+    Пути фото, для которых NSFW модели были пропущены (политика face_first)
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT path FROM {TABLE_NAME}
+        WHERE nsfw_score IS NULL AND COALESCE(skipped_stages, '') != ''
+    """)
+    return [row[0] for row in cursor.fetchall()]
+
+def update_nsfw_scores(conn, path, scores):
+    """
+    Записывает досчитанные NSFW оценки фото
+
+    Args:
+        scores: результат DetectorCascade.scores()
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            UPDATE {TABLE_NAME}
+            SET is_nude = ?, nsfw_score = ?, clip_nude_score = ?, skipped_stages = ?
+            WHERE path = ?
+        """, (
+            int(scores['is_nsfw']),
+            scores['nsfw_score'],
+            scores['opennsfw2_score'],
+            scores['skipped_stages'],
+            path
+        ))
+        conn.commit()
+        return cursor.rowcount > 0
+    except sqlite3.Error as e:
+        logger.error(f"❌ Ошибка при обновлении NSFW оценок: {str(e)}")
+        conn.rollback()
+        return False
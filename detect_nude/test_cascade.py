@@ -0,0 +1,125 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cascade
+from cascade import DetectorCascade
+
+STAGES = ['nudenet', 'opennsfw2', 'marqo']
+
+
+class StubRegistry:
+    """Реестр моделей без загрузки: модель этапа - его имя"""
+
+    def get(self, name):
+        return name
+
+    def revision(self, name):
+        return f"{name}:test"
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """
+    Подменяет модели этапов: оценка изображения на этапе берется из
+    context.scores[stage] (None - ошибка этапа); возвращает журнал вызовов
+    """
+    journal = {stage: [] for stage in STAGES}
+
+    def scorer(stage):
+        def score(model, contexts):
+            assert model == stage
+            journal[stage].extend(context.name for context in contexts)
+            results = []
+            for context in contexts:
+                value = context.scores.get(stage)
+                if value is None:
+                    results.append({'error': "сбой модели"})
+                else:
+                    results.append({'nsfw_score': value, 'is_nsfw': value > 0.5, 'confidence': max(value, 1 - value)})
+            return results
+        return score
+
+    monkeypatch.setattr(cascade, 'STAGE_SCORERS', {stage: scorer(stage) for stage in STAGES})
+    return journal
+
+
+def context(name, **scores):
+    return SimpleNamespace(name=name, scores=scores)
+
+
+def make_cascade(**kwargs):
+    return DetectorCascade(StubRegistry(), STAGES, safe_threshold=0.1, nsfw_threshold=0.9, **kwargs)
+
+
+def test_early_exit_on_confident_scores(calls):
+    contexts = [
+        context("safe", nudenet=0.02),
+        context("nsfw", nudenet=0.95),
+        context("unsure", nudenet=0.5, opennsfw2=0.05),
+        context("unsure_twice", nudenet=0.5, opennsfw2=0.5, marqo=0.7),
+    ]
+    outcomes = make_cascade().run(contexts)
+
+    assert calls == {
+        'nudenet': ["safe", "nsfw", "unsure", "unsure_twice"],
+        'opennsfw2': ["unsure", "unsure_twice"],
+        'marqo': ["unsure_twice"],
+    }
+    assert [outcome['final'] for outcome in outcomes] == ['nudenet', 'nudenet', 'opennsfw2', 'marqo']
+    assert outcomes[0]['skipped'] == ['opennsfw2', 'marqo']
+    assert outcomes[3]['skipped'] == []
+
+
+def test_error_goes_to_next_stage(calls):
+    contexts = [
+        context("broken_first", opennsfw2=0.01),
+        context("all_broken"),
+    ]
+    detector = make_cascade()
+    outcomes = detector.run(contexts)
+
+    assert outcomes[0]['final'] == 'opennsfw2'
+    assert outcomes[1]['final'] is None
+    assert detector.final_result(outcomes[1]) == {}
+    assert calls['marqo'] == ["all_broken"]
+
+
+def test_without_early_exit_all_stages_run(calls):
+    contexts = [context("safe", nudenet=0.0, opennsfw2=0.0, marqo=0.3)]
+    outcome = make_cascade(early_exit=False).run(contexts)[0]
+
+    assert all(calls[stage] == ["safe"] for stage in STAGES)
+    assert outcome['final'] == 'marqo'
+    assert outcome['skipped'] == []
+
+
+def test_scores(calls):
+    detector = make_cascade()
+    outcome = detector.run([context("unsure", nudenet=0.5, opennsfw2=0.95)])[0]
+    assert detector.scores(outcome) == {
+        'nsfw_score': 0.95,
+        'is_nsfw': True,
+        'confidence': 0.95,
+        'opennsfw2_score': 0.95,
+        'skipped_stages': 'marqo',
+    }
+
+    skipped = detector.scores(detector.skip_all())
+    assert skipped['nsfw_score'] is None and skipped['opennsfw2_score'] is None
+    assert skipped['skipped_stages'] == 'nudenet,opennsfw2,marqo'
+
+
+def test_invalid_stages():
+    with pytest.raises(ValueError):
+        DetectorCascade(StubRegistry(), ['nudenet', 'unknown'], 0.1, 0.9)
+    with pytest.raises(ValueError):
+        DetectorCascade(StubRegistry(), [], 0.1, 0.9)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
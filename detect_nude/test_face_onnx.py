@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from face_onnx import iou, match_boxes, parity
+
+# Выборка и модели для проверки паритета ONNX и PyTorch (тест пропускается, если их нет)
+PARITY_IMAGES = os.getenv('FACE_PARITY_IMAGES', "")
+PARITY_PT = os.getenv('FACE_PARITY_PT', "yolov8n-face.pt")
+PARITY_ONNX = os.getenv('FACE_PARITY_ONNX', "yolov8n-face.onnx")
+
+
+def test_iou():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (20, 20, 5, 5)) == 0.0
+    assert iou((0, 0, 10, 10), (5, 0, 10, 10)) == pytest.approx(50 / 150)
+
+
+def test_match_boxes():
+    reference = [(0, 0, 10, 10), (100, 100, 20, 20)]
+    candidate = [(101, 100, 20, 20), (1, 0, 10, 10), (300, 300, 5, 5)]
+    ious, unmatched = match_boxes(reference, candidate)
+    assert len(ious) == 2 and min(ious) > 0.8
+    assert unmatched == 1
+    assert match_boxes([], []) == ([], 0)
+
+
+def test_onnx_matches_torch():
+    """Рамки лиц ONNX модели совпадают с PyTorch на выборке FACE_PARITY_IMAGES"""
+    pytest.importorskip("ultralytics")
+    pytest.importorskip("onnxruntime")
+    if not PARITY_IMAGES or not os.path.isdir(PARITY_IMAGES):
+        pytest.skip("FACE_PARITY_IMAGES не задана")
+    for path in (PARITY_PT, PARITY_ONNX):
+        if not os.path.exists(path):
+            pytest.skip(f"Нет модели {path}")
+    assert parity(PARITY_IMAGES, PARITY_PT, PARITY_ONNX, limit=50)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-rs"]))
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import cv2
+import imagehash
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fingerprints import image_fingerprints
+from image_context import ImageContext
+
+# Тег EXIF Orientation: 6 - кадр нужно повернуть на 90° по часовой стрелке
+ORIENTATION_TAG = 0x0112
+
+
+def make_rotated_jpeg(path, orientation=6):
+    """Несимметричный кадр 400x240 с тегом ориентации в EXIF"""
+    image = Image.new('RGB', (400, 240), (30, 30, 30))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 150, 240), fill=(230, 230, 230))
+    draw.ellipse((220, 40, 360, 180), fill=(200, 80, 40))
+    exif = Image.Exif()
+    exif[ORIENTATION_TAG] = orientation
+    image.save(path, 'JPEG', quality=95, exif=exif.tobytes())
+
+
+def baseline_phash(path):
+    """phash, как его считал прежний сканер: cv2.imread применяет ориентацию"""
+    image = cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB)
+    return str(imagehash.average_hash(Image.fromarray(image)))
+
+
+def test_oriented_rgb_applies_exif(tmp_path):
+    path = str(tmp_path / "rotated.jpg")
+    make_rotated_jpeg(path)
+    with open(path, 'rb') as f:
+        context = ImageContext(path, f.read())
+
+    assert context.size == (400, 240)
+    assert context.oriented_rgb.size == (240, 400)
+    assert context.bgr.shape[:2] == cv2.imread(path).shape[:2]
+
+
+def test_phash_matches_cv2_imread(tmp_path):
+    path = str(tmp_path / "rotated.jpg")
+    make_rotated_jpeg(path)
+    with open(path, 'rb') as f:
+        context = ImageContext(path, f.read())
+
+    phash = image_fingerprints(context.oriented_rgb)['phash']
+    assert phash == baseline_phash(path)
+    # Без поворота хеш был бы другим
+    assert phash != image_fingerprints(context.rgb)['phash']
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
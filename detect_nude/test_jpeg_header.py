@@ -0,0 +1,80 @@
+import io
+import os
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from jpeg_header import read_image_size, read_jpeg_size
+
+
+def make_jpeg(size=(320, 200), **save_args):
+    """JPEG заданного размера в памяти"""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (120, 60, 30)).save(buffer, 'JPEG', **save_args)
+    return buffer.getvalue()
+
+
+def make_exif():
+    exif = Image.Exif()
+    exif[0x010F] = "Camera"     # Make
+    exif[0x0110] = "Model X"    # Model
+    exif[0x0112] = 6            # Orientation
+    return exif.tobytes()
+
+
+def test_baseline():
+    assert read_jpeg_size(make_jpeg((320, 200))) == (320, 200)
+
+
+def test_progressive():
+    data = make_jpeg((333, 777), progressive=True)
+    # Кадр описывает маркер SOF2
+    assert b'\xff\xc2' in data and b'\xff\xc0' not in data
+    assert read_jpeg_size(data) == (333, 777)
+
+
+def test_exif_before_sof():
+    data = make_jpeg((640, 480), exif=make_exif(), progressive=True)
+    # APP1 (EXIF) идет раньше SOF и пропускается по длине сегмента
+    assert data.index(b'Exif') < data.index(b'\xff\xc2')
+    assert read_jpeg_size(data) == (640, 480)
+
+
+def test_fill_bytes_between_markers():
+    data = make_jpeg((50, 40))
+    # Байты-заполнители 0xFF перед маркером сегмента после SOI
+    assert read_jpeg_size(data[:2] + b'\xff\xff\xff' + data[2:]) == (50, 40)
+
+
+def test_path_and_file_sources(tmp_path):
+    data = make_jpeg((123, 45), exif=make_exif())
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(data)
+    assert read_jpeg_size(str(path)) == (123, 45)
+    with open(path, 'rb') as f:
+        assert read_jpeg_size(f) == (123, 45)
+    assert read_image_size(str(path)) == (123, 45)
+
+
+def test_not_jpeg_or_truncated(tmp_path):
+    buffer = io.BytesIO()
+    Image.new('RGB', (30, 20)).save(buffer, 'PNG')
+    assert read_jpeg_size(buffer.getvalue()) is None
+    assert read_jpeg_size(b'') is None
+
+    data = make_jpeg((64, 64), exif=make_exif())
+    sof = data.index(b'\xff\xc0')
+    assert read_jpeg_size(data[:sof]) is None
+    assert read_jpeg_size(data[:sof + 6]) is None
+
+    # Не-JPEG размеры берутся через PIL
+    path = tmp_path / "image.png"
+    path.write_bytes(buffer.getvalue())
+    assert read_image_size(str(path)) == (30, 20)
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,68 @@
+import os
+import sys
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scan_manifest import MANIFEST_TABLE, ScanManifest, find_moved_source
+
+
+def open_manifest():
+    conn = sqlite3.connect(":memory:")
+    manifest = ScanManifest(conn)
+    manifest.ensure_schema()
+    return conn, manifest.load()
+
+
+def test_record_and_load():
+    conn, manifest = open_manifest()
+    manifest.record("/photos/a.jpg", 100, 1.5, "aaa")
+    manifest.record("/photos/b.jpg", 200, 2.5, "bbb")
+    manifest.record("/photos/a.jpg", 150, 3.5, "ccc")
+    conn.commit()
+
+    loaded = ScanManifest(conn).load()
+    assert "/photos/a.jpg" in loaded
+    assert loaded.is_unchanged("/photos/a.jpg", 150, 3.5)
+    assert not loaded.is_unchanged("/photos/a.jpg", 100, 1.5)
+    assert not loaded.is_unchanged("/photos/b.jpg", 200, 9.0)
+    assert not loaded.is_unchanged("/photos/new.jpg", 1, 1.0)
+
+
+def test_rename_moves_entry():
+    conn, manifest = open_manifest()
+    manifest.record("/photos/old.jpg", 100, 1.0, "aaa")
+    manifest.rename("/photos/old.jpg", "/photos/sub/new.jpg", 100, 2.0, "aaa")
+    conn.commit()
+
+    assert "/photos/old.jpg" not in manifest
+    assert manifest.is_unchanged("/photos/sub/new.jpg", 100, 2.0)
+    rows = conn.execute(f"SELECT path, hash_sha256 FROM {MANIFEST_TABLE}").fetchall()
+    assert rows == [("/photos/sub/new.jpg", "aaa")]
+
+
+def test_paths_by_hash():
+    _, manifest = open_manifest()
+    manifest.record("/a.jpg", 1, 1.0, "same")
+    manifest.record("/b.jpg", 1, 1.0, "same")
+    manifest.record("/c.jpg", 1, 1.0, "other")
+    manifest.record("/d.jpg", 1, 1.0, None)
+    assert manifest.paths_by_hash() == {"same": ["/a.jpg", "/b.jpg"], "other": ["/c.jpg"]}
+
+
+def test_find_moved_source(tmp_path):
+    existing = tmp_path / "copy.jpg"
+    existing.write_bytes(b"data")
+    moved = str(tmp_path / "moved.jpg")
+    current = str(tmp_path / "current.jpg")
+
+    # Существующий файл - копия, а не переименование
+    assert find_moved_source(current, "aaa", {"aaa": [str(existing)]}) is None
+    assert find_moved_source(current, "aaa", {"aaa": [str(existing), moved]}) == moved
+    assert find_moved_source(current, "aaa", {"aaa": [current]}) is None
+    assert find_moved_source(current, "bbb", {"aaa": [moved]}) is None
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
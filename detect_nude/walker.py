@@ -0,0 +1,74 @@
+import os
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# Файл, найденный при обходе, с размером и временем изменения
+# (None, если обход запущен без stat)
+FileEntry = namedtuple('FileEntry', ['path', 'size', 'mtime'])
+
+
+def _scan_directory(directory, extensions, with_stat):
+    """
+    Читает одну директорию
+
+    Returns:
+        tuple: (список FileEntry, список поддиректорий)
+    """
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(extensions):
+                        if '\0' in entry.path:
+                            logger.error(f"❌ Нулевой символ в пути: {entry.path}")
+                            continue
+                        path = os.path.normpath(entry.path)
+                        if not with_stat:
+                            files.append(FileEntry(path, None, None))
+                            continue
+                        # Тип файла берется из записи каталога, а размер и mtime
+                        # на Linux (и на SMB) - отдельным вызовом stat на файл.
+                        # Он выполняется здесь, в потоках обхода, параллельно
+                        # с листингом остальных директорий
+                        stat = entry.stat(follow_symlinks=False)
+                        files.append(FileEntry(path, stat.st_size, stat.st_mtime))
+                except OSError as e:
+                    logger.error(f"❌ Ошибка при чтении {entry.path}: {str(e)}")
+    except OSError as e:
+        logger.error(f"❌ Ошибка при чтении директории {directory}: {str(e)}")
+    return files, subdirs
+
+
+def walk_files(root, extensions=(".jpg",), workers=8, with_stat=True):
+    """
+    Параллельный обход дерева через os.scandir: каждая поддиректория
+    читается отдельной задачей пула потоков. Файлы отдаются по мере
+    нахождения, не дожидаясь окончания обхода.
+
+    Args:
+        root: корневая директория
+        extensions: допустимые расширения в нижнем регистре
+        workers: число потоков (одновременных листингов директорий)
+        with_stat: получать размер и mtime (stat на каждый файл); без него
+            size и mtime равны None
+
+    Yields:
+        FileEntry: путь, размер и mtime файла
+    """
+    extensions = tuple(ext.lower() for ext in extensions)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = {executor.submit(_scan_directory, root, extensions, with_stat)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                for subdir in subdirs:
+                    pending.add(executor.submit(_scan_directory, subdir, extensions, with_stat))
+                yield from files
@@ -0,0 +1,153 @@
+import queue
+import logging
+from collections import Counter
+import threading
+import multiprocessing
+
+from runtime_config import thread_budget, apply_thread_budget, log_thread_budget
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_loop(task_queue, result_queue, load, infer, budget, initializer, initargs):
+    """
+    Цикл процесса-обработчика: модели загружаются один раз при импорте
+    модуля с функциями load/infer, затем процесс берет пакеты путей
+    из общей очереди и возвращает результаты писателю.
+    """
+    apply_thread_budget(budget)
+    if initializer is not None:
+        initializer(*initargs)
+    while True:
+        paths = task_queue.get()
+        if paths is None:
+            result_queue.put(None)
+            return
+        try:
+            items = []
+            for path in paths:
+                try:
+                    items.append((path, load(path)))
+                except Exception as e:
+                    logger.error(f"❌ Ошибка при чтении {path}: {str(e)}")
+                    items.append((path, None))
+            results = infer(items)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при анализе пакета: {str(e)}")
+            results = [(path, None) for path in paths]
+        result_queue.put(results)
+
+
+class WorkerPool:
+    """
+    Многопроцессный режим обработки: N процессов со своими наборами моделей
+    берут пакеты путей из общей очереди, а запись в БД идет в одном
+    процессе-писателе (вызывающем run()).
+    """
+
+    def __init__(self, load, infer, workers, batch_size=8, queue_size=None,
+                 initializer=None, initargs=(), thread_total=0):
+        """
+        Args:
+            load: функция path -> контекст изображения или None
+                (должна импортироваться по имени, т.к. передается в процессы)
+            infer: функция [(path, контекст)] -> [(path, результат)]
+            workers: число процессов-обработчиков
+            batch_size: размер пакета путей для одного задания
+            queue_size: глубина очереди заданий (по умолчанию 2 на процесс)
+            initializer: функция, вызываемая в каждом процессе перед работой
+            initargs: аргументы для initializer
+            thread_total: потоков вычислений на все процессы (0 - все ядра)
+        """
+        self.load = load
+        self.infer = infer
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.queue_size = queue_size or self.workers * 2
+        self.budget = thread_budget(thread_total, self.workers)
+        self.initializer = initializer
+        self.initargs = initargs
+
+    def _feed(self, task_queue, paths):
+        """Нарезает пути на пакеты и раздает их процессам"""
+        batch = []
+        try:
+            for path in paths:
+                batch.append(path)
+                if len(batch) >= self.batch_size:
+                    task_queue.put(batch)
+                    batch = []
+            if batch:
+                task_queue.put(batch)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при получении списка файлов: {str(e)}")
+        finally:
+            for _ in range(self.workers):
+                task_queue.put(None)
+
+    def run(self, paths, write, progress=None):
+        """
+        Запускает процессы и записывает результаты
+
+        Args:
+            paths: итерируемый набор путей
+            write: функция (path, результат), сохраняющая результат
+            progress: функция, вызываемая с числом завершенных изображений
+
+        Returns:
+            Counter: число изображений по исходу: 'processed', 'skipped'
+                и значения поля 'action' результатов без инференса
+        """
+        # Дочерние процессы наследуют окружение, поэтому потоки делим заранее
+        apply_thread_budget(self.budget)
+        log_thread_budget(self.budget)
+        logger.info(f"🔀 Запуск {self.workers} процессов")
+
+        ctx = multiprocessing.get_context('spawn')
+        task_queue = ctx.Queue(maxsize=self.queue_size)
+        result_queue = ctx.Queue(maxsize=self.queue_size)
+
+        processes = [
+            ctx.Process(
+                target=_worker_loop,
+                args=(task_queue, result_queue, self.load, self.infer, self.budget,
+                      self.initializer, self.initargs),
+                daemon=True
+            )
+            for _ in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+
+        feeder = threading.Thread(target=self._feed, args=(task_queue, paths), daemon=True)
+        feeder.start()
+
+        stats = Counter(processed=0, skipped=0)
+        finished = 0
+        while finished < self.workers:
+            try:
+                results = result_queue.get(timeout=5)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    logger.error("❌ Все процессы-обработчики завершились аварийно")
+                    break
+                continue
+            if results is None:
+                finished += 1
+                continue
+            for path, result in results:
+                try:
+                    if result:
+                        write(path, result)
+                        stats[result.get('action', 'processed')] += 1
+                    else:
+                        stats['skipped'] += 1
+                except Exception as e:
+                    stats['skipped'] += 1
+                    logger.error(f"❌ Ошибка при сохранении {path}: {str(e)}")
+                if progress:
+                    progress(1)
+
+        for process in processes:
+            process.join(timeout=10)
+        return stats
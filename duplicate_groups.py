@@ -0,0 +1,210 @@
+from datetime import datetime
+
+import numpy as np
+
+from hash_index import HASH_BITS, hamming_distances, popcount64
+
+DUPLICATE_GROUPS_TABLE = "duplicate_groups"
+
+# Наибольший блок при попарном сравнении внутри корзины (block x block расстояний в памяти)
+PAIR_BLOCK = 2048
+
+
+class UnionFind:
+    """Система непересекающихся множеств над позициями 0..size-1"""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.rank = [0] * size
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            # Сжатие пути делением пополам
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.rank[a] < self.rank[b]:
+            a, b = b, a
+        self.parent[b] = a
+        if self.rank[a] == self.rank[b]:
+            self.rank[a] += 1
+
+
+def _bit_ranges(parts):
+    """Границы parts почти равных непрерывных частей 64-битного хеша"""
+    bounds = np.linspace(0, HASH_BITS, parts + 1).astype(int)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _bucket_pairs(hashes, positions, radius):
+    """
+    Пары позиций внутри одной корзины на расстоянии не больше radius
+
+    Расстояния считаются плитками PAIR_BLOCK x PAIR_BLOCK, поэтому память
+    не зависит от размера корзины (у aHash темные и пересвеченные кадры
+    собираются в огромные корзины)
+    """
+    values = hashes[positions]
+    found = []
+    for row_start in range(0, len(positions), PAIR_BLOCK):
+        rows = values[row_start:row_start + PAIR_BLOCK]
+        # Сравниваем только с плитками на диагонали и правее: каждая пара - один раз
+        for col_start in range(row_start, len(positions), PAIR_BLOCK):
+            cols = values[col_start:col_start + PAIR_BLOCK]
+            left, right = np.nonzero(popcount64(rows[:, None] ^ cols[None, :]) <= radius)
+            left += row_start
+            right += col_start
+            keep = right > left
+            if keep.any():
+                found.append((positions[left[keep]], positions[right[keep]]))
+    return found
+
+
+def find_pairs(hashes, radius):
+    """
+    Все пары хешей на расстоянии Хэмминга не больше radius
+
+    Хеш делится на radius + 1 частей: у пары на расстоянии не больше radius
+    хотя бы одна часть совпадает целиком (принцип Дирихле). Поэтому по каждой
+    части хеши группируются в корзины по ее значению, и расстояния считаются
+    векторно только внутри корзин, а не для всех N^2 пар.
+
+    Args:
+        hashes: массив uint64
+        radius: наибольшее расстояние Хэмминга
+
+    Returns:
+        np.ndarray: пары позиций (i, j), i < j, формы (M, 2) без повторов
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    if len(hashes) < 2 or radius < 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    found = []
+    for low, high in _bit_ranges(min(radius + 1, HASH_BITS)):
+        keys = (hashes >> np.uint64(low)) & np.uint64((1 << int(high - low)) - 1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        # Границы корзин с одинаковым значением части
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+        for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+            found.extend(_bucket_pairs(hashes, order[start:end], radius))
+
+    if not found:
+        return np.zeros((0, 2), dtype=np.int64)
+    left = np.concatenate([pair[0] for pair in found]).astype(np.int64)
+    right = np.concatenate([pair[1] for pair in found]).astype(np.int64)
+    # Пара, совпавшая по нескольким частям, учитывается один раз
+    pairs = np.unique(np.stack([np.minimum(left, right), np.maximum(left, right)], axis=1), axis=0)
+    return pairs
+
+
+def cluster_hashes(hashes, radius):
+    """
+    Группы почти-дубликатов: связные компоненты графа пар на расстоянии не больше radius
+
+    Одинаковые хеши сначала схлопываются: пары ищутся только между
+    различными значениями, иначе тысячи одинаковых хешей (например,
+    черных кадров) дали бы миллионы пар.
+
+    Returns:
+        list: группы - списки позиций хешей, по убыванию размера
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    values, inverse = np.unique(hashes, return_inverse=True)
+    groups = UnionFind(len(values))
+    for i, j in find_pairs(values, radius).tolist():
+        groups.union(i, j)
+
+    members = {}
+    for position, value in enumerate(inverse.reshape(-1).tolist()):
+        members.setdefault(groups.find(value), []).append(position)
+    return sorted(
+        (group for group in members.values() if len(group) > 1),
+        key=lambda group: (-len(group), group[0])
+    )
+
+
+def representative(hashes, group):
+    """
+    Представитель группы для ревью: хеш с наименьшей суммой расстояний
+    до остальных (при равенстве - первый)
+
+    Суммы считаются по различным значениям с учетом числа копий и плитками
+    PAIR_BLOCK x PAIR_BLOCK, так что крупные группы не требуют матрицы N x N.
+
+    Returns:
+        tuple: (позиция представителя, массив расстояний от него до членов группы)
+    """
+    members = np.asarray(hashes, dtype=np.uint64)[group]
+    values, first, counts = np.unique(members, return_index=True, return_counts=True)
+    totals = np.zeros(len(values), dtype=np.int64)
+    for row_start in range(0, len(values), PAIR_BLOCK):
+        rows = values[row_start:row_start + PAIR_BLOCK]
+        for col_start in range(0, len(values), PAIR_BLOCK):
+            cols = slice(col_start, col_start + PAIR_BLOCK)
+            distances = popcount64(rows[:, None] ^ values[None, cols])
+            totals[row_start:row_start + PAIR_BLOCK] += distances @ counts[cols]
+    # При равенстве сумм - значение, раньше встретившееся в группе
+    best = int(first[np.lexsort((first, totals))[0]])
+    return group[best], hamming_distances(members, members[best])
+
+
+def ensure_duplicate_groups_table(conn):
+    """Создает таблицу групп почти-дубликатов (SQLite)"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DUPLICATE_GROUPS_TABLE} (
+            photo_id INTEGER PRIMARY KEY,
+            group_id INTEGER NOT NULL,
+            is_representative INTEGER NOT NULL,
+            distance INTEGER NOT NULL,
+            radius INTEGER NOT NULL,
+            created_at TEXT
+        )
+    """)
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_{DUPLICATE_GROUPS_TABLE}_group_id
+        ON {DUPLICATE_GROUPS_TABLE} (group_id)
+    """)
+    conn.commit()
+
+
+def save_duplicate_groups(conn, ids, hashes, groups, radius):
+    """
+    Перезаписывает таблицу групп: по строке на фото из каждой группы
+
+    Args:
+        ids: идентификаторы фото в порядке хешей
+        hashes: массив uint64
+        groups: группы позиций из cluster_hashes
+        radius: радиус, с которым построены группы
+
+    Returns:
+        list: (group_id, id представителя, размер группы) для ревью
+    """
+    created_at = datetime.now().isoformat()
+    rows = []
+    representatives = []
+    for group_id, group in enumerate(groups, start=1):
+        best, distances = representative(hashes, group)
+        representatives.append((group_id, ids[best], len(group)))
+        for position, distance in zip(group, distances.tolist()):
+            rows.append((ids[position], group_id, int(position == best), distance, radius, created_at))
+
+    cursor = conn.cursor()
+    cursor.execute(f"DELETE FROM {DUPLICATE_GROUPS_TABLE}")
+    cursor.executemany(f"""
+        INSERT INTO {DUPLICATE_GROUPS_TABLE}
+            (photo_id, group_id, is_representative, distance, radius, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    return representatives
@@ -1,11 +1,20 @@
 import sqlite3
 import os
+import time
+import argparse
 from tqdm import tqdm
 import cv2
 import numpy as np
 from config import *
 from PIL import Image
 import imagehash
+from phash_db import ensure_phash_int_column, phash_to_db, load_phashes
+from duplicate_groups import (
+    DUPLICATE_GROUPS_TABLE, cluster_hashes, ensure_duplicate_groups_table, save_duplicate_groups
+)
+
+# Сколько вычисленных хешей записывать одной транзакцией
+WRITE_BATCH_SIZE = 500
 
 def compute_phash(image_path):
     try:
@@ -18,7 +27,7 @@ def compute_phash(image_path):
         print(f"Ошибка при обработке {image_path}: {e}")
         return None
 
-def find_duplicates():
+def find_duplicates(radius=DUPLICATE_RADIUS, show=20):
     conn = sqlite3.connect(DB_FILE)
     cur = conn.cursor()
     
@@ -29,6 +38,7 @@ def find_duplicates():
         print("Добавляем колонку phash...")
         cur.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN phash TEXT")
         conn.commit()
+    ensure_phash_int_column(conn, TABLE_NAME)
     
     # Получаем все записи без phash
     cur.execute(f"SELECT id, path FROM {TABLE_NAME} WHERE phash IS NULL")
@@ -36,59 +46,60 @@ def find_duplicates():
     
     print(f"Найдено {len(records)} фотографий без pHash")
     
-    # Вычисляем pHash для каждой фотографии
+    # Вычисляем pHash для каждой фотографии, записываем пакетами
+    updates = []
     for id, path in tqdm(records, desc="Вычисление pHash"):
         if os.path.exists(path):
             phash = compute_phash(path)
             if phash:
-                cur.execute(f"UPDATE {TABLE_NAME} SET phash = ? WHERE id = ?", (phash, id))
-                conn.commit()
-    
-    # Находим дубликаты
-    print("\nПоиск дубликатов...")
-    cur.execute(f"""
-        WITH Duplicates AS (
-            SELECT phash, COUNT(*) as count
-            FROM {TABLE_NAME}
-            WHERE phash IS NOT NULL
-            GROUP BY phash
-            HAVING COUNT(*) > 1
-        )
-        SELECT t.phash, t.id, t.path, t.status, d.count
-        FROM {TABLE_NAME} t
-        JOIN Duplicates d ON t.phash = d.phash
-        ORDER BY t.phash, t.id
-    """)
+                updates.append((phash, phash_to_db(phash), id))
+        if len(updates) >= WRITE_BATCH_SIZE:
+            cur.executemany(f"UPDATE {TABLE_NAME} SET phash = ?, phash_int = ? WHERE id = ?", updates)
+            conn.commit()
+            updates = []
+    if updates:
+        cur.executemany(f"UPDATE {TABLE_NAME} SET phash = ?, phash_int = ? WHERE id = ?", updates)
+        conn.commit()
     
-    duplicates = cur.fetchall()
+    # Находим почти-дубликаты: все пары хешей в пределах радиуса, объединенные в группы
+    print(f"\nПоиск дубликатов (расстояние Хэмминга до {radius} бит)...")
+    started = time.perf_counter()
+    ids, hashes = load_phashes(cur, f"SELECT id, phash_int FROM {TABLE_NAME} WHERE phash_int IS NOT NULL ORDER BY id")
+    groups = cluster_hashes(hashes, radius)
+    ensure_duplicate_groups_table(conn)
+    representatives = save_duplicate_groups(conn, ids, hashes, groups, radius)
+    print(f"Хешей: {len(ids)}, групп: {len(groups)}, фото в группах: {sum(map(len, groups))} "
+          f"({time.perf_counter() - started:.1f} с)")
     
-    if not duplicates:
+    if not groups:
         print("Дубликатов не найдено!")
+        conn.close()
         return
     
-    # Группируем дубликаты по pHash
-    current_hash = None
-    group = []
-    
-    print("\nНайденные дубликаты:")
-    for phash, id, path, status, count in duplicates:
-        if current_hash != phash:
-            if group:
-                print(f"\nГруппа из {len(group)} дубликатов (pHash: {current_hash}):")
-                for dup in group:
-                    print(f"  ID: {dup[0]}, Статус: {dup[2]}, Путь: {dup[1]}")
-            current_hash = phash
-            group = []
-        group.append((id, path, status))
-    
-    # Выводим последнюю группу
-    if group:
-        print(f"\nГруппа из {len(group)} дубликатов (pHash: {current_hash}):")
-        for dup in group:
-            print(f"  ID: {dup[0]}, Статус: {dup[2]}, Путь: {dup[1]}")
+    # Выводим представителей групп для ревью, начиная с крупных групп
+    print(f"\nПредставители групп (таблица {DUPLICATE_GROUPS_TABLE}):")
+    for group_id, photo_id, size in representatives[:show]:
+        cur.execute(f"""
+            SELECT t.id, t.path, t.status, g.distance, g.is_representative
+            FROM {DUPLICATE_GROUPS_TABLE} g
+            JOIN {TABLE_NAME} t ON t.id = g.photo_id
+            WHERE g.group_id = ?
+            ORDER BY g.is_representative DESC, g.distance, t.id
+        """, (group_id,))
+        print(f"\nГруппа {group_id} из {size} фото:")
+        for id, path, status, distance, is_representative in cur.fetchall():
+            mark = "*" if is_representative else " "
+            print(f" {mark} ID: {id}, Статус: {status}, Расстояние: {distance}, Путь: {path}")
+    if len(representatives) > show:
+        print(f"\n... и еще {len(representatives) - show} групп")
     
     conn.close()
 
 if __name__ == "__main__":
-    find_duplicates()
+    parser = argparse.ArgumentParser(description="Поиск почти-дубликатов по pHash")
+    parser.add_argument("--radius", type=int, default=DUPLICATE_RADIUS,
+                        help="Наибольшее расстояние Хэмминга между хешами дубликатов")
+    parser.add_argument("--show", type=int, default=20, help="Сколько групп вывести")
+    args = parser.parse_args()
+    find_duplicates(args.radius, args.show)
     print("\nГотово!") 
\ No newline at end of file
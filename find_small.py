@@ -1,6 +1,7 @@
 import os
-from PIL import Image
 import sqlite3
+from detect_nude.jpeg_header import read_image_size
+from image_size import SMALL_SIZE_SQL, is_small_size, small_size_params
 
 # Параметры подключения
 DB_PATH = 'database.db'  # Путь к вашей базе данных
@@ -9,6 +10,8 @@ IMAGE_DIR = r"/mnt/smb/OneDrive/Pictures/!Фотосессии/"         # Па
 # Имя таблицы
 TABLE_NAME = "photos_ok"
 
+# Через сколько обновлений делать commit
+COMMIT_EVERY = 500
 
 
 # Функция для получения списка столбцов таблицы
@@ -17,15 +20,6 @@ def get_table_columns(cursor, table_name):
     columns = [column[1] for column in cursor.fetchall()]
     return columns
 
-# Функция для получения размеров изображения
-def get_image_size(image_path):
-    try:
-        with Image.open(image_path) as img:
-            return img.size  # Возвращает кортеж (width, height)
-    except Exception as e:
-        print(f"Ошибка при обработке изображения {image_path}: {e}")
-        return None
-
 # Подключение к базе данных
 conn = sqlite3.connect(DB_PATH)
 cursor = conn.cursor()
@@ -33,34 +27,52 @@ cursor = conn.cursor()
 # Получение списка столбцов в таблице
 columns = get_table_columns(cursor, TABLE_NAME)
 
-# Проверка наличия столбца 'is_small', если нет - добавление
+# Проверка наличия столбцов 'is_small', 'width', 'height', если нет - добавление
 if 'is_small' not in columns:
     cursor.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN is_small INTEGER DEFAULT 0;")
     conn.commit()
     print(f"Столбец 'is_small' успешно добавлен в таблицу '{TABLE_NAME}'.")
+for column in ('width', 'height'):
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {column} INTEGER;")
+        conn.commit()
+        print(f"Столбец '{column}' успешно добавлен в таблицу '{TABLE_NAME}'.")
+
+# Размеры из уже сохраненных width/height: файл читать не нужно
+cursor.execute(f"""
+    UPDATE {TABLE_NAME}
+    SET is_small = CASE WHEN {SMALL_SIZE_SQL} THEN 1 ELSE 0 END
+    WHERE width IS NOT NULL AND height IS NOT NULL
+""", small_size_params())
+conn.commit()
 
-# Получение списка всех изображений из базы данных
-cursor.execute(f"SELECT id, path FROM {TABLE_NAME}")
+# Получение списка изображений без сохраненных размеров
+cursor.execute(f"SELECT id, path FROM {TABLE_NAME} WHERE width IS NULL OR height IS NULL")
 rows = cursor.fetchall()
 
 # Обработка каждого изображения
+updated = 0
 for row in rows:
     image_id, image_path = row
     full_image_path = os.path.join(IMAGE_DIR, image_path)
 
-    # Получение размеров изображения
-    size = get_image_size(full_image_path)
+    # Размеры читаются из заголовка JPEG (первые КБ файла), без декодирования
+    size = read_image_size(full_image_path)
     if size:
         width, height = size
-        is_small = 1 if width < 2500 and height < 2500 else 0
+        is_small = 1 if is_small_size(width, height) else 0
 
         # Обновление записи в базе данных
         cursor.execute(
-            f"UPDATE {TABLE_NAME} SET is_small = ? WHERE id = ?",
-            (is_small, image_id)
+            f"UPDATE {TABLE_NAME} SET width = ?, height = ?, is_small = ? WHERE id = ?",
+            (width, height, is_small, image_id)
         )
-        conn.commit()
-        print(f"Обновлена запись для изображения {image_id}: is_small = {is_small}")
+        updated += 1
+        if updated % COMMIT_EVERY == 0:
+            conn.commit()
+        print(f"Обновлена запись для изображения {image_id}: {width}x{height}, is_small = {is_small}")
+
+conn.commit()
 
 # Закрытие соединения с базой данных
 conn.close()
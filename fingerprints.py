@@ -0,0 +1,185 @@
+import sqlite3
+from collections import namedtuple
+
+import numpy as np
+import pywt
+from PIL import Image
+
+from phash_db import phash_to_db
+
+# Сторона миниатюры в градациях серого для phash (DCT) и whash
+THUMBNAIL_SIZE = 32
+# Сторона хеша: 8 x 8 = 64 бита
+HASH_SIZE = 8
+
+# Хеш -> колонка с 64-битным целым в таблице фотографий.
+# Колонка phash (hex average_hash из imagehash) остается как есть:
+# с ней сверяются хеши телеграм-канала. Ее значение - те же биты, что ahash
+FINGERPRINT_COLUMNS = {
+    'ahash': 'ahash_int',
+    'phash': 'phash_dct_int',
+    'dhash': 'dhash_int',
+    'whash': 'whash_int',
+}
+
+
+# Уменьшенные копии одного изображения в градациях серого, каждая в том
+# размере, в котором ее берет imagehash: large - THUMBNAIL_SIZE x THUMBNAIL_SIZE
+# (phash, whash), small - 8 x 8 (ahash), wide - 8 x 9 (dhash)
+Thumbnail = namedtuple('Thumbnail', ['large', 'small', 'wide'])
+
+
+def _dct_matrix(size, count):
+    """Первые count строк матрицы DCT-II размера size (без нормировки)"""
+    k = np.arange(count)[:, None]
+    n = np.arange(size)[None, :]
+    return np.cos(np.pi * k * (2 * n + 1) / (2 * size))
+
+
+_DCT_LOW = _dct_matrix(THUMBNAIL_SIZE, HASH_SIZE)
+
+
+def thumbnail(image):
+    """
+    Уменьшенные копии для всех хешей: изображение переводится в градации
+    серого один раз, затем уменьшается LANCZOS до размера каждого хеша
+    (как в imagehash, поэтому ahash, phash и dhash совпадают с ним бит в бит)
+
+    Args:
+        image: изображение PIL (любой режим)
+
+    Returns:
+        Thumbnail: массивы uint8
+    """
+    if image.mode != 'L':
+        image = image.convert('L')
+
+    def resize(width, height):
+        return np.asarray(image.resize((width, height), Image.LANCZOS), dtype=np.uint8)
+
+    return Thumbnail(
+        large=resize(THUMBNAIL_SIZE, THUMBNAIL_SIZE),
+        small=resize(HASH_SIZE, HASH_SIZE),
+        wide=resize(HASH_SIZE + 1, HASH_SIZE)
+    )
+
+
+def load_thumbnail(path):
+    """
+    Миниатюры прямо из файла: JPEG декодируется сразу в градациях серого
+    с масштабированием DCT, полное разрешение не декодируется
+    (значения могут отличаться от хешей полного изображения на несколько бит)
+    """
+    with Image.open(path) as image:
+        image.draft('L', (THUMBNAIL_SIZE * 4, THUMBNAIL_SIZE * 4))
+        return thumbnail(image)
+
+
+def _haar_low(pixels):
+    """
+    LL вейвлета Хаара 8 x 8 для пакета миниатюр (N, 32, 32) без LL
+    максимального уровня - как в imagehash.whash
+    """
+    levels = int(np.log2(THUMBNAIL_SIZE))
+    coeffs = pywt.wavedec2(pixels, 'haar', level=levels, axes=(-2, -1))
+    coeffs[0] = coeffs[0] * 0
+    pixels = pywt.waverec2(coeffs, 'haar', axes=(-2, -1))
+    return pywt.wavedec2(pixels, 'haar', level=levels - int(np.log2(HASH_SIZE)), axes=(-2, -1))[0]
+
+
+def _pack_bits(bits):
+    """Булевы матрицы (N, 8, 8) -> uint64, первый бит - старший (как hex в imagehash)"""
+    packed = np.packbits(bits.reshape(len(bits), -1), axis=1)
+    return packed.view('>u8').reshape(len(bits)).astype(np.uint64)
+
+
+def compute_fingerprints(thumbnails):
+    """
+    Все четыре хеша для пакета миниатюр: каждый хеш - несколько матричных
+    операций над всем пакетом сразу
+
+    - ahash: пиксели 8 x 8 выше среднего (= imagehash.average_hash)
+    - phash: низкие частоты DCT 32 x 32 выше медианы (= imagehash.phash)
+    - dhash: пиксель 8 x 9 ярче соседа слева (= imagehash.dhash)
+    - whash: LL-коэффициенты вейвлета Хаара 8 x 8 без постоянной
+      составляющей выше медианы (= imagehash.whash(image, image_scale=32)).
+      Считается теми же вызовами pywt, что и в imagehash, только по всему
+      пакету: у шумных изображений коэффициенты часто равны медиане, и любая
+      другая арифметика меняет биты. imagehash по умолчанию берет масштаб
+      по разрешению изображения, и хеш меняется вместе с размером
+      декодирования; фиксированный масштаб 32 от разрешения не зависит,
+      поэтому whash_int не совпадает с whash по умолчанию
+
+    Args:
+        thumbnails: список Thumbnail
+
+    Returns:
+        dict: имя хеша -> массив uint64 длины N
+    """
+    if not len(thumbnails):
+        return {name: np.zeros(0, dtype=np.uint64) for name in FINGERPRINT_COLUMNS}
+    large = np.stack([thumb.large for thumb in thumbnails]).astype(np.float64)
+    small = np.stack([thumb.small for thumb in thumbnails]).astype(np.float64)
+    wide = np.stack([thumb.wide for thumb in thumbnails]).astype(np.float64)
+
+    low = _DCT_LOW @ large @ _DCT_LOW.T
+    haar = _haar_low(large / 255.)
+
+    def above_median(values):
+        return values > np.median(values.reshape(len(values), -1), axis=1)[:, None, None]
+
+    return {
+        'ahash': _pack_bits(small > small.mean(axis=(1, 2), keepdims=True)),
+        'phash': _pack_bits(above_median(low)),
+        'dhash': _pack_bits(wide[:, :, 1:] > wide[:, :, :-1]),
+        'whash': _pack_bits(above_median(haar)),
+    }
+
+
+def legacy_phash(ahash):
+    """
+    Значение колонки phash по ahash: hex-строка, равная
+    str(imagehash.average_hash(image)) для того же изображения
+    """
+    return f"{int(ahash):0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+
+def fingerprint_rows(thumbnails):
+    """
+    Хеши пакета миниатюр для записи в БД
+
+    Returns:
+        list: для каждой миниатюры словарь колонка -> значение: phash - hex
+            average_hash, колонки FINGERPRINT_COLUMNS - int64 со знаком
+    """
+    fingerprints = compute_fingerprints(thumbnails)
+    columns = [(FINGERPRINT_COLUMNS[name], values.tolist()) for name, values in fingerprints.items()]
+    ahashes = fingerprints['ahash'].tolist()
+    return [
+        {'phash': legacy_phash(ahashes[i]), **{column: phash_to_db(values[i]) for column, values in columns}}
+        for i in range(len(thumbnails))
+    ]
+
+
+def image_fingerprints(image):
+    """Хеши одного изображения PIL для записи в БД (см. fingerprint_rows)"""
+    return fingerprint_rows([thumbnail(image)])[0]
+
+
+def ensure_fingerprint_columns(conn, table):
+    """
+    Миграция: добавляет колонки хешей (INTEGER в SQLite, BIGINT в PostgreSQL)
+    и индексы по ним. Значения заполняет add_phash.py.
+    """
+    is_sqlite = isinstance(conn, sqlite3.Connection)
+    cursor = conn.cursor()
+    if is_sqlite:
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for column in FINGERPRINT_COLUMNS.values():
+        if is_sqlite:
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER")
+        else:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} BIGINT")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+    conn.commit()
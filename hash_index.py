@@ -0,0 +1,182 @@
+from itertools import combinations
+
+import numpy as np
+
+HASH_BITS = 64
+
+
+def hash_to_int(value):
+    """
+    Приводит перцептивный хеш к целому числу
+
+    Args:
+        value: int, hex-строка (как хранится в БД) или ImageHash
+
+    Returns:
+        int или None для пустого значения
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    # ImageHash сравнивается только с ImageHash, поэтому пустое значение
+    # проверяется уже у строки
+    value = str(value)
+    if not value:
+        return None
+    return int(value, 16)
+
+
+if hasattr(np, 'bitwise_count'):
+    def popcount64(values):
+        """Число единичных бит в каждом элементе массива uint64"""
+        return np.bitwise_count(values).astype(np.int64)
+else:
+    _BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+    def popcount64(values):
+        """Число единичных бит в каждом элементе массива uint64"""
+        values = np.ascontiguousarray(values, dtype=np.uint64)
+        return _BYTE_BITS[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+def hamming_distances(hashes, value):
+    """Расстояния Хэмминга от хеша value до каждого хеша массива uint64"""
+    return popcount64(hashes ^ np.uint64(value))
+
+
+def max_distance(min_similarity, bits=HASH_BITS):
+    """Наибольшее расстояние Хэмминга, при котором схожесть 1 - d / bits не ниже порога"""
+    return int((1 - min_similarity) * bits + 1e-9)
+
+
+class HashIndex:
+    """
+    Индекс 64-битных перцептивных хешей для поиска по расстоянию Хэмминга.
+
+    Multi-index hashing: хеш делится на chunks частей, по каждой части
+    хранится отсортированная таблица. Если расстояние до хеша не больше r,
+    то хотя бы одна часть отличается не более чем на r // chunks бит,
+    поэтому кандидатов ищем перебором близких значений частей, а точное
+    расстояние считаем только для них. Для больших радиусов, где перебор
+    дороже полного просмотра, используется векторный просмотр всех хешей.
+    """
+
+    def __init__(self, hashes, ids=None, chunks=4, max_chunk_radius=2):
+        """
+        Args:
+            hashes: хеши (int, hex-строки или ImageHash), пустые не допускаются
+            ids: идентификаторы записей в том же порядке (по умолчанию позиции)
+            chunks: на сколько частей делится хеш (64 должно делиться нацело)
+            max_chunk_radius: наибольший радиус перебора внутри части,
+                дальше - полный просмотр (на миллионе хешей перебор
+                выгоднее только до радиуса 2, т.е. r <= 11)
+        """
+        if isinstance(hashes, np.ndarray):
+            self.hashes = hashes.astype(np.uint64)
+        else:
+            self.hashes = np.array([hash_to_int(value) for value in hashes], dtype=np.uint64)
+        self.ids = list(ids) if ids is not None else list(range(len(self.hashes)))
+        if len(self.ids) != len(self.hashes):
+            raise ValueError("Число идентификаторов не совпадает с числом хешей")
+        if HASH_BITS % chunks:
+            raise ValueError(f"{HASH_BITS} бит нельзя поделить на {chunks} частей")
+
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self.max_chunk_radius = max_chunk_radius
+        self._chunk_mask = np.uint64((1 << self.chunk_bits) - 1)
+        self._masks = {}
+
+        # Для каждой части: отсортированные значения и позиции хешей
+        self._tables = []
+        for chunk in range(chunks):
+            keys = self._chunk(self.hashes, chunk)
+            order = np.argsort(keys, kind='stable')
+            self._tables.append((keys[order], order))
+
+    @classmethod
+    def from_pairs(cls, pairs, **kwargs):
+        """Индекс из пар (идентификатор, хеш); записи без хеша пропускаются"""
+        pairs = [(key, value) for key, value in pairs if value]
+        return cls([value for _, value in pairs], ids=[key for key, _ in pairs], **kwargs)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _chunk(self, values, chunk):
+        return (values >> np.uint64(chunk * self.chunk_bits)) & self._chunk_mask
+
+    def _flip_masks(self, radius):
+        """Все маски не более чем из radius бит в пределах одной части"""
+        if radius not in self._masks:
+            self._masks[radius] = np.array([
+                sum(1 << bit for bit in bits)
+                for count in range(radius + 1)
+                for bits in combinations(range(self.chunk_bits), count)
+            ], dtype=np.uint64)
+        return self._masks[radius]
+
+    def _candidates(self, value, chunk_radius):
+        """Позиции хешей, у которых хотя бы одна часть отличается не более чем на chunk_radius бит"""
+        masks = self._flip_masks(chunk_radius)
+        found = []
+        for chunk, (keys, order) in enumerate(self._tables):
+            probes = self._chunk(np.uint64(value), chunk) ^ masks
+            left = np.searchsorted(keys, probes, side='left')
+            lengths = np.searchsorted(keys, probes, side='right') - left
+            if not lengths.any():
+                continue
+            # Склеиваем диапазоны [left, left + length) в один массив позиций
+            offsets = np.repeat(left - np.cumsum(lengths) + lengths, lengths)
+            found.append(order[offsets + np.arange(lengths.sum())])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def _results(self, positions, distances):
+        order = np.lexsort((positions, distances))
+        return [(self.ids[positions[i]], int(distances[i])) for i in order]
+
+    def radius_query(self, value, radius):
+        """
+        Все хеши на расстоянии Хэмминга не больше radius
+
+        Returns:
+            list: пары (идентификатор, расстояние) по возрастанию расстояния
+        """
+        value = hash_to_int(value)
+        if value is None or not len(self.hashes):
+            return []
+        chunk_radius = radius // self.chunks
+        if chunk_radius > self.max_chunk_radius:
+            distances = hamming_distances(self.hashes, value)
+            positions = np.flatnonzero(distances <= radius)
+            return self._results(positions, distances[positions])
+
+        positions = self._candidates(value, chunk_radius)
+        distances = hamming_distances(self.hashes[positions], value)
+        keep = distances <= radius
+        return self._results(positions[keep], distances[keep])
+
+    def knn(self, value, k=1):
+        """
+        k ближайших хешей
+
+        Returns:
+            list: пары (идентификатор, расстояние) по возрастанию расстояния
+        """
+        value = hash_to_int(value)
+        if value is None or not len(self.hashes) or k <= 0:
+            return []
+
+        # Радиус растет, пока не найдется k хешей: все, что дальше, хуже найденных
+        for chunk_radius in range(self.max_chunk_radius + 1):
+            found = self.radius_query(value, chunk_radius * self.chunks + self.chunks - 1)
+            if len(found) >= k:
+                return found[:k]
+
+        distances = hamming_distances(self.hashes, value)
+        k = min(k, len(distances))
+        positions = np.argpartition(distances, k - 1)[:k]
+        return self._results(positions, distances[positions])
@@ -0,0 +1,18 @@
+from config import SMALL_IMAGE_SIZE
+
+# Единое правило "маленького" фото для find_small.py, prepare_for_review.py
+# и сканера: обе стороны меньше SMALL_IMAGE_SIZE
+
+# То же правило как SQL-условие по колонкам width и height
+# (параметры: SMALL_IMAGE_SIZE дважды, см. small_size_params)
+SMALL_SIZE_SQL = "(width < ? AND height < ?)"
+
+
+def is_small_size(width, height, small_size=SMALL_IMAGE_SIZE):
+    """Фото маленькое, если обе стороны меньше small_size"""
+    return width < small_size and height < small_size
+
+
+def small_size_params(small_size=SMALL_IMAGE_SIZE):
+    """Параметры для SMALL_SIZE_SQL"""
+    return (small_size, small_size)
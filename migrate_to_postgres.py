@@ -3,6 +3,7 @@ import logging
 from tqdm import tqdm
 from detect_nude.postgres_db import connect_db, ensure_table_schema
 from detect_nude.config import TABLE_NAME, DB_PATH
+from phash_db import phash_to_db
 
 # Настройка логирования
 logging.basicConfig(
@@ -97,6 +98,7 @@ def migrate_data():
                     'is_small': convert_bool(row[6]),
                     'status': str(row[7]) if row[7] is not None else None,
                     'phash': str(row[8]) if row[8] is not None else None,
+                    'phash_int': phash_to_db(row[8]),
                     'shooting_date': row[9],
                     'modification_date': row[10]
                 }
@@ -107,11 +109,11 @@ def migrate_data():
                         INSERT INTO {TABLE_NAME} (
                             path, is_nude, has_face, hash_sha256,
                             clip_nude_score, nsfw_score, is_small,
-                            status, phash, shooting_date, modification_date
+                            status, phash, phash_int, shooting_date, modification_date
                         ) VALUES (
                             %(path)s, %(is_nude)s, %(has_face)s, %(hash_sha256)s,
                             %(clip_nude_score)s, %(nsfw_score)s, %(is_small)s,
-                            %(status)s, %(phash)s, %(shooting_date)s, %(modification_date)s
+                            %(status)s, %(phash)s, %(phash_int)s, %(shooting_date)s, %(modification_date)s
                         )
                         ON CONFLICT (path) DO UPDATE SET
                             is_nude = EXCLUDED.is_nude,
@@ -122,6 +124,7 @@ def migrate_data():
                             is_small = EXCLUDED.is_small,
                             status = EXCLUDED.status,
                             phash = EXCLUDED.phash,
+                            phash_int = EXCLUDED.phash_int,
                             shooting_date = EXCLUDED.shooting_date,
                             modification_date = EXCLUDED.modification_date
                     """, photo_data)
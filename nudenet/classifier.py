@@ -3,47 +3,97 @@ import onnxruntime as ort
 import numpy as np
 import cv2
 
+INPUT_SIZE = 256
+
 class NudeClassifier:
-    def __init__(self):
+    def __init__(self, intra_op_threads=None, inter_op_threads=None,
+                 graph_optimization_level=ort.GraphOptimizationLevel.ORT_ENABLE_ALL):
         model_path = os.path.join(os.path.dirname(__file__), "classifier_model.onnx")
-        self.session = ort.InferenceSession(model_path, providers=[ "CUDAExecutionProvider", "CPUExecutionProvider"]
-)
 
-    def preprocess(self, image_path):
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = graph_optimization_level
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CUDAExecutionProvider", "CPUExecutionProvider"]
+        )
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Если размер пакета зафиксирован в модели, пакеты подаются именно такого размера
+        self.fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
 
-        if img is None or img.shape[0] == 0 or img.shape[1] == 0:
-            raise ValueError(f"Невозможно загрузить изображение или оно пустое: {image_path}")
+    def _to_rgb(self, image):
+        """Путь, PIL изображение или массив RGB -> массив RGB uint8 (H, W, 3)"""
+        if isinstance(image, str):
+            img = cv2.imread(image, cv2.IMREAD_COLOR)
+            if img is None or img.shape[0] == 0 or img.shape[1] == 0:
+                raise ValueError(f"Невозможно загрузить изображение или оно пустое: {image}")
+            return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+        if hasattr(image, "convert"):
+            image = image.convert("RGB")
+        img = np.asarray(image)
 
         # Grayscale → RGB
-        if len(img.shape) == 2:
+        if img.ndim == 2:
             img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
-        elif len(img.shape) == 3 and img.shape[2] == 4:
-            img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGB)
-        elif len(img.shape) == 3 and img.shape[2] == 3:
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        else:
-            raise ValueError(f"Неподдерживаемый формат изображения: {image_path}")
+        elif img.ndim == 3 and img.shape[2] == 4:
+            img = cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
+        elif img.ndim != 3 or img.shape[2] != 3:
+            raise ValueError(f"Неподдерживаемый формат изображения: {img.shape}")
+        return img
 
+    def prepare(self, image):
+        """Один вход модели (256, 256, 3) float32 из пути, PIL изображения или массива RGB"""
         # Resize to 256x256 (новая модель требует именно это)
-        img = cv2.resize(img, (256, 256))
-        img = img.astype(np.float32) / 255.0
-        img = np.expand_dims(img, axis=0)  # NHWC → (1, 256, 256, 3)
+        img = cv2.resize(self._to_rgb(image), (INPUT_SIZE, INPUT_SIZE))
+        return img.astype(np.float32) / 255.0
 
-        if img.shape != (1, 256, 256, 3):
+    def preprocess(self, image_path):
+        img = np.expand_dims(self.prepare(image_path), axis=0)  # NHWC → (1, 256, 256, 3)
+
+        if img.shape != (1, INPUT_SIZE, INPUT_SIZE, 3):
             raise ValueError(f"Неверная форма входа: {img.shape} для файла {image_path}")
 
         return img
 
+    @staticmethod
+    def _build_result(scores):
+        result = float(scores[1])
+        is_nude = 1 if result >= 0.85 else 0
+        return {"unsafe": result, "safe": 1.0 - result, "is_nude": is_nude}
+
     def classify(self, image_path):
         input_tensor = self.preprocess(image_path)
-        input_name = self.session.get_inputs()[0].name
-        outputs = self.session.run(None, {input_name: input_tensor})
+        outputs = self.session.run(None, {self.input_name: input_tensor})
 
         try:
-            result = float(outputs[0][0][1])
-            is_nude = 1 if result >= 0.85 else 0
-            return {image_path: {"unsafe": result, "safe": 1.0 - result, "is_nude": is_nude}}
+            return {image_path: self._build_result(outputs[0][0])}
         except Exception as e:
             raise ValueError(f"Ошибка при разборе вывода модели для {image_path}: {e}")
 
+    def classify_batch(self, images, batch_size=16):
+        """
+        Классифицирует пакет изображений: входы складываются в один тензор NHWC
+
+        Args:
+            images: пути, PIL изображения или массивы RGB
+            batch_size: сколько изображений подавать в модель за один вызов
+
+        Returns:
+            list: словари {"unsafe", "safe", "is_nude"} в том же порядке
+        """
+        batch_size = self.fixed_batch or batch_size
+        results = []
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            batch = np.stack([self.prepare(image) for image in chunk])
+            if self.fixed_batch and len(chunk) < self.fixed_batch:
+                # Неполный пакет дополняется нулями до фиксированного размера
+                batch = np.concatenate([batch, np.zeros((self.fixed_batch - len(chunk),) + batch.shape[1:], np.float32)])
+            outputs = self.session.run(None, {self.input_name: batch})
+            results.extend(self._build_result(scores) for scores in outputs[0][:len(chunk)])
+        return results
@@ -0,0 +1,95 @@
+import sqlite3
+import logging
+
+import numpy as np
+
+from hash_index import hash_to_int
+
+logger = logging.getLogger(__name__)
+
+# Хеш как 64-битное целое рядом с hex-строкой phash
+PHASH_INT_COLUMN = "phash_int"
+
+
+def phash_to_db(value):
+    """
+    Хеш для записи в phash_int: 64-битное число со знаком
+    (INTEGER в SQLite и BIGINT в PostgreSQL не хранят беззнаковые 64 бита)
+
+    Args:
+        value: hex-строка, int или ImageHash
+
+    Returns:
+        int или None для пустого значения
+    """
+    value = hash_to_int(value)
+    if value is None:
+        return None
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def db_to_uint64(values):
+    """Значения phash_int из БД -> массив uint64 с исходными битами хешей"""
+    return np.array(values, dtype=np.int64).view(np.uint64)
+
+
+def load_phashes(cursor, query, params=()):
+    """
+    Читает хеши запросом сразу в массив uint64
+
+    Args:
+        cursor: курсор sqlite3 или psycopg2
+        query: запрос, последняя колонка которого - phash_int (не NULL)
+        params: параметры запроса
+
+    Returns:
+        tuple: (ключи - первая колонка или кортеж остальных колонок,
+            массив uint64 хешей в том же порядке)
+    """
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    keys = [row[0] if len(row) == 2 else tuple(row[:-1]) for row in rows]
+    return keys, db_to_uint64([row[-1] for row in rows])
+
+
+def ensure_phash_int_column(conn, table):
+    """
+    Миграция: добавляет колонку phash_int, заполняет ее из phash и индексирует.
+
+    Повторный вызов заполняет только строки, где phash есть, а phash_int нет.
+    Работает с соединениями sqlite3 и psycopg2.
+    """
+    is_sqlite = isinstance(conn, sqlite3.Connection)
+    ph = '?' if is_sqlite else '%s'
+    cursor = conn.cursor()
+
+    if is_sqlite:
+        columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        if PHASH_INT_COLUMN not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {PHASH_INT_COLUMN} INTEGER")
+    else:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {PHASH_INT_COLUMN} BIGINT")
+
+    # Строки обновляются по ключу: rowid в SQLite, path в PostgreSQL
+    key = 'rowid' if is_sqlite else 'path'
+    cursor.execute(f"""
+        SELECT {key}, phash FROM {table}
+        WHERE phash IS NOT NULL AND phash != '' AND {PHASH_INT_COLUMN} IS NULL
+    """)
+    updates = []
+    for row_key, phash in cursor.fetchall():
+        try:
+            updates.append((phash_to_db(phash), row_key))
+        except ValueError:
+            logger.warning(f"⚠️ Некорректный phash: {phash}")
+    if updates:
+        cursor.executemany(
+            f"UPDATE {table} SET {PHASH_INT_COLUMN} = {ph} WHERE {key} = {ph}", updates
+        )
+        logger.info(f"🔢 phash_int заполнен для {len(updates)} записей")
+
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_{table}_{PHASH_INT_COLUMN}
+        ON {table} ({PHASH_INT_COLUMN})
+    """)
+    conn.commit()
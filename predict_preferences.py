@@ -2,10 +2,48 @@ import torch
 import clip
 from PIL import Image
 import sqlite3
+import hashlib
+import numpy as np
 from pathlib import Path
 from tqdm import tqdm
 from config import *
 from train_classifier import LikesPredictor
+from detect_nude.embedding_store import EmbeddingStore
+
+# Сколько изображений кодируется CLIP за один вызов
+BATCH_SIZE = 32
+
+def file_sha256(path):
+    """SHA256 файла для файлов, у которых хеш еще не сохранен в базе"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def encode_paths(clip_model, preprocess, device, paths):
+    """
+    Признаки encode_image пакета clip для пакета файлов
+
+    LikesPredictor обучен именно на них, поэтому здесь не используется
+    CLIPNudeChecker (CLIP из transformers): его признаки с этой моделью
+    не сверялись.
+
+    Returns:
+        np.ndarray: (число файлов, размерность) float32; для файлов,
+            которые не удалось прочитать, строка из NaN
+    """
+    result = np.full((len(paths), clip_model.visual.output_dim), np.nan, dtype=np.float32)
+    images = []
+    valid = []
+    for i, path in enumerate(paths):
+        try:
+            images.append(preprocess(Image.open(path)))
+            valid.append(i)
+        except Exception as e:
+            print(f"Ошибка при обработке {path}: {str(e)}")
+    if images:
+        with torch.no_grad():
+            features = clip_model.encode_image(torch.stack(images).to(device))
+        result[valid] = features.float().cpu().numpy()
+    return result
 
 def predict_likes():
     # Загружаем модель
@@ -14,8 +52,10 @@ def predict_likes():
     model.load_state_dict(torch.load('likes_model.pth'))
     model.eval()
     
-    # Загружаем CLIP модель
+    # Загружаем CLIP модель; посчитанные эмбеддинги хранятся по sha256
+    # отдельно от эмбеддингов CLIP из transformers (EMBEDDINGS_DIR)
     clip_model, preprocess = clip.load("ViT-B/32", device=device)
+    store = EmbeddingStore(LIKES_EMBEDDINGS_DIR, dim=clip_model.visual.output_dim)
     
     # Подключаемся к базе данных
     conn = sqlite3.connect(DB_FILE)
@@ -23,7 +63,7 @@ def predict_likes():
     
     # Получаем все необработанные изображения
     cur.execute(f"""
-        SELECT id, path 
+        SELECT id, path, hash_sha256 
         FROM {TABLE_NAME} 
         WHERE status = 'raw'
     """)
@@ -31,36 +71,52 @@ def predict_likes():
     
     print(f"Найдено {len(images)} необработанных изображений")
     
-    # Обрабатываем каждое изображение
-    for id, path in tqdm(images, desc="Обработка изображений"):
-        try:
-            # Загружаем и обрабатываем изображение
-            image = Image.open(path)
-            image = preprocess(image).unsqueeze(0).to(device)
-            
-            # Получаем CLIP эмбеддинги
-            with torch.no_grad():
-                image_features = clip_model.encode_image(image)
-            
-            # Получаем предсказание количества лайков
-            with torch.no_grad():
-                predicted_likes = model(image_features)
-            
-            # Обновляем статус в базе данных
-            # Если предсказанное количество лайков выше порога, помечаем как approved
-            predicted_likes = float(predicted_likes.item())
-            status = 'approved' if predicted_likes > 10 else 'rejected'  # Порог можно настроить
-            
-            cur.execute(f"""
-                UPDATE {TABLE_NAME} 
-                SET status = ?, 
-                    predicted_likes = ? 
-                WHERE id = ?
-            """, (status, predicted_likes, id))
-            
-        except Exception as e:
-            print(f"Ошибка при обработке {path}: {str(e)}")
-    
+    # Обрабатываем изображения пакетами
+    with tqdm(total=len(images), desc="Обработка изображений") as pbar:
+        for start in range(0, len(images), BATCH_SIZE):
+            batch = []
+            for id, path, sha256 in images[start:start + BATCH_SIZE]:
+                try:
+                    batch.append((id, path, sha256 or file_sha256(path)))
+                except Exception as e:
+                    print(f"Ошибка при обработке {path}: {str(e)}")
+
+            try:
+                # Получаем CLIP эмбеддинги (из хранилища или моделью)
+                features = store.get_or_compute(
+                    [sha256 for _, _, sha256 in batch],
+                    [path for _, path, _ in batch],
+                    lambda paths: encode_paths(clip_model, preprocess, device, paths)
+                )
+                valid = ~torch.from_numpy(features).isnan().any(dim=1)
+
+                # Получаем предсказание количества лайков
+                with torch.no_grad():
+                    predicted = model(torch.from_numpy(features[valid.numpy()]).to(device))
+
+                predicted = iter(predicted.reshape(-1).tolist())
+                for (id, path, _), ok in zip(batch, valid.tolist()):
+                    if not ok:
+                        print(f"Ошибка при обработке {path}: не удалось прочитать изображение")
+                        continue
+
+                    # Обновляем статус в базе данных
+                    # Если предсказанное количество лайков выше порога, помечаем как approved
+                    predicted_likes = float(next(predicted))
+                    status = 'approved' if predicted_likes > 10 else 'rejected'  # Порог можно настроить
+
+                    cur.execute(f"""
+                        UPDATE {TABLE_NAME} 
+                        SET status = ?, 
+                            predicted_likes = ? 
+                        WHERE id = ?
+                    """, (status, predicted_likes, id))
+
+            except Exception as e:
+                print(f"Ошибка при обработке пакета: {str(e)}")
+
+            pbar.update(len(images[start:start + BATCH_SIZE]))
+
     # Сохраняем изменения
     conn.commit()
     conn.close()
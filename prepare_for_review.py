@@ -3,6 +3,7 @@ import os
 import shutil
 from tqdm import tqdm
 from config import *
+from image_size import SMALL_SIZE_SQL, small_size_params
 
 DB_FILE = "database.db"
 TABLE_NAME = "photos_ok"
@@ -24,8 +25,15 @@ def prepare_for_review():
         print("Добавляем колонку status...")
         cur.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN status TEXT DEFAULT NULL")
         conn.commit()
+    for column in ('width', 'height'):
+        if column not in columns:
+            print(f"Добавляем колонку {column}...")
+            cur.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {column} INTEGER")
+            conn.commit()
     
-    # Получаем все записи без статуса, только нюды без лиц
+    # Получаем все записи без статуса, только нюды без лиц и не маленькие
+    # (правило из image_size.py по сохраненным width/height; для старых
+    # записей без них - по is_small)
     # Используем ROW_NUMBER() для исключения дубликатов по hash_sha256
     cur.execute(f"""
         WITH RankedPhotos AS (
@@ -35,12 +43,12 @@ def prepare_for_review():
             WHERE status IS NULL
               AND is_nude = 1
               AND has_face = 0
-              AND is_small = 0
+              AND COALESCE(NOT {SMALL_SIZE_SQL}, is_small = 0)
         )
         SELECT id, path, hash_sha256
         FROM RankedPhotos 
         WHERE rn = 1
-    """)
+    """, small_size_params())
     records = cur.fetchall()
     
     print(f"Найдено {len(records)} уникальных фотографий для ревью (нюды без лиц)")
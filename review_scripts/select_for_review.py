@@ -9,11 +9,16 @@ import logging
 from datetime import datetime
 from tqdm import tqdm
 import imagehash
+import numpy as np
 from PIL import Image
 
 # Добавляем путь к корневой директории проекта
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from config import DUPLICATE_RADIUS
+from hash_index import hamming_distances
+from phash_db import ensure_phash_int_column, db_to_uint64
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -44,16 +49,6 @@ def ensure_directories():
     os.makedirs(DUPLICATES_DIR, exist_ok=True)
     logger.info(f"✅ Директории созданы: {REVIEW_DIR}, {APPROVED_DIR}, {DUPLICATES_DIR}")
 
-def hamming_distance(hash1, hash2):
-    """Вычисляет расстояние Хэмминга между двумя хешами"""
-    if not hash1 or not hash2:
-        return float('inf')
-    return sum(c1 != c2 for c1, c2 in zip(hash1, hash2))
-
-def is_similar(hash1, hash2, threshold=5):
-    """Проверяет, являются ли два хеша похожими"""
-    return hamming_distance(hash1, hash2) <= threshold
-
 def select_photos_for_review():
     """
     Выбирает фото с метками нюд и без лица со статусом review
@@ -69,9 +64,10 @@ def select_photos_for_review():
         ensure_directories()
         
         # Выбираем фото для ревью
+        ensure_phash_int_column(conn, TABLE_NAME)
         cursor = conn.cursor()
         cursor.execute(f"""
-            SELECT path, is_nude, has_face, nsfw_score, clip_nude_score, hash_sha256, phash
+            SELECT path, is_nude, has_face, nsfw_score, clip_nude_score, hash_sha256, phash, phash_int
             FROM {TABLE_NAME}
             WHERE is_nude = 1 AND has_face = 0 AND status = 'review'
             ORDER BY nsfw_score DESC
@@ -91,23 +87,24 @@ def select_photos_for_review():
         skipped_count = 0
         duplicate_count = 0
         
-        # Словарь для отслеживания уже обработанных хешей
-        processed_hashes = {}
+        # Хеши фото, уже скопированных на ревью: расстояния до всех считаются одной операцией
+        photo_hashes = db_to_uint64([photo[7] or 0 for photo in photos])
+        processed_hashes = np.zeros(total_photos, dtype=np.uint64)
+        processed_count = 0
         
         with tqdm(total=total_photos, desc="Обработка фото") as pbar:
-            for photo in photos:
-                path, is_nude, has_face, nsfw_score, clip_nude_score, hash_sha256, phash = photo
+            for photo, photo_hash in zip(photos, photo_hashes):
+                path, is_nude, has_face, nsfw_score, clip_nude_score, hash_sha256, phash, phash_int = photo
                 
                 try:
                     # Получаем имя файла
                     filename = os.path.basename(path)
                     
-                    # Проверяем, является ли фото дубликатом
-                    is_duplicate = False
-                    for processed_phash in processed_hashes:
-                        if is_similar(phash, processed_phash):
-                            is_duplicate = True
-                            break
+                    # Проверяем, является ли фото дубликатом (тот же радиус, что у find_duplicates.py)
+                    is_duplicate = bool(
+                        phash_int is not None and processed_count
+                        and (hamming_distances(processed_hashes[:processed_count], photo_hash) <= DUPLICATE_RADIUS).any()
+                    )
                     
                     # Создаем новое имя файла с хешем и phash
                     new_filename = f"{os.path.splitext(filename)[0]}_{hash_sha256}_{phash}.jpg"
@@ -125,7 +122,9 @@ def select_photos_for_review():
                             shutil.copy2(path, new_path)
                             copied_count += 1
                             # Добавляем хеш в обработанные
-                            processed_hashes[phash] = True
+                            if phash_int is not None:
+                                processed_hashes[processed_count] = photo_hash
+                                processed_count += 1
                         else:
                             skipped_count += 1
                         
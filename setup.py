@@ -12,5 +12,8 @@ setup(
         "tensorflow",
         "tqdm",
         "imagehash",
+        "PyWavelets",
+        "onnx",
+        "onnxruntime",
     ],
 ) 
\ No newline at end of file
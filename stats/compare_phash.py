@@ -6,34 +6,28 @@ from PIL import Image
 from tqdm import tqdm
 import sys
 from config import DB_FILE, TELEGRAM_DB
+from hash_index import HashIndex
+from phash_db import ensure_phash_int_column, load_phashes
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def find_most_similar(phash, db_photos, min_similarity=0.5):
+def find_most_similar(phash, index, min_similarity=0.5):
     """
     Находит максимально похожую фотографию из базы данных
     Возвращает кортеж (путь, процент схожести)
-    """
-    best_match = None
-    best_similarity = 0
     
-    for db_photo in db_photos:
-        db_phash = db_photo.get('phash')
-        if not db_phash:
-            continue
-            
-        # Вычисляем разницу между хешами
-        diff = sum(c1 != c2 for c1, c2 in zip(phash, db_phash))
+    Args:
+        phash: хеш фотографии (hex-строка)
+        index: HashIndex хешей основной базы с путями в качестве идентификаторов
+    """
+    nearest = index.knn(phash, 1)
+    if nearest:
+        path, diff = nearest[0]
         similarity = 1 - (diff / 64.0)  # 64 - максимально возможная разница
-        
-        if similarity > best_similarity and similarity >= min_similarity:
-            best_similarity = similarity
-            best_match = db_photo
-            
-    if best_match:
-        return best_match['path'], best_similarity
+        if similarity >= min_similarity:
+            return path, similarity
     return None, 0
 
 def compare_phash():
@@ -68,6 +62,13 @@ def compare_phash():
         main_photos = main_cur.fetchall()
         logger.info(f"Найдено {len(main_photos)} фотографий в основной базе данных")
         
+        # Индекс по расстоянию Хэмминга строится один раз для всех фото канала
+        ensure_phash_int_column(main_conn, "photos_ok")
+        main_paths, main_hashes = load_phashes(
+            main_cur, "SELECT path, phash_int FROM photos_ok WHERE phash_int IS NOT NULL"
+        )
+        phash_index = HashIndex(main_hashes, ids=main_paths)
+        
         # Создаем словарь для быстрого поиска по pHash
         phash_dict = {}
         for path, phash in main_photos:
@@ -118,7 +119,7 @@ def compare_phash():
                 found_match = True
             else:
                 # Если точного совпадения нет, ищем максимально похожую фотографию
-                most_similar_path, similarity = find_most_similar(phash, [{'path': p, 'phash': h} for p, h in main_photos])
+                most_similar_path, similarity = find_most_similar(phash, phash_index)
                 
                 if most_similar_path and similarity >= similarity_threshold:
                     # Обновляем статус для найденной похожей фотографии
@@ -157,7 +158,7 @@ def compare_phash():
             logger.info("\nФотографии без совпадений (с максимально похожими):")
             for file_path, phash in no_matches:
                 # Ищем максимально похожую фотографию
-                most_similar_path, similarity = find_most_similar(phash, [{'path': p, 'phash': h} for p, h in main_photos])
+                most_similar_path, similarity = find_most_similar(phash, phash_index)
                 if most_similar_path:
                     logger.info(f"  - {file_path}")
                     logger.info(f"    Наиболее похожая: {most_similar_path} (схожесть: {similarity:.2%})")
@@ -190,31 +191,19 @@ def find_matches(telegram_photos, db_photos, similarity_threshold=0.75):
     matches = {}
     no_matches = []
     
+    index = HashIndex.from_pairs((db_photo['path'], db_photo.get('phash')) for db_photo in db_photos)
+    
     for t_photo in telegram_photos:
         t_phash = t_photo.get('phash')
         if not t_phash:
             continue
             
-        best_match = None
-        best_similarity = 0
-        
-        for db_photo in db_photos:
-            db_phash = db_photo.get('phash')
-            if not db_phash:
-                continue
-                
-            # Вычисляем разницу между хешами
-            diff = sum(c1 != c2 for c1, c2 in zip(t_phash, db_phash))
-            similarity = 1 - (diff / 64.0)  # 64 - максимально возможная разница
-            
-            if similarity > best_similarity:
-                best_similarity = similarity
-                best_match = db_photo
+        best_path, best_similarity = find_most_similar(t_phash, index, min_similarity=similarity_threshold)
                 
-        if best_match and best_similarity >= similarity_threshold:
+        if best_path:
             if t_photo['file_path'] not in matches:
                 matches[t_photo['file_path']] = []
-            matches[t_photo['file_path']].append(best_match['path'])
+            matches[t_photo['file_path']].append(best_path)
         else:
             no_matches.append(t_photo['file_path'])
             
@@ -8,86 +8,47 @@ import sys
 import cv2
 import numpy as np
 from config import DB_FILE, TELEGRAM_DB, TABLE_NAME
+from hash_index import HashIndex, max_distance
+from phash_db import ensure_phash_int_column, load_phashes
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def find_most_similar(phash, db_photos, min_similarity=0.90):
+def find_most_similar(phash, index, min_similarity=0.90):
     """
     Находит максимально похожую фотографию из базы данных
     Возвращает кортеж (путь, процент схожести)
-    """
-    best_match = None
-    best_similarity = 0
     
-    for db_photo in db_photos:
-        db_phash = db_photo.get('phash')
-        if not db_phash:
-            continue
-            
-        # Вычисляем разницу между хешами
-        #diff = sum(c1 != c2 for c1, c2 in zip(phash, db_phash))
-        
-        diff = phash - db_phash
+    Args:
+        phash: хеш фотографии (hex-строка, int или ImageHash)
+        index: HashIndex хешей базы с путями в качестве идентификаторов
+    """
+    nearest = index.knn(phash, 1)
+    if nearest:
+        path, diff = nearest[0]
         similarity = 1 - (diff / 64.0)  # 64 - максимально возможная разница
-        
-        if similarity > best_similarity and similarity >= min_similarity:
-            best_similarity = similarity
-            best_match = db_photo
-            
-    if best_match:
-        return best_match['path'], best_similarity
+        if similarity >= min_similarity:
+            return path, similarity
     return None, 0
 
-def find_similar_with_lower_threshold(phash, db_photos, min_similarity=0.80):
+def find_similar_with_lower_threshold(phash, index, min_similarity=0.80):
     """
     Находит похожие фотографии с пониженным порогом схожести
     Возвращает список кортежей (путь, процент схожести)
-    """
-    similar_photos = []
     
-    for db_photo in db_photos:
-        db_phash = db_photo.get('phash')
-        if not db_phash:
-            continue
-            
-        try:
-            # Проверяем тип входного phash
-            if isinstance(phash, str):
-                # Если phash - строка, конвертируем оба хеша в числа
-                phash_int = int(phash, 16)
-                db_phash_int = int(db_phash, 16)
-                # Вычисляем разницу используя побитовое XOR
-                diff = bin(phash_int ^ db_phash_int).count('1')
-            else:
-                # Если phash - объект ImageHash, используем встроенный метод сравнения
-                diff = phash - db_phash
-            
-            # Вычисляем схожесть в процентах
-            similarity = (1 - diff / 64.0) * 100
-            
-            # Проверяем размеры изображений если они доступны
-            if 'width' in db_photo and 'height' in db_photo:
-                try:
-                    img = Image.open(db_photo['path'])
-                    width, height = img.size
-                    size_ratio = min(width, height) / max(width, height)
-                    
-                    # Если соотношение сторон сильно отличается, снижаем схожесть
-                    if size_ratio < 0.7:  # Если одно изображение значительно шире/выше другого
-                        similarity *= 0.8
-                except Exception as e:
-                    logger.warning(f"Не удалось проверить размеры изображения {db_photo['path']}: {e}")
-            
-            if similarity >= min_similarity * 100:  # Конвертируем порог в проценты
-                similar_photos.append((db_photo['path'], similarity))
-                
-        except Exception as e:
-            logger.error(f"Ошибка при сравнении хешей: {e}")
-            continue
+    Args:
+        phash: хеш фотографии (hex-строка, int или ImageHash)
+        index: HashIndex хешей базы с путями в качестве идентификаторов
+    """
+    try:
+        similar = index.radius_query(phash, max_distance(min_similarity))
+    except Exception as e:
+        logger.error(f"Ошибка при сравнении хешей: {e}")
+        return []
     
-    return sorted(similar_photos, key=lambda x: x[1], reverse=True)
+    # Схожесть в процентах, по убыванию
+    return [(path, (1 - diff / 64.0) * 100) for path, diff in similar]
 
 def compare_images_sift(img1_path, img2_path, min_matches=10):
     """
@@ -167,15 +128,22 @@ def compare_phash():
         logger.info(f"Найдено {len(telegram_photos)} фотографий в телеграм канале")
         
         # Получаем все фотографии из основной базы данных
-        main_cur.execute("""
+        main_cur.execute(f"""
             SELECT path, phash
-            FROM photos_ok
+            FROM {TABLE_NAME}
             WHERE phash IS NOT NULL
         """)
         
         main_photos = main_cur.fetchall()
         logger.info(f"Найдено {len(main_photos)} фотографий в основной базе данных")
         
+        # Индекс по расстоянию Хэмминга строится один раз для всех фото канала
+        ensure_phash_int_column(main_conn, TABLE_NAME)
+        main_paths, main_hashes = load_phashes(
+            main_cur, f"SELECT path, phash_int FROM {TABLE_NAME} WHERE phash_int IS NOT NULL"
+        )
+        phash_index = HashIndex(main_hashes, ids=main_paths)
+        
         # Создаем словарь для быстрого поиска по pHash
         phash_dict = {}
         for path, phash in main_photos:
@@ -218,8 +186,8 @@ def compare_phash():
             if phash in phash_dict:
                 # Обновляем статус для всех фотографий с этим хешем
                 for photo_path in phash_dict[phash]:
-                    main_cur.execute("""
-                        UPDATE photos_ok 
+                    main_cur.execute(f"""
+                        UPDATE {TABLE_NAME}
                         SET status = 'published', message_id = ?
                         WHERE path = ?
                     """, (message_id, photo_path))
@@ -233,7 +201,7 @@ def compare_phash():
                 # Этап 2: Поиск похожих с пониженным порогом
                 similar_photos = find_similar_with_lower_threshold(
                     phash, 
-                    [{'path': p, 'phash': h} for p, h in main_photos],
+                    phash_index,
                     min_similarity=loose_threshold
                 )
                 
@@ -258,8 +226,8 @@ def compare_phash():
                     for similar_path, similarity in high_similarity_photos:
                         if compare_images_sift(telegram_path, similar_path):
                             # Обновляем статус для найденной фотографии
-                            main_cur.execute("""
-                                UPDATE photos_ok 
+                            main_cur.execute(f"""
+                                UPDATE {TABLE_NAME}
                                 SET status = 'published', message_id = ?
                                 WHERE path = ?
                             """, (message_id, similar_path))
@@ -342,31 +310,19 @@ def find_matches(telegram_photos, db_photos, similarity_threshold=0.75):
     matches = {}
     no_matches = []
     
+    index = HashIndex.from_pairs((db_photo['path'], db_photo.get('phash')) for db_photo in db_photos)
+    
     for t_photo in telegram_photos:
         t_phash = t_photo.get('phash')
         if not t_phash:
             continue
             
-        best_match = None
-        best_similarity = 0
-        
-        for db_photo in db_photos:
-            db_phash = db_photo.get('phash')
-            if not db_phash:
-                continue
-                
-            # Вычисляем разницу между хешами
-            diff = sum(c1 != c2 for c1, c2 in zip(t_phash, db_phash))
-            similarity = 1 - (diff / 64.0)  # 64 - максимально возможная разница
-            
-            if similarity > best_similarity:
-                best_similarity = similarity
-                best_match = db_photo
+        best_path, best_similarity = find_most_similar(t_phash, index, min_similarity=similarity_threshold)
                 
-        if best_match and best_similarity >= similarity_threshold:
+        if best_path:
             if t_photo['file_path'] not in matches:
                 matches[t_photo['file_path']] = []
-            matches[t_photo['file_path']].append(best_match['path'])
+            matches[t_photo['file_path']].append(best_path)
         else:
             no_matches.append(t_photo['file_path'])
             
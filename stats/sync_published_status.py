@@ -3,33 +3,28 @@ import logging
 from pathlib import Path
 from tqdm import tqdm
 from config import DB_FILE, TELEGRAM_DB, TABLE_NAME, STATUS_PUBLISHED
+from hash_index import HashIndex
+from phash_db import ensure_phash_int_column, load_phashes
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def find_most_similar(phash, db_photos, min_similarity=0.5):
+def find_most_similar(phash, index, min_similarity=0.5):
     """
     Находит максимально похожую фотографию из базы данных
     Возвращает кортеж (id, процент схожести)
-    """
-    best_match = None
-    best_similarity = 0
     
-    for photo_id, db_phash in db_photos:
-        if not db_phash:
-            continue
-            
-        # Вычисляем разницу между хешами
-        diff = sum(c1 != c2 for c1, c2 in zip(phash, db_phash))
+    Args:
+        phash: хеш фотографии (hex-строка)
+        index: HashIndex хешей основной базы с id фотографий в качестве идентификаторов
+    """
+    nearest = index.knn(phash, 1)
+    if nearest:
+        photo_id, diff = nearest[0]
         similarity = 1 - (diff / 64.0)  # 64 - максимально возможная разница
-        
-        if similarity > best_similarity and similarity >= min_similarity:
-            best_similarity = similarity
-            best_match = photo_id
-            
-    if best_match:
-        return best_match, best_similarity
+        if similarity >= min_similarity:
+            return photo_id, similarity
     return None, 0
 
 def sync_published_status():
@@ -74,6 +69,13 @@ def sync_published_status():
                 phash_dict[phash] = []
             phash_dict[phash].append(photo_id)
         
+        # Индекс по расстоянию Хэмминга для поиска похожих
+        ensure_phash_int_column(main_conn, TABLE_NAME)
+        main_ids, main_hashes = load_phashes(
+            main_cur, "SELECT id, phash_int FROM photos_ok WHERE phash_int IS NOT NULL"
+        )
+        phash_index = HashIndex(main_hashes, ids=main_ids)
+        
         # Обновляем статус для совпадающих фотографий
         updated_count = 0
         similarity_threshold = 0.80
@@ -97,7 +99,7 @@ def sync_published_status():
             
             if not found_match:
                 # Если точного совпадения нет, ищем максимально похожую фотографию
-                most_similar_id, similarity = find_most_similar(phash, main_photos, min_similarity=similarity_threshold)
+                most_similar_id, similarity = find_most_similar(phash, phash_index, min_similarity=similarity_threshold)
                 
                 if most_similar_id:
                     update_query = """
@@ -0,0 +1,69 @@
+import numpy as np
+
+from duplicate_groups import PAIR_BLOCK, cluster_hashes, find_pairs, representative
+from hash_index import hamming_distances
+
+
+def brute_force_pairs(hashes, radius):
+    """Все пары перебором: эталон для find_pairs"""
+    pairs = set()
+    for i in range(len(hashes) - 1):
+        for j in np.flatnonzero(hamming_distances(hashes[i + 1:], hashes[i]) <= radius):
+            pairs.add((i, i + 1 + int(j)))
+    return pairs
+
+
+def random_hashes(size, seed=0):
+    rng = np.random.default_rng(seed)
+    hashes = rng.integers(0, 2**64, size=size, dtype=np.uint64)
+    # Почти-копии: часть хешей отличается от других на 1-3 бита
+    hashes[size // 2:size // 2 + size // 10] = hashes[:size // 10] ^ np.uint64(0b1011)
+    return hashes
+
+
+def test_pairs_match_brute_force():
+    hashes = random_hashes(1500)
+    for radius in (0, 2, 4, 7):
+        assert set(map(tuple, find_pairs(hashes, radius).tolist())) == brute_force_pairs(hashes, radius)
+
+
+def test_dominant_bucket():
+    # Как у aHash темных кадров: у всех хешей совпадают младшие 32 бита,
+    # поэтому по этим частям все попадают в одну корзину больше PAIR_BLOCK
+    rng = np.random.default_rng(1)
+    size = PAIR_BLOCK * 2 + 300
+    high = rng.integers(0, 2**32, size=size, dtype=np.uint64) << np.uint64(32)
+    hashes = high | np.uint64(0x0000F00F)
+    hashes[size // 2:size // 2 + 200] = hashes[:200] ^ np.uint64(1 << 40)
+    for radius in (1, 3):
+        assert set(map(tuple, find_pairs(hashes, radius).tolist())) == brute_force_pairs(hashes, radius)
+
+
+def test_identical_hashes_form_one_group():
+    hashes = np.zeros(50_000, dtype=np.uint64)
+    hashes[-1] = np.uint64(0xFFFF0000FFFF0000)
+    hashes[-2] = np.uint64(2**64 - 1)
+    groups = cluster_hashes(hashes, 2)
+    assert len(groups) == 1
+    assert groups[0] == list(range(len(hashes) - 2))
+
+
+def test_clusters_are_connected_components():
+    # Цепочка 0 - 1 - 2 с шагом 2 бита при радиусе 2 - одна группа,
+    # хотя крайние хеши отличаются на 4 бита
+    hashes = np.array([0b0, 0b11, 0b1111, 0xFF << 40, (0xFF << 40) + 1, 0xFFFF << 20], dtype=np.uint64)
+    assert cluster_hashes(hashes, 2) == [[0, 1, 2], [3, 4]]
+
+
+def test_representative_is_medoid():
+    hashes = np.array([0b0, 0b1, 0b1, 0b11, 0b111], dtype=np.uint64)
+    best, distances = representative(hashes, [0, 1, 2, 3, 4])
+    assert best == 1
+    assert distances.tolist() == [1, 0, 0, 1, 2]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -1,5 +1,6 @@
 import os
 import cv2
+import time
 import logging
 import argparse
 from detect_nude.face_detector import FaceDetector
@@ -16,35 +17,39 @@ TEST_FILES = [
     "/mnt/smb/OneDrive/Pictures/!Фотосессии/Никита Маша/_DSC6072.jpg"
     ]
 
-def test_face_detection(image_path):
+def load_test_image(image_path):
     """
-    Тестирует обнаружение лиц на изображении
+    Загружает изображение для тестирования
+    
+    Returns:
+        BGR массив или None
+    """
+    # Проверяем существование файла
+    if not os.path.exists(image_path):
+        logger.error(f"❌ Файл не существует: {image_path}")
+        return None
+        
+    # Загружаем изображение
+    image = cv2.imread(image_path)
+    if image is None:
+        logger.error(f"❌ Не удалось загрузить изображение: {image_path}")
+        return None
+        
+    # Получаем размеры изображения
+    height, width = image.shape[:2]
+    logger.info(f"📏 Размеры изображения: {width}x{height}")
+    return image
+
+def report_faces(image_path, image, result):
+    """
+    Выводит найденные лица и сохраняет изображение с рамками
     
     Args:
         image_path: путь к изображению
+        image: BGR массив исходного размера
+        result: результат детектора лиц
     """
     try:
-        # Проверяем существование файла
-        if not os.path.exists(image_path):
-            logger.error(f"❌ Файл не существует: {image_path}")
-            return False
-            
-        # Загружаем изображение
-        image = cv2.imread(image_path)
-        if image is None:
-            logger.error(f"❌ Не удалось загрузить изображение: {image_path}")
-            return False
-            
-        # Получаем размеры изображения
-        height, width = image.shape[:2]
-        logger.info(f"📏 Размеры изображения: {width}x{height}")
-        
-        # Создаем детектор лиц
-        face_detector = FaceDetector()
-        
-        # Обнаруживаем лица
-        result = face_detector.detect_faces(image)
-        
         # Выводим результаты
         face_count = result.get('face_count', 0)
         face_locations = result.get('face_locations', [])
@@ -77,18 +82,52 @@ def test_face_detection(image_path):
         logger.error(f"❌ Ошибка при тестировании: {str(e)}")
         return False
 
-def test_all_files():
+def test_face_detection(image_path, face_detector):
+    """
+    Тестирует обнаружение лиц на изображении
+    
+    Args:
+        image_path: путь к изображению
+        face_detector: FaceDetector
+    """
+    image = load_test_image(image_path)
+    if image is None:
+        return False
+    
+    # Обнаруживаем лица (координаты возвращаются в масштабе исходного изображения)
+    start = time.perf_counter()
+    result = face_detector.detect_faces(image)
+    logger.info(f"⏱️ Время обнаружения: {time.perf_counter() - start:.3f} с")
+    
+    return report_faces(image_path, image, result)
+
+def test_all_files(face_detector):
     """
-    Тестирует все файлы из массива TEST_FILES
+    Тестирует все файлы из массива TEST_FILES одним пакетом
+    
+    Args:
+        face_detector: FaceDetector
     """
     total_files = len(TEST_FILES)
     success_count = 0
     
     logger.info(f"🔍 Начинаем тестирование {total_files} файлов")
     
-    for i, file_path in enumerate(TEST_FILES, 1):
+    loaded = []
+    for file_path in TEST_FILES:
+        image = load_test_image(file_path)
+        if image is not None:
+            loaded.append((file_path, image))
+    
+    # Все изображения проходят через YOLO одним вызовом
+    start = time.perf_counter()
+    results = face_detector.detect_faces_batch([image for _, image in loaded])
+    elapsed = time.perf_counter() - start
+    logger.info(f"⏱️ Пакет из {len(loaded)} изображений: {elapsed:.3f} с")
+    
+    for i, ((file_path, image), result) in enumerate(zip(loaded, results), 1):
         logger.info(f"\n[{i}/{total_files}] Тестирование: {os.path.basename(file_path)}")
-        if test_face_detection(file_path):
+        if report_faces(file_path, image, result):
             success_count += 1
     
     logger.info(f"\n📊 Итоги тестирования:")
@@ -100,14 +139,23 @@ def main():
     parser = argparse.ArgumentParser(description="Тестирование обнаружения лиц")
     parser.add_argument("--image", help="Путь к изображению для тестирования")
     parser.add_argument("--all", action="store_true", help="Тестировать все файлы из массива TEST_FILES")
+    parser.add_argument("--imgsz", type=int, default=640, help="Размер входа модели")
+    parser.add_argument("--conf", type=float, default=0.25, help="Порог уверенности для лиц")
+    parser.add_argument("--max-side", type=int, default=1280,
+                        help="Уменьшать изображения до этой большей стороны перед детекцией (0 - без уменьшения)")
     args = parser.parse_args()
     
+    if not args.all and not args.image:
+        parser.print_help()
+        return
+    
+    # Создаем детектор лиц
+    face_detector = FaceDetector(imgsz=args.imgsz, conf=args.conf, max_side=args.max_side or None)
+    
     if args.all:
-        test_all_files()
+        test_all_files(face_detector)
     elif args.image:
-        test_face_detection(args.image)
-    else:
-        parser.print_help()
+        test_face_detection(args.image, face_detector)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,57 @@
+import imagehash
+import numpy as np
+from PIL import Image, ImageFilter
+
+from fingerprints import FINGERPRINT_COLUMNS, compute_fingerprints, fingerprint_rows, thumbnail
+from phash_db import phash_to_db
+
+
+def sample_images(count=30, seed=0):
+    """Гладкие и шумные изображения разного размера и режима"""
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        size = tuple(int(side) for side in rng.integers(100, 900, size=2))
+        if i % 2:
+            # Шум: много коэффициентов равны медиане, биты зависят от точной арифметики
+            image = Image.fromarray(rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8))
+        else:
+            base = rng.integers(0, 256, size=(rng.integers(4, 40), rng.integers(4, 40), 3), dtype=np.uint8)
+            image = Image.fromarray(base).resize(size, Image.BICUBIC).filter(ImageFilter.GaussianBlur(2))
+        yield image.convert('L') if i % 3 == 0 else image
+
+
+def bits(value):
+    return int(str(value), 16)
+
+
+def test_hashes_match_imagehash():
+    images = list(sample_images(count=60))
+    # Пакетом сразу: результат не должен зависеть от соседей по пакету
+    hashes = compute_fingerprints([thumbnail(image) for image in images])
+    for i, image in enumerate(images):
+        assert int(hashes['ahash'][i]) == bits(imagehash.average_hash(image))
+        assert int(hashes['phash'][i]) == bits(imagehash.phash(image))
+        assert int(hashes['dhash'][i]) == bits(imagehash.dhash(image))
+        assert int(hashes['whash'][i]) == bits(imagehash.whash(image, image_scale=32))
+
+
+def test_rows_keep_legacy_phash():
+    images = list(sample_images(count=5, seed=1))
+    rows = fingerprint_rows([thumbnail(image) for image in images])
+    for image, row in zip(images, rows):
+        assert row['phash'] == str(imagehash.average_hash(image))
+        assert row[FINGERPRINT_COLUMNS['ahash']] == phash_to_db(row['phash'])
+        assert set(row) == {'phash', *FINGERPRINT_COLUMNS.values()}
+
+
+def test_empty_batch():
+    hashes = compute_fingerprints([])
+    assert set(hashes) == set(FINGERPRINT_COLUMNS)
+    assert all(len(values) == 0 for values in hashes.values())
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
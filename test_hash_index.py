@@ -0,0 +1,78 @@
+import imagehash
+import numpy as np
+from PIL import Image
+
+from hash_index import HashIndex, hamming_distances, hash_to_int, max_distance, popcount64
+
+
+def random_hashes(size, seed=0):
+    """Случайные хеши и их почти-копии на расстоянии 1-12 бит"""
+    rng = np.random.default_rng(seed)
+    hashes = rng.integers(0, 2**64, size=size, dtype=np.uint64)
+    for i in range(size // 4):
+        flips = rng.choice(64, size=rng.integers(1, 13), replace=False)
+        hashes[size // 2 + i] = hashes[i] ^ np.uint64(sum(1 << int(bit) for bit in flips))
+    return hashes
+
+
+def brute_force(hashes, value):
+    return [bin(int(h) ^ int(value)).count('1') for h in hashes]
+
+
+def test_radius_query_matches_brute_force():
+    hashes = random_hashes(2000)
+    index = HashIndex(hashes, ids=[f"id{i}" for i in range(len(hashes))])
+    # Радиусы и с перебором внутри частей, и с полным просмотром
+    for query in list(hashes[:20]) + list(random_hashes(10, seed=1)):
+        distances = brute_force(hashes, query)
+        for radius in (0, 3, 7, 11, 12, 20):
+            expected = sorted((d, i) for i, d in enumerate(distances) if d <= radius)
+            assert index.radius_query(int(query), radius) == [(f"id{i}", d) for d, i in expected]
+
+
+def test_knn_matches_brute_force():
+    hashes = random_hashes(2000, seed=2)
+    index = HashIndex(hashes)
+    for query in list(hashes[1000:1010]) + list(random_hashes(10, seed=3)):
+        distances = sorted(brute_force(hashes, query))
+        for k in (1, 5, 50):
+            found = index.knn(int(query), k)
+            assert [distance for _, distance in found] == distances[:k]
+            assert all(brute_force([hashes[i]], query)[0] == d for i, d in found)
+
+
+def test_empty_index_and_queries():
+    index = HashIndex(np.zeros(0, dtype=np.uint64))
+    assert index.radius_query(123, 5) == []
+    assert index.knn(123, 3) == []
+    assert HashIndex([1, 2]).knn(None) == []
+
+
+def test_from_pairs_skips_missing_hashes():
+    index = HashIndex.from_pairs([("a", "ff00"), ("b", None), ("c", ""), ("d", 0xff01)])
+    assert index.ids == ["a", "d"]
+    assert index.radius_query("ff00", 1) == [("a", 0), ("d", 1)]
+
+
+def test_hash_to_int():
+    image_hash = imagehash.average_hash(Image.linear_gradient('L'))
+    assert hash_to_int(image_hash) == int(str(image_hash), 16)
+    assert hash_to_int("00000000000000ff") == 255
+    assert hash_to_int(np.uint64(2**64 - 1)) == 2**64 - 1
+    assert hash_to_int(None) is None
+    assert hash_to_int("") is None
+
+
+def test_popcount_and_distances():
+    values = np.array([0, 1, 2**64 - 1, 0b1011], dtype=np.uint64)
+    assert popcount64(values).tolist() == [0, 1, 64, 3]
+    assert hamming_distances(values, 1).tolist() == [1, 0, 63, 2]
+    assert max_distance(0.9) == 6
+    assert max_distance(1.0) == 0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
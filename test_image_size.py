@@ -0,0 +1,49 @@
+import sqlite3
+
+from image_size import SMALL_SIZE_SQL, is_small_size, small_size_params
+
+SIZES = [(2000, 2000), (3000, 1000), (1000, 3000), (2499, 2499), (2500, 100), (4000, 3000)]
+
+
+def test_small_when_both_sides_short():
+    assert is_small_size(2000, 2000)
+    assert is_small_size(2499, 2499)
+    assert not is_small_size(3000, 1000)
+    assert not is_small_size(1000, 3000)
+    assert not is_small_size(2500, 100)
+    assert is_small_size(900, 600, small_size=1000)
+
+
+def test_sql_matches_python_rule():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE photos (width INTEGER, height INTEGER, is_small INTEGER)")
+    conn.executemany("INSERT INTO photos VALUES (?, ?, NULL)", SIZES)
+    rows = conn.execute(
+        f"SELECT width, height, {SMALL_SIZE_SQL} FROM photos", small_size_params()
+    ).fetchall()
+    assert [(w, h, bool(small)) for w, h, small in rows] == [(w, h, is_small_size(w, h)) for w, h in SIZES]
+
+
+def test_review_filter_falls_back_to_is_small():
+    # Отбор prepare_for_review: по width/height, без них - по is_small
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE photos (id INTEGER, width INTEGER, height INTEGER, is_small INTEGER)")
+    conn.executemany("INSERT INTO photos VALUES (?, ?, ?, ?)", [
+        (1, 2000, 2000, 0),
+        (2, 3000, 1000, 1),
+        (3, None, None, 0),
+        (4, None, None, 1),
+        (5, None, 3000, 1),
+    ])
+    ids = [row[0] for row in conn.execute(
+        f"SELECT id FROM photos WHERE COALESCE(NOT {SMALL_SIZE_SQL}, is_small = 0) ORDER BY id",
+        small_size_params()
+    )]
+    assert ids == [2, 3, 5]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -1,5 +1,7 @@
 import sqlite3
 from config import *
+from phash_db import ensure_phash_int_column
+from fingerprints import ensure_fingerprint_columns
 
 def update_schema():
     conn = sqlite3.connect(DB_FILE)
@@ -48,6 +50,14 @@ def update_schema():
     except sqlite3.OperationalError:
         print("Колонка normalized_forwards уже существует")
     
+    # Хеш как 64-битное целое: колонка, заполнение из phash и индекс
+    ensure_phash_int_column(conn, TABLE_NAME)
+    print("Колонка phash_int заполнена и проиндексирована")
+    
+    # aHash, pHash (DCT), dHash и wHash: значения заполняет add_phash.py
+    ensure_fingerprint_columns(conn, TABLE_NAME)
+    print("Колонки ahash_int, phash_dct_int, dhash_int, whash_int проверены")
+    
     conn.commit()
     conn.close()
 